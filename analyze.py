@@ -0,0 +1,245 @@
+"""
+Phân tích hàng loạt ván cờ từ các file PGN lớn bằng một nhóm tiến trình worker sống lâu.
+
+Ván cờ được đọc dần bằng generator và gửi nguyên ván cho một worker; mỗi worker giữ một
+ChessEngine riêng trong suốt quá trình chạy nên bảng chuyển vị luôn "ấm" và bảng history
+sắp xếp nước đi được dùng tiếp giữa các nước của cùng một ván. Kết quả từng ván (điểm, nước
+tốt nhất, độ sâu, số nút cho mỗi nửa nước) được ghi dần ra JSONL theo đúng thứ tự ván.
+Số ván đang xử lý bị giới hạn nên bộ nhớ không tăng theo kích thước file, và checkpoint
+(số ván đã ghi, vị trí byte trong file kết quả) cho phép chạy tiếp sau khi bị dừng.
+Với --tt-snapshot, mỗi worker khởi động từ snapshot bảng chuyển vị của lần chạy trước và
+ghi lại bảng của mình định kỳ (theo số ván hoặc thời gian) và khi tiến trình kết thúc;
+cuối lần chạy các bảng được gộp về snapshot (giữ entry sâu hơn).
+"""
+import argparse
+import json
+import glob
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Iterable, Iterator, Optional
+import chess
+import chess.pgn
+from engine import ChessEngine
+from search.searcher import Searcher
+from search.transposition_table import TranspositionTable
+
+HEADERS = ("Event", "Date", "White", "Black", "Result")
+
+# Engine của worker, tạo một lần trong initializer và dùng cho mọi ván worker nhận
+_engine: Optional[ChessEngine] = None
+_limits: Optional[dict] = None
+_table_path: Optional[str] = None
+_save_policy: Optional[tuple] = None
+_unsaved_games = 0
+_last_save = 0.0
+
+
+def iter_games(paths: Iterable[str], skip: int = 0) -> Iterator[tuple]:
+    """Sinh (id, headers, FEN đầu, danh sách nước UCI) cho từng ván; bỏ qua nhanh skip ván đầu."""
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            index = 0
+            while skip > 0:
+                if not chess.pgn.skip_game(f):
+                    break
+                skip -= 1
+                index += 1
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                headers = {name: game.headers[name] for name in HEADERS if name in game.headers}
+                moves = [move.uci() for move in game.mainline_moves()]
+                yield f"{path}#{index}", headers, game.board().fen(), moves
+                index += 1
+
+
+def score_fields(score: int, mate_score: int) -> dict:
+    """Điểm theo góc nhìn bên đi: centipawn, hoặc số nước tới chiếu hết."""
+    if abs(score) > mate_score - 1000:
+        moves = (mate_score - abs(score) + 1) // 2
+        return {"mate": moves if score > 0 else -moves}
+    return {"score": score}
+
+
+def _init_worker(hash_mb: int, limits: dict, snapshot: Optional[str], max_age: Optional[int],
+                 save_policy: tuple):
+    global _engine, _limits, _table_path, _save_policy, _last_save
+    _engine = ChessEngine(hash_mb=hash_mb)
+    _engine.searcher.verbose = False
+    _limits = limits
+    if snapshot is not None:
+        if os.path.exists(snapshot):
+            _engine.tt.load(snapshot, max_age=max_age)
+        _table_path = os.path.join(_worker_directory(snapshot), f"{os.getpid()}.tt")
+        _save_policy = save_policy
+        _last_save = time.monotonic()
+        # Ghi phần còn lại khi pool đóng (tiến trình worker kết thúc bình thường)
+        Finalize(None, _save_table, args=(True,), exitpriority=10)
+
+
+def _worker_directory(snapshot: str) -> str:
+    return snapshot + ".workers"
+
+
+def _save_table(force: bool = False):
+    """Ghi bảng chuyển vị của worker khi đủ số ván hoặc đủ thời gian kể từ lần ghi trước."""
+    global _unsaved_games, _last_save
+    if _table_path is None or not _unsaved_games:
+        return
+    games, seconds = _save_policy
+    if force or _unsaved_games >= games or time.monotonic() - _last_save >= seconds:
+        _engine.tt.save(_table_path)
+        _unsaved_games = 0
+        _last_save = time.monotonic()
+
+
+def analyze_game(task: tuple) -> dict:
+    global _unsaved_games
+    game_id, headers, fen, moves = task
+    searcher = _engine.searcher
+    mate_score = _engine.evaluator.CHECKMATE_SCORE
+    board = chess.Board(fen)
+    plies = []
+    for ply, uci in enumerate(moves):
+        if ply >= _limits["start_ply"]:
+            best = _engine.run(board, _limits["movetime"], _limits["depth"], _limits["nodes"])
+            entry = {"ply": ply, "move": uci, "best": best.uci() if best else None,
+                     "depth": searcher.completed_depth, "nodes": searcher.nodes}
+            entry.update(score_fields(searcher.best_score, mate_score))
+            plies.append(entry)
+        board.push_uci(uci)
+    _unsaved_games += 1
+    _save_table()
+    return {"game": game_id, "headers": headers, "plies": plies}
+
+
+def merge_snapshots(snapshot: str, hash_mb: int) -> int:
+    """Gộp bảng của các worker (và snapshot cũ) về một snapshot; trả về số bảng đã gộp."""
+    table = TranspositionTable(hash_mb)
+    paths = glob.glob(os.path.join(_worker_directory(snapshot), "*.tt"))
+    if os.path.exists(snapshot):
+        paths.append(snapshot)
+    merged = 0
+    for path in paths:
+        try:
+            table.load(path, merge=True)
+            merged += 1
+        except ValueError as error:
+            # Bảng của worker bị dừng giữa lúc ghi: bỏ qua
+            print(f"skip {path}: {error}", file=sys.stderr)
+    table.save(snapshot)
+    shutil.rmtree(_worker_directory(snapshot), ignore_errors=True)
+    return merged
+
+
+def load_checkpoint(path: str, paths: list) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("paths") == paths:
+            return state
+    return {"paths": paths, "games": 0, "offset": 0}
+
+
+def save_checkpoint(path: str, state: dict):
+    # Ghi file tạm rồi thay thế để checkpoint không bao giờ bị ghi dở
+    temp = path + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(state, f)
+    os.replace(temp, path)
+
+
+def run_analysis(paths: list, output: str, checkpoint: str, workers: int, hash_mb: int,
+                 limits: dict, max_pending: int, snapshot: Optional[str] = None,
+                 max_age: Optional[int] = None, save_policy: tuple = (50, 300.0)) -> dict:
+    state = load_checkpoint(checkpoint, paths)
+    # Bỏ phần kết quả đã ghi sau checkpoint cuối (nếu lần chạy trước dừng giữa chừng)
+    if os.path.exists(output) and state["games"]:
+        os.truncate(output, state["offset"])
+    mode = "ab" if state["games"] else "wb"
+
+    if snapshot is not None:
+        os.makedirs(_worker_directory(snapshot), exist_ok=True)
+
+    start = time.monotonic()
+    games = positions = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(hash_mb, limits, snapshot, max_age, save_policy)) as pool, \
+            open(output, mode) as out:
+
+        def write(result: dict):
+            nonlocal games, positions
+            out.write((json.dumps(result) + "\n").encode())
+            out.flush()
+            games += 1
+            positions += len(result["plies"])
+            state["games"] += 1
+            state["offset"] = out.tell()
+            save_checkpoint(checkpoint, state)
+            if games % 10 == 0:
+                elapsed = time.monotonic() - start
+                print(f"{state['games']} games, {positions / elapsed:.1f} positions/s", file=sys.stderr)
+
+        # Cửa sổ giới hạn số ván đang chờ: ghi theo thứ tự, chỉ đọc thêm khi ván đầu hàng xong
+        pending = deque()
+        for task in iter_games(paths, state["games"]):
+            pending.append(pool.submit(analyze_game, task))
+            if len(pending) >= max_pending:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+    elapsed = time.monotonic() - start
+    result = {
+        "games": games,
+        "total_games": state["games"],
+        "positions": positions,
+        "seconds": round(elapsed, 2),
+        "positions_per_second": round(positions / elapsed, 2) if elapsed else 0.0,
+        "output": output,
+    }
+    if snapshot is not None:
+        result["tt_snapshot"] = snapshot
+        result["tt_tables_merged"] = merge_snapshots(snapshot, hash_mb)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Phân tích hàng loạt ván cờ PGN, kết quả dạng JSONL.")
+    parser.add_argument("pgn", nargs="+", help="các file PGN cần phân tích")
+    parser.add_argument("--output", default="analysis.jsonl")
+    parser.add_argument("--checkpoint", help="file checkpoint, mặc định <output>.checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--hash", type=int, default=16, help="kích thước bảng chuyển vị mỗi worker (MB)")
+    parser.add_argument("--depth", type=int, help="độ sâu mỗi thế cờ (mặc định 5 nếu không có giới hạn khác)")
+    parser.add_argument("--nodes", type=int, help="giới hạn số nút mỗi thế cờ")
+    parser.add_argument("--movetime", type=float, help="thời gian mỗi thế cờ (giây)")
+    parser.add_argument("--start-ply", type=int, default=0, help="bỏ qua các nửa nước khai cuộc đầu tiên")
+    parser.add_argument("--max-pending", type=int, help="số ván tối đa đang xử lý, mặc định 4 lần số worker")
+    parser.add_argument("--tt-snapshot", help="file snapshot bảng chuyển vị dùng để khởi động ấm và được cập nhật cuối lần chạy")
+    parser.add_argument("--tt-max-age", type=int, help="bỏ entry cũ hơn số lần tìm kiếm này khi nạp snapshot")
+    parser.add_argument("--tt-save-games", type=int, default=50, help="mỗi worker ghi bảng sau số ván này")
+    parser.add_argument("--tt-save-seconds", type=float, default=300.0, help="hoặc sau số giây này kể từ lần ghi trước")
+    args = parser.parse_args(argv)
+
+    depth = args.depth
+    if depth is None:
+        depth = Searcher.MAX_DEPTH if args.nodes or args.movetime else 5
+    limits = {"depth": depth, "nodes": args.nodes, "movetime": args.movetime, "start_ply": args.start_ply}
+    workers = max(1, args.workers)
+
+    result = run_analysis(args.pgn, args.output, args.checkpoint or args.output + ".checkpoint",
+                          workers, args.hash, limits, args.max_pending or 4 * workers,
+                          args.tt_snapshot, args.tt_max_age, (args.tt_save_games, args.tt_save_seconds))
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
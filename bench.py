@@ -0,0 +1,292 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Optional
+import chess
+from engine import ChessEngine
+from evaluation.incremental_evaluation import IncrementalEvaluation
+from search.move_picker import MoveOrdering
+from search.searcher import Searcher
+from search.search_stats import SearchStats
+from search.search_options import SearchOptions
+from search.transposition_table import TranspositionTable
+
+# Bộ thế cờ cố định: khai cuộc, trung cuộc, chiến thuật, tàn cuộc
+BENCH_POSITIONS = [
+    ("opening", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("opening", "rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5"),
+    ("opening", "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"),
+    ("opening", "rnbqkb1r/ppp1pppp/5n2/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 1 3"),
+    ("middlegame", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("middlegame", "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 8"),
+    ("middlegame", "2rq1rk1/pb1nbppp/1p2pn2/2pp4/2PP4/1PN1PN2/PB2BPPP/2RQ1RK1 w - - 0 11"),
+    ("tactical", "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"),
+    ("tactical", "r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 0"),
+    ("tactical", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"),
+    ("tactical", "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("endgame", "8/8/4k3/8/2p5/8/B2K4/8 w - - 0 1"),
+    ("endgame", "8/5pk1/6p1/8/2R5/6P1/5PK1/r7 w - - 0 40"),
+    ("endgame", "8/8/8/4k3/8/8/3QK3/8 w - - 0 1"),
+]
+
+# Thế cờ kiểm tra perft với số nút đã biết theo từng độ sâu
+PERFT_POSITIONS = [
+    ("startpos", chess.STARTING_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "python_chess": chess.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# --- perft / divide ---
+
+def perft(board: chess.Board, depth: int) -> int:
+    """Đếm số nút lá của cây nước đi hợp lệ ở độ sâu depth (đếm gộp ở tầng cuối)."""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+
+    nodes = 0
+    for move in board.generate_legal_moves():
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board: chess.Board, depth: int) -> dict:
+    """Số nút perft(depth - 1) sau từng nước đi ở gốc, để dò lỗi sinh nước đi."""
+    counts = {}
+    for move in board.generate_legal_moves():
+        board.push(move)
+        counts[move.uci()] = perft(board, depth - 1) if depth > 1 else 1
+        board.pop()
+    return counts
+
+
+def run_perft(fen: Optional[str], depth: int) -> dict:
+    positions = [("custom", fen, [])] if fen else PERFT_POSITIONS
+    results = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, position_fen, expected in positions:
+        board = chess.Board(position_fen)
+        start = time.perf_counter()
+        nodes = perft(board, depth)
+        elapsed = time.perf_counter() - start
+        total_nodes += nodes
+        total_time += elapsed
+
+        result = {"name": name, "fen": position_fen, "depth": depth, "nodes": nodes,
+                  "time": round(elapsed, 4), "nps": int(nodes / max(elapsed, 1e-9))}
+        if depth <= len(expected):
+            result["expected"] = expected[depth - 1]
+            result["ok"] = nodes == expected[depth - 1]
+        results.append(result)
+
+    return {
+        "command": "perft",
+        "environment": environment(),
+        "positions": results,
+        "total_nodes": total_nodes,
+        "total_time": round(total_time, 4),
+        "nps": int(total_nodes / max(total_time, 1e-9)),
+        "ok": all(result.get("ok", True) for result in results),
+    }
+
+
+def run_divide(fen: str, depth: int) -> dict:
+    board = chess.Board(fen)
+    start = time.perf_counter()
+    counts = divide(board, depth)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    return {
+        "command": "divide",
+        "environment": environment(),
+        "fen": fen,
+        "depth": depth,
+        "moves": counts,
+        "total_nodes": total,
+        "time": round(elapsed, 4),
+        "nps": int(total / max(elapsed, 1e-9)),
+    }
+
+
+# --- bench ---
+
+def bench_position(searcher: Searcher, fen: str, depth: int, node_limit: Optional[int]) -> dict:
+    # Mỗi thế cờ bắt đầu từ trạng thái sạch để số nút không phụ thuộc thứ tự chạy
+    searcher.tt.clear()
+    searcher.ordering = MoveOrdering()
+
+    board = chess.Board(fen)
+    start = time.perf_counter()
+    move = searcher.ids(board, None, depth, node_limit=node_limit)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "fen": fen,
+        "depth": searcher.completed_depth,
+        "move": move.uci() if move else None,
+        "score": searcher.best_score,
+        "nodes": searcher.nodes,
+        "time": round(elapsed, 4),
+        "nps": int(searcher.nodes / max(elapsed, 1e-9)),
+    }
+    # Bảng chuyển vị chỉ được đếm khi bật thống kê (--stats)
+    if searcher.search_stats is not None:
+        result["stats"] = searcher.search_stats
+    return result
+
+
+def run_bench(depth: int, node_limit: Optional[int], hash_mb: int, options: SearchOptions,
+              stats: bool = False) -> dict:
+    """
+    Chạy bộ thế cờ cố định với một luồng, không giới hạn thời gian nên số nút là tất định;
+    tổng số nút làm chữ ký để phát hiện thay đổi hành vi tìm kiếm giữa các commit.
+    """
+    searcher = Searcher(IncrementalEvaluation(), TranspositionTable(hash_mb), options=options)
+    searcher.verbose = False
+    if stats:
+        searcher.enable_stats(SearchStats())
+
+    results = []
+    for category, fen in BENCH_POSITIONS:
+        result = bench_position(searcher, fen, depth, node_limit)
+        result["category"] = category
+        results.append(result)
+
+    total_nodes = sum(result["nodes"] for result in results)
+    total_time = sum(result["time"] for result in results)
+    summary = {
+        "command": "bench",
+        "environment": environment(),
+        "depth": depth,
+        "node_limit": node_limit,
+        "hash_mb": hash_mb,
+        "options": options.to_dict(),
+        "positions": results,
+        "total_nodes": total_nodes,
+        "total_time": round(total_time, 4),
+        "nps": int(total_nodes / max(total_time, 1e-9)),
+        "signature": total_nodes,
+    }
+    if stats:
+        total_probes = sum(result["stats"]["tt_probes"] for result in results)
+        total_hits = sum(result["stats"]["tt_hits"] for result in results)
+        summary["tt_hit_rate"] = round(total_hits / total_probes, 4) if total_probes else 0.0
+    return summary
+
+
+def run_scaling(thread_counts: list, depth: int, hash_mb: int, options: SearchOptions) -> dict:
+    """
+    Đường cong mở rộng của Lazy SMP: thời gian tới độ sâu cố định và NPS (tính cả các
+    tiến trình phụ) theo số luồng, so với một luồng. Số nút không còn tất định khi threads > 1.
+    """
+    curve = []
+    for threads in thread_counts:
+        engine = ChessEngine(options=options, threads=threads, hash_mb=hash_mb)
+        engine.searcher.verbose = False
+        total_time = 0.0
+        total_nodes = 0
+        try:
+            for _, fen in BENCH_POSITIONS:
+                engine.tt.clear()
+                engine.searcher.ordering = MoveOrdering()
+                start = time.perf_counter()
+                engine.run(chess.Board(fen), None, depth)
+                total_time += time.perf_counter() - start
+                total_nodes += engine.smp.nodes if engine.smp is not None else engine.searcher.nodes
+        finally:
+            engine.close()
+        curve.append({"threads": threads, "time": round(total_time, 4), "nodes": total_nodes,
+                      "nps": int(total_nodes / max(total_time, 1e-9))})
+
+    base = curve[0]
+    for point in curve:
+        point["time_to_depth_speedup"] = round(base["time"] / max(point["time"], 1e-9), 3)
+        point["nps_speedup"] = round(point["nps"] / max(base["nps"], 1), 3)
+
+    return {
+        "command": "scaling",
+        "environment": environment(),
+        "depth": depth,
+        "hash_mb": hash_mb,
+        "curve": curve,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark và kiểm tra sinh nước đi, kết quả dạng JSON.")
+    parser.add_argument("--output", help="ghi JSON ra file thay vì stdout")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="tìm kiếm bộ thế cờ cố định tới độ sâu/số nút cố định")
+    bench.add_argument("--depth", type=int, default=5)
+    bench.add_argument("--nodes", type=int, help="giới hạn số nút mỗi thế cờ thay vì độ sâu")
+    bench.add_argument("--hash", type=int, default=16, help="kích thước bảng chuyển vị (MB)")
+    bench.add_argument("--threads", help="danh sách số luồng, ví dụ 1,2,4, để đo đường cong mở rộng")
+    bench.add_argument("--stats", action="store_true", help="kèm thống kê chi tiết (SearchStats) cho từng thế cờ")
+    bench.add_argument("--options", help="SearchOptions dạng JSON, ví dụ '{\"null_move\": false}'")
+
+    perft_parser = commands.add_parser("perft", help="đếm nút perft, mặc định trên bộ thế cờ kiểm tra")
+    perft_parser.add_argument("--depth", type=int, default=3)
+    perft_parser.add_argument("--fen")
+
+    divide_parser = commands.add_parser("divide", help="số nút perft theo từng nước đi ở gốc")
+    divide_parser.add_argument("--depth", type=int, default=3)
+    divide_parser.add_argument("--fen", default=chess.STARTING_FEN)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        options = SearchOptions.from_dict(json.loads(args.options)) if args.options else SearchOptions()
+        if args.threads:
+            thread_counts = [int(value) for value in args.threads.split(",")]
+            result = run_scaling(thread_counts, args.depth, args.hash, options)
+        else:
+            depth = Searcher.MAX_DEPTH if args.nodes else args.depth
+            result = run_bench(depth, args.nodes, args.hash, options, args.stats)
+    elif args.command == "perft":
+        result = run_perft(args.fen, args.depth)
+    else:
+        result = run_divide(args.fen, args.depth)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    return 0 if result.get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
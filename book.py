@@ -0,0 +1,162 @@
+"""
+Sách khai cuộc định dạng Polyglot (.bin).
+
+OpeningBook mở file qua chess.polyglot.open_reader: file được ánh xạ bằng mmap và tra bằng
+tìm kiếm nhị phân trên khóa Zobrist, không nạp toàn bộ vào RAM; mỗi lần chọn nước chỉ mất cỡ
+trăm micro giây (chủ yếu là tính khóa Zobrist). build_book tạo sách từ các file PGN: mỗi cặp
+(thế cờ, nước đi) được cộng điểm theo kết quả ván của bên đi (thắng 2, hòa 1), lọc theo số lần
+xuất hiện tối thiểu.
+
+    python book.py build games.pgn --output book.bin --max-plies 20
+    python book.py probe --fen "<fen>" --book book.bin
+"""
+import argparse
+import json
+import random
+import struct
+import sys
+import time
+from typing import Iterable, Optional
+import chess
+import chess.pgn
+import chess.polyglot
+
+ENTRY = struct.Struct(">QHHI")
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    """
+    Tra nước đi từ sách Polyglot. selection="weighted" chọn ngẫu nhiên theo trọng số,
+    "best" luôn chọn nước có trọng số cao nhất. max_depth giới hạn số nửa nước
+    (tính từ đầu ván) còn dùng sách; None là không giới hạn.
+    """
+    SELECTIONS = ("weighted", "best")
+
+    def __init__(self, path: str, max_depth: Optional[int] = None, selection: str = "weighted",
+                 seed: Optional[int] = None):
+        if selection not in self.SELECTIONS:
+            raise ValueError(f"Unknown book selection: {selection}")
+        self.path = path
+        self.max_depth = max_depth
+        self.selection = selection
+        self.random = random.Random(seed)
+        self.reader = chess.polyglot.open_reader(path)
+
+    def entries(self, board: chess.Board) -> list:
+        """Các entry hợp lệ cho thế cờ (nước đi đã chuyển về dạng chuẩn, kể cả nhập thành)."""
+        return list(self.reader.find_all(board))
+
+    def choose(self, board: chess.Board) -> Optional[chess.Move]:
+        if self.max_depth is not None and board.ply() >= self.max_depth:
+            return None
+        # Tra bằng khóa (bỏ qua kiểm tra hợp lệ từng entry), chỉ kiểm tra nước được chọn
+        entries = list(self.reader.find_all(chess.polyglot.zobrist_hash(board)))
+        while entries:
+            if self.selection == "best":
+                entry = max(entries, key=lambda item: item.weight)
+            else:
+                entry = self.random.choices(entries, weights=[item.weight for item in entries])[0]
+            move = self._board_move(board, entry.move)
+            if board.is_legal(move):
+                return move
+            # Trùng khóa Zobrist hoặc sách hỏng: bỏ entry này và chọn lại
+            entries.remove(entry)
+        return None
+
+    @staticmethod
+    def _board_move(board: chess.Board, move: chess.Move) -> chess.Move:
+        """Chuyển nhập thành dạng Polyglot (vua ăn xe của mình) về nước đi chuẩn."""
+        if (not board.chess960 and board.piece_type_at(move.from_square) == chess.KING
+                and board.piece_at(move.to_square) == chess.Piece(chess.ROOK, board.turn)):
+            king_file = 6 if chess.square_file(move.to_square) > chess.square_file(move.from_square) else 2
+            return chess.Move(move.from_square, chess.square(king_file, chess.square_rank(move.from_square)))
+        return move
+
+    def close(self):
+        self.reader.close()
+
+
+def encode_move(board: chess.Board, move: chess.Move) -> int:
+    """Mã hóa nước đi theo Polyglot: nhập thành viết thành vua ăn xe, phong cấp 1..4 = mã..hậu."""
+    to_square = move.to_square
+    if board.is_castling(move) and not board.chess960:
+        rook_file = 7 if chess.square_file(move.to_square) > chess.square_file(move.from_square) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+
+def build_book(pgn_paths: Iterable[str], output: str, max_plies: int = 20, min_count: int = 2) -> dict:
+    """Tạo sách Polyglot từ các file PGN, trả về thống kê."""
+    weights = {}
+    counts = {}
+    games = 0
+    points_for = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}
+
+    for path in pgn_paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                points = points_for.get(game.headers.get("Result"))
+                if points is None:
+                    continue
+                games += 1
+                board = game.board()
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= max_plies:
+                        break
+                    entry = (chess.polyglot.zobrist_hash(board), encode_move(board, move))
+                    weights[entry] = weights.get(entry, 0) + points[0 if board.turn == chess.WHITE else 1]
+                    counts[entry] = counts.get(entry, 0) + 1
+                    board.push(move)
+
+    entries = sorted(entry for entry, count in counts.items() if count >= min_count and weights[entry] > 0)
+    # Co trọng số về 16 bit nếu cần, giữ trọng số tối thiểu 1
+    largest = max((weights[entry] for entry in entries), default=0)
+    scale = MAX_WEIGHT / largest if largest > MAX_WEIGHT else 1
+    with open(output, "wb") as f:
+        for key, move in entries:
+            f.write(ENTRY.pack(key, move, max(1, int(weights[(key, move)] * scale)), 0))
+
+    return {"games": games, "entries": len(entries), "positions": len({key for key, _ in entries}),
+            "bytes": len(entries) * ENTRY.size, "output": output}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tạo và tra sách khai cuộc Polyglot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="tạo sách từ các file PGN")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("--output", default="book.bin")
+    build.add_argument("--max-plies", type=int, default=20, help="chỉ lấy các nửa nước đầu ván")
+    build.add_argument("--min-count", type=int, default=2, help="số lần xuất hiện tối thiểu của một nước")
+
+    probe = commands.add_parser("probe", help="liệt kê nước trong sách cho một thế cờ")
+    probe.add_argument("--book", default="book.bin")
+    probe.add_argument("--fen", default=chess.STARTING_FEN)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.monotonic()
+        result = build_book(args.pgn, args.output, args.max_plies, args.min_count)
+        result["seconds"] = round(time.monotonic() - start, 2)
+    else:
+        book = OpeningBook(args.book)
+        board = chess.Board(args.fen)
+        start = time.perf_counter()
+        entries = book.entries(board)
+        elapsed = time.perf_counter() - start
+        book.close()
+        result = {"fen": board.fen(), "microseconds": round(elapsed * 1e6, 1),
+                  "moves": [{"move": entry.move.uci(), "weight": entry.weight} for entry in entries]}
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
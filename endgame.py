@@ -0,0 +1,311 @@
+"""
+Sinh bitbase tàn cuộc (KQK, KRK, KPK, KBNK) bằng phân tích ngược và ghi ra file cho Searcher tra cứu.
+
+Mọi thế cờ của một bảng được đánh chỉ số theo search.bitbase.BitbaseLayout và xử lý cùng lúc
+bằng mảng NumPy. Bắt đầu từ các thế đen bị chiếu hết, mỗi vòng lặp đi lùi một nửa nước:
+thế trắng đi là thắng nếu có nước tới một thế đen thua (tìm bằng cách lùi nước đi của trắng),
+thế đen đi là thua nếu mọi nước đều tới thế trắng thắng. Vòng lặp dừng khi không còn thế mới,
+các thế còn lại là hòa. Khoảng cách tới chiếu hết vì vậy là tối ưu cho cả hai bên (bỏ qua luật
+50 nước). Thế đen ăn được quân là hòa (không còn đủ chất); tốt phong cấp được tra trong KQK/KRK
+nên KPK cần hai bảng này.
+
+    python endgame.py generate --output bitbases
+    python endgame.py probe --path bitbases --fen "<fen>"
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import chess
+import numpy as np
+from search.bitbase import BITBASE_EXTENSION, TABLES, BitbaseLayout, Bitbases, load_bitbase, save_bitbase
+
+# Thứ tự sinh: KPK cần KQK và KRK cho nước phong cấp
+GENERATION_ORDER = ("KQK", "KRK", "KPK", "KBNK")
+PROMOTIONS = {"KQK": chess.QUEEN, "KRK": chess.ROOK}
+
+BIT = np.array([1 << square for square in chess.SQUARES], dtype=np.uint64)
+BETWEEN = np.array([[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES], dtype=np.uint64)
+RANK = np.array([chess.square_rank(square) for square in chess.SQUARES])
+
+KING_STEPS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+SLIDER_STEPS = {chess.ROOK: KING_STEPS[:4], chess.BISHOP: KING_STEPS[4:], chess.QUEEN: KING_STEPS}
+
+
+def _step(square: chess.Square, file_step: int, rank_step: int, distance: int = 1) -> int:
+    file = chess.square_file(square) + file_step * distance
+    rank = chess.square_rank(square) + rank_step * distance
+    return chess.square(file, rank) if 0 <= file < 8 and 0 <= rank < 8 else -1
+
+
+# Ô đích của vua/mã và các tia của quân trượt (-1 là ra ngoài bàn cờ)
+KING_TARGETS = np.array([[_step(square, *step) for step in KING_STEPS] for square in chess.SQUARES])
+KNIGHT_TARGETS = np.array([[_step(square, *step) for step in KNIGHT_STEPS] for square in chess.SQUARES])
+RAYS = {piece_type: np.array([[[_step(square, *step, distance) for distance in range(1, 8)] for step in steps]
+                              for square in chess.SQUARES])
+        for piece_type, steps in SLIDER_STEPS.items()}
+
+# Tầm tấn công trên bàn cờ trống
+EMPTY_ATTACKS = {
+    chess.PAWN: np.array(chess.BB_PAWN_ATTACKS[chess.WHITE], dtype=np.uint64),
+    chess.KNIGHT: np.array(chess.BB_KNIGHT_ATTACKS, dtype=np.uint64),
+    chess.KING: np.array(chess.BB_KING_ATTACKS, dtype=np.uint64),
+}
+for _type, _rays in RAYS.items():
+    EMPTY_ATTACKS[_type] = np.array([sum(1 << int(target) for target in _rays[square].ravel() if target >= 0)
+                                     for square in chess.SQUARES], dtype=np.uint64)
+
+
+def attacks(piece_type: chess.PieceType, source: np.ndarray, target: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """Quân trắng piece_type ở source có tấn công target không (quân trượt bị chặn bởi occupied)."""
+    hit = (EMPTY_ATTACKS[piece_type][source] & BIT[target]) != 0
+    if piece_type in RAYS:
+        hit &= (BETWEEN[source, target] & occupied) == 0
+    return hit
+
+
+def decode(layout: BitbaseLayout, index: np.ndarray) -> list:
+    """Chỉ số -> danh sách mảng ô (vua trắng, vua đen, các quân trắng)."""
+    king_squares = np.array([square for square in chess.SQUARES if layout.king_slots[square] >= 0])
+    squares = []
+    rest = index
+    for _ in range(len(layout.pieces) + 1):
+        squares.append(rest % 64)
+        rest = rest // 64
+    return [king_squares[rest]] + squares[::-1]
+
+
+def canonical(layout: BitbaseLayout, squares: list) -> np.ndarray:
+    """Chỉ số chuẩn (nhỏ nhất qua các phép đối xứng) cho các mảng ô, giống BitbaseLayout.index."""
+    slots = np.array(layout.king_slots)
+    best = np.full(len(squares[0]), layout.size, dtype=np.int64)
+    for table in np.array(layout.symmetries):
+        slot = slots[table[squares[0]]]
+        index = slot.astype(np.int64)
+        for square in squares[1:]:
+            index = index * 64 + table[square]
+        best = np.where(slot >= 0, np.minimum(best, index), best)
+    return best
+
+
+def white_predecessors(layout: BitbaseLayout, positions: np.ndarray) -> np.ndarray:
+    """Chỉ số các thế trắng đi có một nước (không ăn quân) dẫn tới các thế đen đi đã cho."""
+    white_king, black_king, *pieces = decode(layout, positions)
+    occupied = BIT[white_king] | BIT[black_king]
+    for square in pieces:
+        occupied |= BIT[square]
+
+    found = []
+
+    def emit(legal: np.ndarray, moved: int, source: np.ndarray):
+        squares = [white_king, black_king] + pieces
+        squares[0 if moved < 0 else moved + 2] = source
+        found.append(canonical(layout, [square[legal] for square in squares]))
+
+    def empty(square: np.ndarray) -> np.ndarray:
+        return (occupied & BIT[square]) == 0
+
+    for direction in range(8):
+        source = KING_TARGETS[white_king, direction]
+        legal = source >= 0
+        source = np.where(legal, source, 0)
+        emit(legal & empty(source), -1, source)
+
+    for moved, (piece_type, square) in enumerate(zip(layout.pieces, pieces)):
+        if piece_type == chess.PAWN:
+            single = (RANK[square] >= 2) & empty(np.maximum(square - 8, 0))
+            emit(single, moved, square - 8)
+            emit(single & (RANK[square] == 3) & empty(np.maximum(square - 16, 0)), moved, square - 16)
+        elif piece_type == chess.KNIGHT:
+            for direction in range(8):
+                source = KNIGHT_TARGETS[square, direction]
+                legal = source >= 0
+                source = np.where(legal, source, 0)
+                emit(legal & empty(source), moved, source)
+        else:
+            rays = RAYS[piece_type]
+            for direction in range(rays.shape[1]):
+                # Đi lùi dọc tia tới khi gặp quân hoặc mép bàn cờ
+                alive = np.ones(len(square), dtype=bool)
+                for distance in range(7):
+                    source = rays[square, direction, distance]
+                    alive &= source >= 0
+                    source = np.where(alive, source, 0)
+                    alive &= empty(source)
+                    if not alive.any():
+                        break
+                    emit(alive, moved, source)
+
+    return np.concatenate(found)
+
+
+def promotion_distances(layout: BitbaseLayout, squares: list, legal: np.ndarray, solved: dict) -> np.ndarray:
+    """Số nửa nước tới chiếu hết (0 nếu không thắng) khi tốt phong cấp thành hậu hoặc xe."""
+    white_king, black_king, pawn = squares
+    target = pawn + 8
+    legal = legal & (RANK[pawn] == 6) & (target != white_king) & (target != black_king)
+    best = np.zeros(layout.size, dtype=np.int64)
+    for name in PROMOTIONS:
+        promoted_layout, (_, black_to_move) = solved[name]
+        index = canonical(promoted_layout, [white_king, black_king, np.where(legal, target, 0)])
+        value = np.where(legal, black_to_move[np.minimum(index, promoted_layout.size - 1)], 0).astype(np.int64)
+        # Đen thua sau value - 1 nửa nước nên trắng thắng sau value nửa nước
+        best = np.where((value > 0) & ((best == 0) | (value < best)), value, best)
+    return best
+
+
+def generate(name: str, solved: dict) -> tuple:
+    """Sinh một bảng; trả về (mảng trắng đi, mảng đen đi, thống kê)."""
+    start = time.monotonic()
+    layout = BitbaseLayout(name)
+    index = np.arange(layout.size, dtype=np.int64)
+    squares = decode(layout, index)
+    white_king, black_king, *pieces = squares
+
+    # Thế hợp lệ: chỉ số chuẩn, các ô khác nhau, hai vua không kề nhau, tốt không ở hàng 1/8
+    valid = canonical(layout, squares) == index
+    for i, first in enumerate(squares):
+        for second in squares[i + 1:]:
+            valid &= first != second
+    valid &= (EMPTY_ATTACKS[chess.KING][white_king] & BIT[black_king]) == 0
+    for piece_type, square in zip(layout.pieces, pieces):
+        if piece_type == chess.PAWN:
+            valid &= (RANK[square] >= 1) & (RANK[square] <= 6)
+
+    white_occupied = BIT[white_king]
+    for square in pieces:
+        white_occupied |= BIT[square]
+    check = np.zeros(layout.size, dtype=bool)
+    for piece_type, square in zip(layout.pieces, pieces):
+        check |= attacks(piece_type, square, black_king, white_occupied)
+    # Trắng đi mà vua đen đang bị chiếu là thế không thể xảy ra
+    valid_white = valid & ~check
+
+    # Nước đi của vua đen: chỉ số thế trắng đi tiếp theo, -1 nếu không hợp lệ, -2 nếu ăn quân
+    successors = np.full((8, layout.size), -1, dtype=np.int32)
+    for direction in range(8):
+        target = KING_TARGETS[black_king, direction]
+        legal = valid & (target >= 0)
+        target = np.where(legal, target, 0)
+        legal &= (EMPTY_ATTACKS[chess.KING][white_king] & BIT[target]) == 0
+        captured = np.zeros(layout.size, dtype=bool)
+        for piece_type, square in zip(layout.pieces, pieces):
+            captured |= square == target
+            legal &= (square == target) | ~attacks(piece_type, square, target, white_occupied)
+        quiet = legal & ~captured
+        following = canonical(layout, [white_king, target] + pieces)
+        successors[direction] = np.where(quiet, following, np.where(legal, -2, -1))
+    num_moves = (successors != -1).sum(axis=0)
+    mated = valid & check & (num_moves == 0)
+    # Thế có nước ăn quân hoặc bị hết nước (không bị chiếu) luôn là hòa
+    can_lose = valid & (num_moves > 0) & ~(successors == -2).any(axis=0)
+
+    promotion = (promotion_distances(layout, squares, valid_white, solved)
+                 if chess.PAWN in layout.pieces else np.zeros(layout.size, dtype=np.int64))
+    del squares, white_king, black_king, pieces, white_occupied
+
+    white_to_move = np.zeros(layout.size, dtype=np.uint8)
+    black_to_move = np.zeros(layout.size, dtype=np.uint8)
+    black_to_move[mated] = 1
+    lost = np.flatnonzero(mated)
+    plies = 0
+    while True:
+        won = white_predecessors(layout, lost) if len(lost) else np.zeros(0, dtype=np.int64)
+        won = np.concatenate([won, np.flatnonzero(promotion == plies + 1)])
+        won = np.unique(won[valid_white[won] & (white_to_move[won] == 0)])
+        white_to_move[won] = plies + 1
+
+        pending = np.flatnonzero(can_lose & (black_to_move == 0))
+        following = successors[:, pending]
+        all_won = ((following < 0) | (white_to_move[np.maximum(following, 0)] > 0)).all(axis=0)
+        lost = pending[all_won]
+        black_to_move[lost] = plies + 3
+        plies += 2
+
+        if not len(won) and not len(lost) and not (promotion > plies).any():
+            break
+        if plies + 3 > 255:
+            raise ValueError(f"{name}: distance to mate does not fit in a byte")
+
+    positions = int(valid_white.sum() + valid.sum())
+    stats = {
+        "positions": positions,
+        "white_wins": int((white_to_move > 0).sum()),
+        "black_losses": int((black_to_move > 0).sum()),
+        "draws": positions - int((white_to_move > 0).sum() + (black_to_move > 0).sum()),
+        "max_mate_moves": (int(white_to_move.max()) + 1) // 2,
+        "seconds": round(time.monotonic() - start, 2),
+    }
+    return white_to_move, black_to_move, stats
+
+
+def generate_all(output: str, names: list) -> dict:
+    os.makedirs(output, exist_ok=True)
+    solved = {}
+    results = {}
+    for name in GENERATION_ORDER:
+        path = os.path.join(output, name + BITBASE_EXTENSION)
+        needed = name in names or (name in PROMOTIONS and "KPK" in names)
+        if not needed:
+            continue
+        layout = BitbaseLayout(name)
+        if name not in names:
+            # Chỉ cần cho nước phong cấp: dùng file đã có nếu được
+            if os.path.exists(path):
+                white_to_move, black_to_move = load_bitbase(path, layout)
+                solved[name] = (layout, (np.frombuffer(white_to_move, dtype=np.uint8),
+                                         np.frombuffer(black_to_move, dtype=np.uint8)))
+                continue
+        white_to_move, black_to_move, stats = generate(name, solved)
+        solved[name] = (layout, (white_to_move, black_to_move))
+        stats["raw_bytes"] = 2 * layout.size
+        stats["file_bytes"] = save_bitbase(path, layout, white_to_move.tobytes(), black_to_move.tobytes())
+        results[name] = stats
+        print(f"{name}: {stats['seconds']}s, {stats['file_bytes']} bytes", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh và tra bitbase tàn cuộc.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="sinh bitbase bằng phân tích ngược")
+    generate_parser.add_argument("--output", default="bitbases", help="thư mục chứa file bitbase")
+    generate_parser.add_argument("--tables", nargs="+", default=list(GENERATION_ORDER), choices=list(TABLES))
+
+    probe = commands.add_parser("probe", help="tra một thế cờ")
+    probe.add_argument("--path", default="bitbases")
+    probe.add_argument("--fen", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        start = time.monotonic()
+        tables = generate_all(args.output, args.tables)
+        result = {
+            "tables": tables,
+            "seconds": round(time.monotonic() - start, 2),
+            "file_bytes": sum(stats["file_bytes"] for stats in tables.values()),
+        }
+    else:
+        bitbases = Bitbases(args.path)
+        board = chess.Board(args.fen)
+        start = time.perf_counter()
+        probed = bitbases.probe(board)
+        elapsed = time.perf_counter() - start
+        result = {"fen": board.fen(), "microseconds": round(elapsed * 1e6, 1)}
+        if probed is None:
+            result["result"] = None
+        else:
+            outcome, plies = probed
+            result["result"] = {1: "win", 0: "draw", -1: "loss"}[outcome]
+            if outcome:
+                result["plies_to_mate"] = plies
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
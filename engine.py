@@ -1,13 +1,172 @@
 import chess
-from evaluation.evaluation import Evaluation
+import threading
+from typing import Callable, Optional, Union
+from book import OpeningBook
+from evaluation.incremental_evaluation import IncrementalEvaluation
+from search.bitbase import Bitbases
 from search.searcher import Searcher, TranspositionTable
+from search.search_options import SearchOptions
+from search.shared_transposition_table import SharedTranspositionTable
+from search.lazy_smp import LazySMP
+from search.time_manager import TimeManager
+from search.search_stats import SearchStats
 
 class ChessEngine:
-    def __init__(self):
-        self.evaluator = Evaluation()
-        self.tt = TranspositionTable(size_mb=64)
-        self.searcher = Searcher(self.evaluator, self.tt)
+    def __init__(self, options: Optional[SearchOptions] = None, threads: int = 1, hash_mb: int = 64):
+        self.evaluator = IncrementalEvaluation()
+        self.threads = max(1, threads)
+        if self.threads > 1:
+            # Lazy SMP: các tiến trình phụ dùng chung bảng chuyển vị qua shared memory
+            self.tt = SharedTranspositionTable(size_mb=hash_mb)
+        else:
+            self.tt = TranspositionTable(size_mb=hash_mb)
+        self.searcher = Searcher(self.evaluator, self.tt, options=options)
+        self.smp = LazySMP(self.searcher, self.threads - 1) if self.threads > 1 else None
+        if self.smp is None:
+            self.searcher.stop_event = threading.Event()
+        self.searcher.info_callback = self._on_info
+        self.info_callback = None
+
+        # Sách khai cuộc Polyglot (tùy chọn), xem set_book
+        self.book: Optional[OpeningBook] = None
+
+        # Trạng thái của luồng suy nghĩ chạy nền
+        self.progress = None
+        self.result = None
+        self._thread = None
+
+        # Suy nghĩ trong thời gian của đối thủ (ponder): ponder_move là nước trả lời dự đoán từ
+        # biến chính của lần tìm kiếm gần nhất, ponder_on là nước đối thủ mà lần ponder đang giả định
+        self.ponder_move = None
+        self.ponder_on = None
+        self.pondering = False
     
-    def run(self, board: chess.Board, time_limit: float) -> chess.Move:
-        best_move = self.searcher.ids(board.copy(), time_limit)
-        return best_move
\ No newline at end of file
+    def run(self, board: chess.Board, time_limit: Union[TimeManager, float, None],
+            max_depth: int = Searcher.MAX_DEPTH, node_limit: Optional[int] = None) -> chess.Move:
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                # Nước từ sách: không tìm kiếm, không có biến chính để ponder
+                self.searcher.pv = [move]
+                self.searcher.completed_depth = 0
+                self.searcher.best_score = 0
+                self.searcher.search_stats = None
+                return move
+        if self.smp is not None:
+            return self.smp.search(board.copy(), time_limit, max_depth, node_limit)
+        best_move = self.searcher.ids(board.copy(), time_limit, max_depth, node_limit=node_limit)
+        return best_move
+
+    def set_book(self, path: Optional[str], max_depth: Optional[int] = None, selection: str = "weighted"):
+        """Dùng sách khai cuộc Polyglot tại path (None để tắt); max_depth tính theo nửa nước từ đầu ván."""
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if path:
+            self.book = OpeningBook(path, max_depth, selection)
+
+    def set_bitbases(self, path: Optional[str]):
+        """Dùng các bitbase tàn cuộc trong thư mục path (None để tắt), xem endgame.py."""
+        self.searcher.bitbases = Bitbases(path) if path else None
+
+    def enable_stats(self, callback: Optional[Callable[[dict], None]] = None) -> SearchStats:
+        """Bật thống kê tìm kiếm; callback nhận dict thống kê sau mỗi lần tìm kiếm (của luồng chính)."""
+        return self.searcher.enable_stats(SearchStats(callback))
+
+    @property
+    def search_stats(self) -> Optional[dict]:
+        """Thống kê của lần tìm kiếm gần nhất (xem enable_stats), None nếu không bật hoặc đi theo sách."""
+        return self.searcher.search_stats
+
+    def _on_info(self, info: dict):
+        if self.smp is not None:
+            # Cộng số nút các luồng phụ đã duyệt tới lúc này để nodes/nps phản ánh cả Lazy SMP
+            info["nodes"] += self.smp.helper_nodes()
+        self.progress = info
+        if self.info_callback is not None:
+            self.info_callback(info)
+
+    def start(self, board: chess.Board, time_limit: Union[TimeManager, float, None],
+              max_depth: int = Searcher.MAX_DEPTH, node_limit: Optional[int] = None,
+              on_done: Optional[Callable[[Optional[chess.Move]], None]] = None,
+              ponder_on: Optional[chess.Move] = None):
+        """
+        Bắt đầu tìm kiếm trong luồng nền; dùng poll() để lấy kết quả mà không chặn giao diện,
+        hoặc truyền on_done để được gọi (trong luồng nền) khi tìm kiếm kết thúc.
+        ponder_on khác None nghĩa là tìm kiếm ponder sau nước đối thủ đó (xem start_pondering).
+        """
+        self.stop()
+        # Đặt trạng thái ponder trước khi luồng nền chạy để không lẫn với lần tìm kiếm trước
+        self.ponder_on = ponder_on
+        self.pondering = ponder_on is not None
+        self.searcher.stop_event.clear()
+        self.progress = None
+        self.result = None
+        self._thread = threading.Thread(target=self._think,
+                                        args=(board.copy(), time_limit, max_depth, node_limit, on_done),
+                                        daemon=True)
+        self._thread.start()
+
+    def _think(self, board: chess.Board, time_limit: Union[TimeManager, float, None], max_depth: int,
+               node_limit: Optional[int], on_done: Optional[Callable[[Optional[chess.Move]], None]]):
+        self.result = self.run(board, time_limit, max_depth, node_limit)
+        # Cả lần ponder cũng cập nhật dự đoán: sau ponderhit kết quả của nó là nước đi thật của máy.
+        # Nước đối thủ đang được ponder vẫn nằm ở ponder_on nên không bị ghi đè
+        pv = self.searcher.pv
+        self.ponder_move = pv[1] if len(pv) > 1 and pv[0] == self.result else None
+        if on_done is not None:
+            on_done(self.result)
+
+    def start_pondering(self, board: chess.Board) -> bool:
+        """
+        Sau khi máy đi, tìm kiếm không giới hạn thời gian trên thế cờ sau nước trả lời
+        dự đoán (nước thứ hai của biến chính). Trả về False nếu không có nước dự đoán.
+        """
+        ponder_move = self.ponder_move
+        if ponder_move is None or not board.is_legal(ponder_move):
+            return False
+
+        ponder_board = board.copy()
+        ponder_board.push(ponder_move)
+        if ponder_board.is_game_over():
+            return False
+
+        self.start(ponder_board, time_limit=None, ponder_on=ponder_move)
+        return True
+
+    def ponderhit(self, time_limit: Union[TimeManager, float]):
+        """Đối thủ đi đúng nước dự đoán: tiếp tục tìm kiếm hiện tại với giới hạn thời gian bình thường."""
+        self.pondering = False
+        self.searcher.ponderhit(time_limit)
+
+    def stop_pondering(self):
+        """Đối thủ đi nước khác: dừng nhanh, giữ nguyên bảng chuyển vị đã được làm nóng."""
+        self.pondering = False
+        self.ponder_on = None
+        self.stop()
+        self.result = None
+
+    def is_thinking(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self) -> Optional[chess.Move]:
+        """Trả về nước đi khi luồng nền đã xong (chỉ một lần), ngược lại trả về None."""
+        if self._thread is None or self._thread.is_alive():
+            return None
+        self._thread = None
+        return self.result
+
+    def stop(self):
+        """Yêu cầu dừng tìm kiếm đang chạy và chờ luồng nền kết thúc."""
+        if self._thread is not None:
+            self.searcher.stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.set_book(None)
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+            self.tt.close()
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+Đánh giá theo lô bằng NumPy cho các tập thế cờ lớn (ví dụ dump FEN từ cơ sở dữ liệu ván đấu).
+
+Mỗi thế cờ được mã hóa thành 12 bitboard uint64 theo thứ tự PLANES (trắng tốt..vua rồi đen
+tốt..vua, bit 0 = a1) cùng một mảng bên đi. Mọi thành phần của Evaluation.evaluate được tính
+bằng phép toán vector trên cả lô và cho kết quả giống hệt bản vô hướng: chất, PST nội suy,
+quân treo (bảng tấn công chính xác, quân trượt dùng Kogge-Stone fill), mop-up, cấu trúc tốt,
+lá chắn tốt và hệ số co điểm theo bảng chất.
+"""
+from typing import Iterable
+import chess
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là phụ thuộc tùy chọn, chỉ cần cho đánh giá theo lô
+    np = None
+
+from evaluation import pawn_structure as ps
+from evaluation.material_table import SCALE_NORMAL, SCALE_DRAWISH, SCALE_NO_WIN
+
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+DEFAULT_CHUNK_SIZE = 8192
+
+_NOT_A = chess.BB_ALL & ~chess.BB_FILE_A
+_NOT_H = chess.BB_ALL & ~chess.BB_FILE_H
+_NOT_AB = _NOT_A & ~chess.BB_FILE_B
+_NOT_GH = _NOT_H & ~chess.BB_FILE_G
+
+# (dịch, mặt nạ chống tràn cột) cho các hướng của xe và tượng; dịch âm là dịch phải
+_ROOK_DIRECTIONS = [(8, chess.BB_ALL), (-8, chess.BB_ALL), (1, _NOT_A), (-1, _NOT_H)]
+_BISHOP_DIRECTIONS = [(9, _NOT_A), (7, _NOT_H), (-7, _NOT_A), (-9, _NOT_H)]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("evaluate_batch requires numpy")
+
+
+def _shift(bb, amount: int):
+    return bb << np.uint64(amount) if amount > 0 else bb >> np.uint64(-amount)
+
+
+def _popcount(bb):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bb).astype(np.int64)
+    return np.unpackbits(bb.view(np.uint8).reshape(bb.shape + (8,)), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def _slide(gen, empty, amount: int, mask: int):
+    """Kogge-Stone occluded fill: các ô bị quân trượt trong gen tấn công theo một hướng."""
+    mask = np.uint64(mask)
+    pro = empty & mask
+    gen = gen | (pro & _shift(gen, amount))
+    pro = pro & _shift(pro, amount)
+    gen = gen | (pro & _shift(gen, 2 * amount))
+    pro = pro & _shift(pro, 2 * amount)
+    gen = gen | (pro & _shift(gen, 4 * amount))
+    return _shift(gen, amount) & mask
+
+
+def _knight_attacks(knights):
+    l1 = (knights >> np.uint64(1)) & np.uint64(_NOT_H)
+    l2 = (knights >> np.uint64(2)) & np.uint64(_NOT_GH)
+    r1 = (knights << np.uint64(1)) & np.uint64(_NOT_A)
+    r2 = (knights << np.uint64(2)) & np.uint64(_NOT_AB)
+    h1 = l1 | r1
+    h2 = l2 | r2
+    return (h1 << np.uint64(16)) | (h1 >> np.uint64(16)) | (h2 << np.uint64(8)) | (h2 >> np.uint64(8))
+
+
+def _king_attacks(kings):
+    sideways = ((kings << np.uint64(1)) & np.uint64(_NOT_A)) | ((kings >> np.uint64(1)) & np.uint64(_NOT_H))
+    row = kings | sideways
+    return sideways | (row << np.uint64(8)) | (row >> np.uint64(8))
+
+
+def _attacks(bitboards, color: chess.Color, occupied):
+    """Tương đương Evaluation.attack_mask cho cả lô."""
+    base = 0 if color == chess.WHITE else 6
+    pawns = bitboards[:, base]
+    if color == chess.WHITE:
+        attacks = ((pawns & np.uint64(_NOT_A)) << np.uint64(7)) | ((pawns & np.uint64(_NOT_H)) << np.uint64(9))
+    else:
+        attacks = ((pawns & np.uint64(_NOT_A)) >> np.uint64(9)) | ((pawns & np.uint64(_NOT_H)) >> np.uint64(7))
+
+    attacks |= _knight_attacks(bitboards[:, base + 1])
+    attacks |= _king_attacks(bitboards[:, base + 5])
+
+    empty = ~occupied
+    queens = bitboards[:, base + 4]
+    diagonal = bitboards[:, base + 2] | queens
+    straight = bitboards[:, base + 3] | queens
+    for amount, mask in _BISHOP_DIRECTIONS:
+        attacks |= _slide(diagonal, empty, amount, mask)
+    for amount, mask in _ROOK_DIRECTIONS:
+        attacks |= _slide(straight, empty, amount, mask)
+    return attacks
+
+
+def _span(pawns, color: chess.Color):
+    """Các ô phía trước (theo hướng đi của color) mọi quân trong pawns, cùng cột, không gồm ô đứng."""
+    step = 8 if color == chess.WHITE else -8
+    span = _shift(pawns, step)
+    for amount in (step, 2 * step, 4 * step):
+        span = span | _shift(span, amount)
+    return span
+
+
+def _spread(bb):
+    return bb | ((bb << np.uint64(1)) & np.uint64(_NOT_A)) | ((bb >> np.uint64(1)) & np.uint64(_NOT_H))
+
+
+def _pawn_structure(pawns, enemy_pawns, color: chess.Color):
+    """Tương đương pawn_structure_terms: trả về (early, end) cho cả lô."""
+    early = np.zeros(len(pawns), dtype=np.int64)
+    end = np.zeros(len(pawns), dtype=np.int64)
+
+    for file in range(8):
+        count = _popcount(pawns & np.uint64(chess.BB_FILES[file]))
+        doubled = np.maximum(count - 1, 0)
+        early -= doubled * ps.DOUBLED_PAWN_EARLY
+        end -= doubled * ps.DOUBLED_PAWN_END
+
+        isolated = np.where((pawns & np.uint64(ps.ADJACENT_FILES[file])) == 0, count, 0)
+        early -= isolated * ps.ISOLATED_PAWN_EARLY
+        end -= isolated * ps.ISOLATED_PAWN_END
+
+    # Tốt thông: không nằm sau tốt đối phương trên cột mình/cột kề, không nằm sau tốt mình cùng cột
+    enemy = not color
+    passed = pawns & ~_spread(_span(enemy_pawns, enemy)) & ~_span(pawns, enemy)
+    for rank in range(8):
+        count = _popcount(passed & np.uint64(chess.BB_RANKS[rank]))
+        relative = rank if color == chess.WHITE else 7 - rank
+        early += count * ps.PASSED_PAWN_EARLY[relative]
+        end += count * ps.PASSED_PAWN_END[relative]
+    return early, end
+
+
+def _pawn_shield(pawns, king_squares, color: chess.Color):
+    """Tương đương pawn_shield_terms cho cả lô."""
+    near = np.array(ps.SHIELD_NEAR[color], dtype=np.uint64)[king_squares]
+    far = pawns & np.array(ps.SHIELD_FAR[color], dtype=np.uint64)[king_squares]
+    far_shifted = far >> np.uint64(8) if color == chess.WHITE else far << np.uint64(8)
+    missing = _popcount(near & ~(pawns | far_shifted))
+    return (_popcount(pawns & near) * ps.SHIELD_NEAR_BONUS + _popcount(far) * ps.SHIELD_FAR_BONUS
+            - missing * ps.SHIELD_MISSING_PENALTY)
+
+
+def _taper(early, end, endgame_t):
+    # Cùng thứ tự phép tính với bản vô hướng để phép cắt int() cho kết quả giống hệt
+    return np.trunc(early * (1 - endgame_t) + end * endgame_t).astype(np.int64)
+
+
+def _scale_factor(counts, material, enemy_material, bishop_value: int):
+    """Tương đương MaterialTable.scale_factor cho cả lô; counts có cột 0..4 = tốt..hậu."""
+    pieces = counts[:, 1:5].sum(axis=1)
+    no_pawns = counts[:, 0] == 0
+    no_heavy = (counts[:, 3] == 0) & (counts[:, 4] == 0)
+    no_win = no_pawns & (((pieces <= 1) & no_heavy) | ((pieces == 2) & (counts[:, 1] == 2)))
+    drawish = no_pawns & (material - enemy_material <= bishop_value)
+    return np.where(no_win, SCALE_NO_WIN, np.where(drawish, SCALE_DRAWISH, SCALE_NORMAL))
+
+
+def encode_boards(boards: Iterable[chess.Board]):
+    """Mã hóa các bàn cờ thành (bitboards uint64 dạng (N, 12), turns bool dạng (N,))."""
+    _require_numpy()
+    boards = list(boards)
+    bitboards = np.array([[board.pieces_mask(piece_type, color) for color, piece_type in PLANES]
+                          for board in boards], dtype=np.uint64).reshape(len(boards), len(PLANES))
+    turns = np.array([board.turn for board in boards], dtype=bool)
+    return bitboards, turns
+
+
+def encode_fens(fens: Iterable[str]):
+    return encode_boards(chess.Board(fen) for fen in fens)
+
+
+def planes_to_bitboards(planes):
+    """Chuyển mảng 12x64 (N, 12, 64), ô a1 ở cột 0, thành bitboard uint64 dạng (N, 12)."""
+    _require_numpy()
+    packed = np.packbits(np.asarray(planes, dtype=bool), axis=-1, bitorder="little")
+    return np.ascontiguousarray(packed).view("<u8").reshape(packed.shape[:-1]).astype(np.uint64)
+
+
+def _as_bitboards(positions):
+    _require_numpy()
+    positions = np.asarray(positions)
+    if positions.ndim == 3:
+        positions = planes_to_bitboards(positions)
+    return positions.astype(np.uint64, copy=False)
+
+
+def evaluate_batch(evaluation, positions, turns, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Đánh giá cả lô theo góc nhìn bên đi, trả về mảng int64 giống Evaluation.evaluate.
+    positions là bitboard (N, 12) uint64 hoặc mảng (N, 12, 64); turns là True nếu trắng đi.
+    """
+    positions = _as_bitboards(positions)
+    turns = np.asarray(turns, dtype=bool)
+
+    scores = np.empty(len(positions), dtype=np.int64)
+    for start in range(0, len(positions), chunk_size):
+        stop = start + chunk_size
+        eval_sum, scale, insufficient = _evaluate_chunk(evaluation, positions[start:stop])
+        eval_sum = np.where(scale == SCALE_NORMAL, eval_sum,
+                            np.trunc(eval_sum * scale / SCALE_NORMAL).astype(np.int64))
+        eval_sum = np.where(insufficient, 0, eval_sum)
+        scores[start:stop] = np.where(turns[start:stop], eval_sum, -eval_sum)
+    return scores
+
+
+def evaluate_batch_unscaled(evaluation, positions, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Điểm theo góc nhìn bên trắng trước khi co điểm, cùng hệ số co (phần 64) và cờ thiếu chất
+    của từng thế cờ. Dùng cho công cụ offline cần phần tuyến tính của hàm đánh giá (ví dụ tuning).
+    """
+    positions = _as_bitboards(positions)
+    eval_sum = np.empty(len(positions), dtype=np.int64)
+    scale = np.empty(len(positions), dtype=np.int64)
+    insufficient = np.empty(len(positions), dtype=bool)
+    for start in range(0, len(positions), chunk_size):
+        stop = start + chunk_size
+        eval_sum[start:stop], scale[start:stop], insufficient[start:stop] = \
+            _evaluate_chunk(evaluation, positions[start:stop])
+    return eval_sum, scale, insufficient
+
+
+def _pst_sum(planes, tables):
+    return np.einsum("nps,ps->n", planes, tables, dtype=np.int64)
+
+
+def _pst_tables(evaluation, source: list, piece_types: tuple):
+    tables = np.zeros((2, 6, 64), dtype=np.int64)
+    for side, color in enumerate((chess.WHITE, chess.BLACK)):
+        for piece_type in piece_types:
+            tables[side, piece_type - 1] = source[color][piece_type]
+    return tables
+
+
+def _evaluate_chunk(evaluation, bitboards):
+    """Trả về (điểm theo góc nhìn trắng chưa co, hệ số co của bên hơn, cờ thiếu chất)."""
+    n = len(bitboards)
+    planes = np.unpackbits(bitboards.astype("<u8").view(np.uint8).reshape(n, 12, 8),
+                           axis=-1, bitorder="little").reshape(n, 2, 6, 64)
+    counts = _popcount(bitboards).reshape(n, 2, 6)
+
+    values = np.array([evaluation.PIECE_VALUES[piece_type] for piece_type in chess.PIECE_TYPES], dtype=np.int64)
+    material = counts @ values
+
+    weights = np.array([0, evaluation.KNIGHT_ENDGAME_WEIGHT, evaluation.BISHOP_ENDGAME_WEIGHT,
+                        evaluation.ROOK_ENDGAME_WEIGHT, evaluation.QUEEN_ENDGAME_WEIGHT, 0], dtype=np.int64)
+    endgame_t = 1 - np.minimum(1, (counts @ weights) / evaluation.ENDGAME_START_WEIGHT)
+
+    flat = _pst_tables(evaluation, evaluation.flat_pst, (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN))
+    early = _pst_tables(evaluation, evaluation.early_pst, (chess.PAWN, chess.KING))
+    end = _pst_tables(evaluation, evaluation.end_pst, (chess.PAWN, chess.KING))
+
+    occupied_co = [np.bitwise_or.reduce(bitboards[:, side * 6:side * 6 + 6], axis=1) for side in (0, 1)]
+    occupied = occupied_co[0] | occupied_co[1]
+    attacks = [_attacks(bitboards, chess.WHITE, occupied), _attacks(bitboards, chess.BLACK, occupied)]
+    pawns = [bitboards[:, 0], bitboards[:, 6]]
+    king_squares = [_popcount(bitboards[:, 5] - np.uint64(1)), _popcount(bitboards[:, 11] - np.uint64(1))]
+
+    scores = []
+    for side, color in enumerate((chess.WHITE, chess.BLACK)):
+        enemy = 1 - side
+        enemy_t = endgame_t[:, enemy]
+        side_planes = planes[:, side]
+
+        score = material[:, side] + _pst_sum(side_planes, flat[side])
+        pawn_plane = side_planes[:, chess.PAWN - 1:chess.PAWN]
+        king_plane = side_planes[:, chess.KING - 1:chess.KING]
+        score += _taper(_pst_sum(pawn_plane, early[side, chess.PAWN - 1:chess.PAWN]),
+                        _pst_sum(pawn_plane, end[side, chess.PAWN - 1:chess.PAWN]), enemy_t)
+        score += _taper(_pst_sum(king_plane, early[side, chess.KING - 1:chess.KING]),
+                        _pst_sum(king_plane, end[side, chess.KING - 1:chess.KING]), enemy_t)
+
+        # Quân treo: bị đối phương tấn công mà không được bảo vệ
+        hanging = occupied_co[side] & attacks[enemy] & ~attacks[side]
+        for piece_type, penalty in evaluation.hanging_penalties:
+            score -= _popcount(bitboards[:, side * 6 + piece_type - 1] & hanging) * penalty
+
+        # Mop-up khi hơn chất rõ rệt trong tàn cuộc
+        my_king = king_squares[side]
+        enemy_king = king_squares[enemy]
+        distance = np.maximum(np.abs((my_king & 7) - (enemy_king & 7)), np.abs((my_king >> 3) - (enemy_king >> 3)))
+        enemy_file = enemy_king & 7
+        enemy_rank = enemy_king >> 3
+        centre = 6 - np.minimum(enemy_file, 7 - enemy_file) - np.minimum(enemy_rank, 7 - enemy_rank)
+        mop_up = np.trunc(((14 - distance) * 4 + centre * 10) * enemy_t).astype(np.int64)
+        winning = (material[:, side] > material[:, enemy] + 2 * evaluation.PAWN_VALUE) & (enemy_t > 0)
+        score += np.where(winning, mop_up, 0)
+
+        # Cấu trúc tốt và lá chắn tốt trước vua
+        structure_early, structure_end = _pawn_structure(pawns[side], pawns[enemy], color)
+        score += _taper(structure_early, structure_end, enemy_t)
+        score += np.trunc(_pawn_shield(pawns[side], king_squares[side], color) * (1 - enemy_t)).astype(np.int64)
+        scores.append(score)
+
+    eval_sum = scores[0] - scores[1]
+
+    # Hệ số co điểm của bên đang hơn và trường hợp thiếu chất
+    white_scale = _scale_factor(counts[:, 0], material[:, 0], material[:, 1], evaluation.BISHOP_VALUE)
+    black_scale = _scale_factor(counts[:, 1], material[:, 1], material[:, 0], evaluation.BISHOP_VALUE)
+    scale = np.where(eval_sum > 0, white_scale, black_scale)
+
+    heavy = counts[:, :, [chess.PAWN - 1, chess.ROOK - 1, chess.QUEEN - 1]].sum(axis=(1, 2))
+    minors = counts[:, :, [chess.KNIGHT - 1, chess.BISHOP - 1]].sum(axis=(1, 2))
+    return eval_sum, scale, (heavy == 0) & (minors <= 1)
@@ -1,5 +1,29 @@
 import chess
 from evaluation.piece_values import PieceSquareTables as PST
+from evaluation.pawn_structure import PAWN_KEYS, PawnHashTable, pawn_key, pawn_shield_terms
+from evaluation.material_table import MaterialEntry, MaterialTable, MATERIAL_KEY_UNIT, SIDE_KEY_BITS, SCALE_NORMAL
+
+# --- Chỉ số các bộ tích lũy cho mỗi bên ---
+# 0: điểm chất, 1..5: số quân theo loại (tốt..hậu), 6: PST cố định,
+# 7/8: PST tốt đầu/cuối ván, 9/10: PST vua đầu/cuối ván, 11: khóa Zobrist tốt của bên đó,
+# 12: khóa chất của bên đó (xem material_table)
+MATERIAL = 0
+PST_SCORE = 6
+PAWN_EARLY = 7
+PAWN_END = 8
+KING_EARLY = 9
+KING_END = 10
+PAWN_KEY = 11
+MATERIAL_KEY = 12
+FIELDS = 13
+
+BB_NOT_FILE_A = chess.BB_ALL & ~chess.BB_FILE_A
+BB_NOT_FILE_H = chess.BB_ALL & ~chess.BB_FILE_H
+
+
+def _table_for(color: chess.Color, table: list) -> list:
+    return [table[square if color == chess.WHITE else chess.square_mirror(square)] for square in chess.SQUARES]
+
 
 class EvaluationData:
     """Lưu trữ các thành phần điểm đánh giá cho một bên."""
@@ -34,11 +58,11 @@ class MaterialInfo:
 
 class Evaluation:
     # --- Giá trị chất của quân cờ ---
-    PAWN_VALUE = 100
-    KNIGHT_VALUE = 300
-    BISHOP_VALUE = 320
-    ROOK_VALUE = 500
-    QUEEN_VALUE = 900
+    PAWN_VALUE = PST.pawn_value
+    KNIGHT_VALUE = PST.knight_value
+    BISHOP_VALUE = PST.bishop_value
+    ROOK_VALUE = PST.rook_value
+    QUEEN_VALUE = PST.queen_value
     
     PIECE_VALUES = {
         chess.PAWN: PAWN_VALUE,
@@ -51,78 +75,259 @@ class Evaluation:
 
     CHECKMATE_SCORE = 100000
 
+    # --- Trọng số xác định giai đoạn tàn cuộc ---
+    QUEEN_ENDGAME_WEIGHT = 45
+    ROOK_ENDGAME_WEIGHT = 20
+    BISHOP_ENDGAME_WEIGHT = 10
+    KNIGHT_ENDGAME_WEIGHT = 10
+
+    ENDGAME_START_WEIGHT = (2 * ROOK_ENDGAME_WEIGHT + 2 * BISHOP_ENDGAME_WEIGHT +
+                            2 * KNIGHT_ENDGAME_WEIGHT + QUEEN_ENDGAME_WEIGHT)
+
     
+    FLAT_TABLES = {
+        chess.KNIGHT: PST.knight,
+        chess.BISHOP: PST.bishop,
+        chess.ROOK: PST.rook,
+        chess.QUEEN: PST.queen,
+    }
+
     def __init__(self):
         self.board: chess.Board = None
         self.white_eval: EvaluationData = None
         self.black_eval: EvaluationData = None
 
+        # Bảng PST theo góc nhìn từng bên: [color][piece_type][square]
+        self.flat_pst = [{}, {}]
+        self.early_pst = [{}, {}]
+        self.end_pst = [{}, {}]
+        for color in chess.COLORS:
+            for piece_type, table in self.FLAT_TABLES.items():
+                self.flat_pst[color][piece_type] = _table_for(color, table)
+            self.early_pst[color][chess.PAWN] = _table_for(color, PST.pawn_start)
+            self.end_pst[color][chess.PAWN] = _table_for(color, PST.pawn_end)
+            self.early_pst[color][chess.KING] = _table_for(color, PST.king_start)
+            self.end_pst[color][chess.KING] = _table_for(color, PST.king_end)
+
+        self.pawn_table = PawnHashTable()
+        self.material_table = MaterialTable(self)
+        self.hanging_penalties = [(piece_type, value // 4) for piece_type, value in self.PIECE_VALUES.items() if value]
+        self._scratch_state = [0] * (2 * FIELDS)
+
     def evaluate(self, board: chess.Board) -> int:
+        """Đường nhanh: đếm quân bằng popcount, bảng tấn công dạng bitboard, không cấp phát đối tượng."""
+        self.board = board
+        return self.evaluate_state(board, self.fill_state(board, self._scratch_state))
+
+    def evaluate_detailed(self, board: chess.Board) -> int:
+        """Bản đánh giá đầy đủ, lưu từng thành phần vào white_eval/black_eval."""
         self.board = board
         self.white_eval = EvaluationData()
         self.black_eval = EvaluationData()
 
-        white_material = self.get_material_info(chess.WHITE)
-        black_material = self.get_material_info(chess.BLACK)
+        # Một lần tra bảng chất cho cả hai bên
+        material = self.material_entry(board)
+        if material.insufficient:
+            return 0
+        white_endgame_t = material.white_endgame_t
+        black_endgame_t = material.black_endgame_t
+        white_pawns = board.pieces_mask(chess.PAWN, chess.WHITE)
+        black_pawns = board.pieces_mask(chess.PAWN, chess.BLACK)
 
         # 1. Điểm chất
-        self.white_eval.material_score = white_material.material_score
-        self.black_eval.material_score = black_material.material_score
+        self.white_eval.material_score = material.white_material
+        self.black_eval.material_score = material.black_material
 
         # 2. Điểm vị trí quân cờ (PST)
-        self.white_eval.piece_square_score = self.evaluate_piece_square_tables(chess.WHITE, black_material.endgame_t)
-        self.black_eval.piece_square_score = self.evaluate_piece_square_tables(chess.BLACK, white_material.endgame_t)
+        self.white_eval.piece_square_score = self.evaluate_piece_square_tables(chess.WHITE, black_endgame_t)
+        self.black_eval.piece_square_score = self.evaluate_piece_square_tables(chess.BLACK, white_endgame_t)
 
         # 3. Điểm "dọn dẹp" (Mop-up) trong tàn cuộc thắng thế
-        self.white_eval.mop_up_score = self.mop_up_eval(chess.WHITE, white_material, black_material)
-        self.black_eval.mop_up_score = self.mop_up_eval(chess.BLACK, black_material, white_material)
+        self.white_eval.mop_up_score = self.mop_up_score(chess.WHITE, material.white_material,
+                                                         material.black_material, black_endgame_t)
+        self.black_eval.mop_up_score = self.mop_up_score(chess.BLACK, material.black_material,
+                                                         material.white_material, white_endgame_t)
+
+        # 4. Cấu trúc tốt (qua bảng băm tốt) và lá chắn tốt trước vua
+        pawn_entry = self.pawn_table.probe(pawn_key(white_pawns, black_pawns), white_pawns, black_pawns)
+        self.white_eval.pawn_score = self.pawn_structure_score(pawn_entry, chess.WHITE, black_endgame_t)
+        self.black_eval.pawn_score = self.pawn_structure_score(pawn_entry, chess.BLACK, white_endgame_t)
+        self.white_eval.pawn_shield_score = self.pawn_shield_score(chess.WHITE, white_pawns, black_endgame_t)
+        self.black_eval.pawn_shield_score = self.pawn_shield_score(chess.BLACK, black_pawns, white_endgame_t)
         
-        # Tính toán tổng điểm và trả về theo góc nhìn
-        eval_sum = self.white_eval.sum() - self.black_eval.sum()
+        # Tính toán tổng điểm (co lại nếu bên hơn khó thắng) và trả về theo góc nhìn
+        eval_sum = self.scale_eval(self.white_eval.sum() - self.black_eval.sum(), material)
         perspective = 1 if self.board.turn == chess.WHITE else -1
         
         return eval_sum * perspective
         # return eval_sum
-    
-    def get_material_info(self, color: chess.Color) -> MaterialInfo:
-        num_pawns = len(self.board.pieces(chess.PAWN, color))
-        num_knights = len(self.board.pieces(chess.KNIGHT, color))
-        num_bishops = len(self.board.pieces(chess.BISHOP, color))
-        num_rooks = len(self.board.pieces(chess.ROOK, color))
-        num_queens = len(self.board.pieces(chess.QUEEN, color))
 
-        pawns = self.board.pieces_mask(chess.PAWN, color)
-        enemy_pawns = self.board.pieces_mask(chess.PAWN, not color)
+    def evaluate_batch(self, positions, turns):
+        """Đánh giá cả lô bitboard (N, 12) hoặc mảng (N, 12, 64) bằng NumPy, kết quả giống evaluate."""
+        from evaluation.batch_evaluation import evaluate_batch
+        return evaluate_batch(self, positions, turns)
 
-        material_score = (
-            num_pawns * self.PAWN_VALUE + num_knights * self.KNIGHT_VALUE +
-            num_bishops * self.BISHOP_VALUE + num_rooks * self.ROOK_VALUE +
-            num_queens * self.QUEEN_VALUE
-        )
-        
-        num_majors = num_rooks + num_queens
-        num_minors = num_bishops + num_knights
+    def material_entry(self, board: chess.Board) -> MaterialEntry:
+        """Tra bảng chất với khóa tính bằng popcount từ bitboard."""
+        key = 0
+        for color, shift in ((chess.WHITE, 0), (chess.BLACK, SIDE_KEY_BITS)):
+            occupied = board.occupied_co[color]
+            for piece_type, mask in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                                     (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                                     (chess.QUEEN, board.queens)):
+                key += chess.popcount(mask & occupied) * MATERIAL_KEY_UNIT[piece_type] << shift
+        return self.material_table.probe(key)
 
-        QUEEN_ENDGAME_WEIGHT = 45
-        ROOK_ENDGAME_WEIGHT = 20
-        BISHOP_ENDGAME_WEIGHT = 10
-        KNIGHT_ENDGAME_WEIGHT = 10
+    def scale_eval(self, eval_sum: int, material: MaterialEntry) -> int:
+        """Co điểm theo hệ số của bên đang hơn (ví dụ chỉ còn một quân nhẹ, không tốt)."""
+        scale = material.white_scale if eval_sum > 0 else material.black_scale
+        if scale == SCALE_NORMAL:
+            return eval_sum
+        return int(eval_sum * scale / SCALE_NORMAL)
 
-        ENDGAME_START_WEIGHT = (2 * ROOK_ENDGAME_WEIGHT + 2 * BISHOP_ENDGAME_WEIGHT + 
-                                2 * KNIGHT_ENDGAME_WEIGHT + QUEEN_ENDGAME_WEIGHT)
+    def fill_state(self, board: chess.Board, state: list) -> list:
+        """Tính các bộ tích lũy chất và PST cho cả hai bên trực tiếp từ bitboard."""
+        for color in chess.COLORS:
+            base = 0 if color == chess.WHITE else FIELDS
+            occupied = board.occupied_co[color]
+            flat_pst = self.flat_pst[color]
 
-        endgame_weight_sum = (
-            num_queens * QUEEN_ENDGAME_WEIGHT + num_rooks * ROOK_ENDGAME_WEIGHT +
-            num_bishops * BISHOP_ENDGAME_WEIGHT + num_knights * KNIGHT_ENDGAME_WEIGHT
+            pst_score = 0
+            for piece_type, mask in ((chess.KNIGHT, board.knights), (chess.BISHOP, board.bishops),
+                                     (chess.ROOK, board.rooks), (chess.QUEEN, board.queens)):
+                mask &= occupied
+                state[base + piece_type] = chess.popcount(mask)
+                table = flat_pst[piece_type]
+                for square in chess.scan_forward(mask):
+                    pst_score += table[square]
+
+            pawns = board.pawns & occupied
+            state[base + chess.PAWN] = chess.popcount(pawns)
+            early = self.early_pst[color][chess.PAWN]
+            end = self.end_pst[color][chess.PAWN]
+            keys = PAWN_KEYS[color]
+            pawn_early = pawn_end = key = 0
+            for square in chess.scan_forward(pawns):
+                pawn_early += early[square]
+                pawn_end += end[square]
+                key ^= keys[square]
+            state[base + PAWN_KEY] = key
+
+            state[base + KING_EARLY] = state[base + KING_END] = 0
+            for square in chess.scan_forward(board.kings & occupied):
+                state[base + KING_EARLY] += self.early_pst[color][chess.KING][square]
+                state[base + KING_END] += self.end_pst[color][chess.KING][square]
+
+            state[base + MATERIAL] = (
+                state[base + chess.PAWN] * self.PAWN_VALUE + state[base + chess.KNIGHT] * self.KNIGHT_VALUE +
+                state[base + chess.BISHOP] * self.BISHOP_VALUE + state[base + chess.ROOK] * self.ROOK_VALUE +
+                state[base + chess.QUEEN] * self.QUEEN_VALUE
+            )
+            state[base + MATERIAL_KEY] = (
+                state[base + chess.PAWN] * MATERIAL_KEY_UNIT[chess.PAWN]
+                + state[base + chess.KNIGHT] * MATERIAL_KEY_UNIT[chess.KNIGHT]
+                + state[base + chess.BISHOP] * MATERIAL_KEY_UNIT[chess.BISHOP]
+                + state[base + chess.ROOK] * MATERIAL_KEY_UNIT[chess.ROOK]
+                + state[base + chess.QUEEN] * MATERIAL_KEY_UNIT[chess.QUEEN]
+            )
+            state[base + PST_SCORE] = pst_score
+            state[base + PAWN_EARLY] = pawn_early
+            state[base + PAWN_END] = pawn_end
+        return state
+
+    def update_state(self, state: list, color: chess.Color, piece_type: chess.PieceType,
+                     square: chess.Square, sign: int):
+        """Cộng (sign = 1) hoặc trừ (sign = -1) một quân khỏi các bộ tích lũy."""
+        base = 0 if color == chess.WHITE else FIELDS
+        if piece_type == chess.KING:
+            state[base + KING_EARLY] += sign * self.early_pst[color][chess.KING][square]
+            state[base + KING_END] += sign * self.end_pst[color][chess.KING][square]
+            return
+
+        state[base + MATERIAL] += sign * self.PIECE_VALUES[piece_type]
+        state[base + piece_type] += sign
+        state[base + MATERIAL_KEY] += sign * MATERIAL_KEY_UNIT[piece_type]
+        if piece_type == chess.PAWN:
+            state[base + PAWN_EARLY] += sign * self.early_pst[color][chess.PAWN][square]
+            state[base + PAWN_END] += sign * self.end_pst[color][chess.PAWN][square]
+            state[base + PAWN_KEY] ^= PAWN_KEYS[color][square]
+        else:
+            state[base + PST_SCORE] += sign * self.flat_pst[color][piece_type][square]
+
+    def evaluate_state(self, board: chess.Board, state: list) -> int:
+        """Kết hợp các bộ tích lũy với các thành phần phụ thuộc vị trí (quân treo, mop-up)."""
+        b = FIELDS
+
+        material = self.material_table.probe(state[MATERIAL_KEY] | state[b + MATERIAL_KEY] << SIDE_KEY_BITS)
+        if material.insufficient:
+            return 0
+        white_endgame_t = material.white_endgame_t
+        black_endgame_t = material.black_endgame_t
+
+        white_attacks = self.attack_mask(chess.WHITE)
+        black_attacks = self.attack_mask(chess.BLACK)
+
+        white_pawns = board.pawns & board.occupied_co[chess.WHITE]
+        black_pawns = board.pawns & board.occupied_co[chess.BLACK]
+        pawn_entry = self.pawn_table.probe(state[PAWN_KEY] ^ state[b + PAWN_KEY], white_pawns, black_pawns)
+
+        # PST của mỗi bên được nội suy theo giai đoạn tàn cuộc của đối phương
+        white_score = (
+            state[MATERIAL] + state[PST_SCORE]
+            + int(state[PAWN_EARLY] * (1 - black_endgame_t) + state[PAWN_END] * black_endgame_t)
+            + int(state[KING_EARLY] * (1 - black_endgame_t) + state[KING_END] * black_endgame_t)
+            - self.hanging_piece_penalty(chess.WHITE, white_attacks, black_attacks)
+            + self.mop_up_score(chess.WHITE, state[MATERIAL], state[b + MATERIAL], black_endgame_t)
+            + self.pawn_structure_score(pawn_entry, chess.WHITE, black_endgame_t)
+            + self.pawn_shield_score(chess.WHITE, white_pawns, black_endgame_t)
         )
-        
-        endgame_t = 1 - min(1, endgame_weight_sum / ENDGAME_START_WEIGHT)
+        black_score = (
+            state[b + MATERIAL] + state[b + PST_SCORE]
+            + int(state[b + PAWN_EARLY] * (1 - white_endgame_t) + state[b + PAWN_END] * white_endgame_t)
+            + int(state[b + KING_EARLY] * (1 - white_endgame_t) + state[b + KING_END] * white_endgame_t)
+            - self.hanging_piece_penalty(chess.BLACK, black_attacks, white_attacks)
+            + self.mop_up_score(chess.BLACK, state[b + MATERIAL], state[MATERIAL], white_endgame_t)
+            + self.pawn_structure_score(pawn_entry, chess.BLACK, white_endgame_t)
+            + self.pawn_shield_score(chess.BLACK, black_pawns, white_endgame_t)
+        )
+
+        eval_sum = self.scale_eval(white_score - black_score, material)
+        return eval_sum if board.turn == chess.WHITE else -eval_sum
+
+    # Evaluation thường không theo dõi nước đi; lớp đánh giá gia tăng ghi đè các hàm này
+    def reset(self, board: chess.Board):
+        pass
+
+    def push(self, board: chess.Board, move: chess.Move):
+        pass
+
+    def pop(self):
+        pass
+    
+    def get_material_info(self, color: chess.Color) -> MaterialInfo:
+        material = self.material_entry(self.board)
+        if color == chess.WHITE:
+            counts, material_score, endgame_t = material.white_counts, material.white_material, material.white_endgame_t
+        else:
+            counts, material_score, endgame_t = material.black_counts, material.black_material, material.black_endgame_t
+
+        pawns = self.board.pieces_mask(chess.PAWN, color)
+        enemy_pawns = self.board.pieces_mask(chess.PAWN, not color)
 
         return MaterialInfo(
-            material_score, num_pawns, num_majors, num_minors, num_bishops, num_queens,
-            num_rooks, pawns, enemy_pawns, endgame_t
+            material_score, counts[chess.PAWN], counts[chess.ROOK] + counts[chess.QUEEN],
+            counts[chess.KNIGHT] + counts[chess.BISHOP], counts[chess.BISHOP], counts[chess.QUEEN],
+            counts[chess.ROOK], pawns, enemy_pawns, endgame_t
         )
     
+    def compute_endgame_t(self, num_queens: int, num_rooks: int, num_bishops: int, num_knights: int) -> float:
+        endgame_weight_sum = (
+            num_queens * self.QUEEN_ENDGAME_WEIGHT + num_rooks * self.ROOK_ENDGAME_WEIGHT +
+            num_bishops * self.BISHOP_ENDGAME_WEIGHT + num_knights * self.KNIGHT_ENDGAME_WEIGHT
+        )
+
+        return 1 - min(1, endgame_weight_sum / self.ENDGAME_START_WEIGHT)
+
     def evaluate_piece_square_tables(self, color: chess.Color, endgame_t: float) -> int:
         score = 0
         pawn_early = 0
@@ -152,12 +357,7 @@ class Evaluation:
                     king_early += PST.king_start[pst_index]
                     king_end += PST.king_end[pst_index]
 
-                if self.board.is_attacked_by(not color, square):
-                    # Nếu quân này không được đồng đội bảo vệ
-                    if not self.board.is_attacked_by(color, square):
-                        # Phạt dựa trên giá trị quân (tốt ít, hậu nhiều)
-                        penalty = self.PIECE_VALUES[piece_type] // 4
-                        score -= penalty
+        score -= self.hanging_piece_penalty(color)
 
         # --- Kết hợp PST giữa đầu và cuối ván ---
         score += int(pawn_early * (1 - endgame_t) + pawn_end * endgame_t)
@@ -165,6 +365,55 @@ class Evaluation:
         
         return score
     
+    def attack_mask(self, color: chess.Color) -> int:
+        """Bitboard tất cả các ô bị bên color tấn công."""
+        board = self.board
+        occupied = board.occupied_co[color]
+
+        pawns = board.pawns & occupied
+        if color == chess.WHITE:
+            attacks = ((pawns & BB_NOT_FILE_A) << 7 | (pawns & BB_NOT_FILE_H) << 9) & chess.BB_ALL
+        else:
+            attacks = (pawns & BB_NOT_FILE_A) >> 9 | (pawns & BB_NOT_FILE_H) >> 7
+
+        for square in chess.scan_forward(board.knights & occupied):
+            attacks |= chess.BB_KNIGHT_ATTACKS[square]
+        for square in chess.scan_forward((board.bishops | board.rooks | board.queens) & occupied):
+            attacks |= board.attacks_mask(square)
+        for square in chess.scan_forward(board.kings & occupied):
+            attacks |= chess.BB_KING_ATTACKS[square]
+        return attacks
+
+    def hanging_piece_penalty(self, color: chess.Color, own_attacks: int = None, enemy_attacks: int = None) -> int:
+        """Phạt các quân đang bị tấn công mà không được đồng đội bảo vệ."""
+        if own_attacks is None:
+            own_attacks = self.attack_mask(color)
+        if enemy_attacks is None:
+            enemy_attacks = self.attack_mask(not color)
+
+        # Quân bị tấn công nhưng không được đồng đội bảo vệ
+        hanging = self.board.occupied_co[color] & enemy_attacks & ~own_attacks
+        if not hanging:
+            return 0
+
+        # Phạt dựa trên giá trị quân (tốt ít, hậu nhiều)
+        penalty = 0
+        for piece_type, piece_penalty in self.hanging_penalties:
+            penalty += chess.popcount(self.board.pieces_mask(piece_type, color) & hanging) * piece_penalty
+        return penalty
+
+    def pawn_structure_score(self, pawn_entry: tuple, color: chess.Color, enemy_endgame_t: float) -> int:
+        """Nội suy điểm cấu trúc tốt (đầu/cuối ván) của một bên từ entry của bảng băm tốt."""
+        offset = 0 if color == chess.WHITE else 2
+        return int(pawn_entry[offset] * (1 - enemy_endgame_t) + pawn_entry[offset + 1] * enemy_endgame_t)
+
+    def pawn_shield_score(self, color: chess.Color, pawns: int, enemy_endgame_t: float) -> int:
+        """Lá chắn tốt trước vua, giảm dần về 0 khi đối phương vào tàn cuộc."""
+        king_square = self.board.king(color)
+        if king_square is None or enemy_endgame_t >= 1:
+            return 0
+        return int(pawn_shield_terms(color, king_square, pawns) * (1 - enemy_endgame_t))
+
     def centre_manhattan_distance(self, square: chess.Square) -> int:
         file = chess.square_file(square)
         rank = chess.square_rank(square)
@@ -178,7 +427,12 @@ class Evaluation:
         """
         Tính điểm thưởng "dọn dẹp" khi có lợi thế lớn trong tàn cuộc.
         """
-        if my_material.material_score > enemy_material.material_score + self.PAWN_VALUE * 2 and enemy_material.endgame_t > 0:
+        return self.mop_up_score(color, my_material.material_score,
+                                 enemy_material.material_score, enemy_material.endgame_t)
+
+    def mop_up_score(self, color: chess.Color, my_material_score: int,
+                     enemy_material_score: int, enemy_endgame_t: float) -> int:
+        if my_material_score > enemy_material_score + self.PAWN_VALUE * 2 and enemy_endgame_t > 0:
             mop_up_score = 0
             
             my_king_square = self.board.king(color)
@@ -190,6 +444,6 @@ class Evaluation:
             dist_enemy_king_to_centre = self.centre_manhattan_distance(enemy_king_square)
             mop_up_score += dist_enemy_king_to_centre * 10
             
-            return int(mop_up_score * enemy_material.endgame_t)
+            return int(mop_up_score * enemy_endgame_t)
             
         return 0
\ No newline at end of file
@@ -0,0 +1,69 @@
+import chess
+from evaluation.evaluation import Evaluation, FIELDS
+
+class IncrementalEvaluation(Evaluation):
+    """
+    Đánh giá gia tăng: giữ các bộ tích lũy chất và PST (đầu/cuối ván) của mỗi bên,
+    cập nhật theo push/pop thay vì quét lại toàn bộ bàn cờ. Chỉ phần nội suy theo
+    endgame_t và các thành phần phụ thuộc vị trí tấn công được tính lúc đánh giá.
+    """
+    def __init__(self, debug: bool = False):
+        super().__init__()
+        self.debug = debug
+        self.tracked_board: chess.Board = None
+        self.stack = []
+
+    def reset(self, board: chess.Board):
+        self.tracked_board = board
+        self.stack = [self.fill_state(board, [0] * (2 * FIELDS))]
+
+    def push(self, board: chess.Board, move: chess.Move):
+        state = self.stack[-1].copy()
+        self.stack.append(state)
+        if not move:
+            return
+
+        color = board.turn
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+
+        if piece_type == chess.KING and board.is_castling(move):
+            kingside = board.is_kingside_castling(move)
+            rank_start = from_square & ~7
+            if board.chess960 or board.piece_type_at(to_square) == chess.ROOK:
+                rook_from = to_square
+            else:
+                rook_from = rank_start + (7 if kingside else 0)
+            self.update_state(state, color, chess.KING, from_square, -1)
+            self.update_state(state, color, chess.ROOK, rook_from, -1)
+            self.update_state(state, color, chess.KING, rank_start + (6 if kingside else 2), 1)
+            self.update_state(state, color, chess.ROOK, rank_start + (5 if kingside else 3), 1)
+            return
+
+        captured_type = board.piece_type_at(to_square)
+        if captured_type:
+            self.update_state(state, not color, captured_type, to_square, -1)
+        elif piece_type == chess.PAWN and to_square == board.ep_square:
+            captured_square = to_square - 8 if color == chess.WHITE else to_square + 8
+            self.update_state(state, not color, chess.PAWN, captured_square, -1)
+
+        self.update_state(state, color, piece_type, from_square, -1)
+        self.update_state(state, color, move.promotion or piece_type, to_square, 1)
+
+    def pop(self):
+        self.stack.pop()
+
+    def evaluate(self, board: chess.Board) -> int:
+        if board is not self.tracked_board or not self.stack:
+            return super().evaluate(board)
+
+        self.board = board
+        score = self.evaluate_state(board, self.stack[-1])
+
+        if self.debug:
+            expected = self.evaluate_detailed(board)
+            if score != expected:
+                raise AssertionError(f"Incremental eval {score} != {expected} for {board.fen()}")
+
+        return score
@@ -0,0 +1,83 @@
+import chess
+
+# Khóa chất gọn: mỗi loại quân (tốt..hậu) chiếm 4 bit, mỗi bên 20 bit; bên đen dịch thêm 20 bit
+MATERIAL_KEY_BITS = 4
+SIDE_KEY_BITS = 5 * MATERIAL_KEY_BITS
+MATERIAL_KEY_UNIT = [0] + [1 << (MATERIAL_KEY_BITS * (piece_type - 1)) for piece_type in range(1, 6)]
+
+# Hệ số co điểm theo phần 64: 64 là bình thường, 0 là không thể thắng
+SCALE_NORMAL = 64
+SCALE_DRAWISH = 16
+SCALE_NO_WIN = 0
+
+
+def unpack_counts(side_key: int) -> list:
+    mask = (1 << MATERIAL_KEY_BITS) - 1
+    return [0] + [(side_key >> (MATERIAL_KEY_BITS * (piece_type - 1))) & mask for piece_type in range(1, 6)]
+
+
+class MaterialEntry:
+    """Kết quả tra bảng chất cho một cấu hình quân của cả hai bên."""
+    __slots__ = ("white_counts", "black_counts", "white_material", "black_material",
+                 "white_endgame_t", "black_endgame_t", "white_scale", "black_scale",
+                 "insufficient", "drawish")
+
+
+class MaterialTable:
+    """
+    Bảng tra theo chữ ký chất: điểm chất, giai đoạn endgame_t, cờ thiếu chất/dễ hòa
+    và hệ số co điểm cho mỗi bên. Số cấu hình chất thực tế rất nhỏ nên mỗi entry
+    chỉ được tính một lần rồi dùng lại qua một lần tra dict.
+    """
+    def __init__(self, evaluation):
+        self.evaluation = evaluation
+        self.entries = {}
+
+    def probe(self, key: int) -> MaterialEntry:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.compute(key)
+            self.entries[key] = entry
+        return entry
+
+    def compute(self, key: int) -> MaterialEntry:
+        evaluation = self.evaluation
+        white = unpack_counts(key & ((1 << SIDE_KEY_BITS) - 1))
+        black = unpack_counts(key >> SIDE_KEY_BITS)
+
+        entry = MaterialEntry()
+        entry.white_counts = white
+        entry.black_counts = black
+        entry.white_material = sum(white[piece_type] * evaluation.PIECE_VALUES[piece_type] for piece_type in range(1, 6))
+        entry.black_material = sum(black[piece_type] * evaluation.PIECE_VALUES[piece_type] for piece_type in range(1, 6))
+        entry.white_endgame_t = evaluation.compute_endgame_t(white[chess.QUEEN], white[chess.ROOK],
+                                                             white[chess.BISHOP], white[chess.KNIGHT])
+        entry.black_endgame_t = evaluation.compute_endgame_t(black[chess.QUEEN], black[chess.ROOK],
+                                                             black[chess.BISHOP], black[chess.KNIGHT])
+
+        # Thiếu chất: chỉ còn vua và nhiều nhất một quân nhẹ trên cả bàn cờ
+        no_heavy = not any(counts[piece_type] for counts in (white, black)
+                           for piece_type in (chess.PAWN, chess.ROOK, chess.QUEEN))
+        minors = white[chess.KNIGHT] + white[chess.BISHOP] + black[chess.KNIGHT] + black[chess.BISHOP]
+        entry.insufficient = no_heavy and minors <= 1
+
+        entry.white_scale = self.scale_factor(white, entry.white_material, entry.black_material)
+        entry.black_scale = self.scale_factor(black, entry.black_material, entry.white_material)
+        entry.drawish = entry.insufficient or min(entry.white_scale, entry.black_scale) < SCALE_NORMAL
+        return entry
+
+    def scale_factor(self, counts: list, material: int, enemy_material: int) -> int:
+        """Hệ số co điểm khi bên này đang hơn: không có tốt thì lợi thế nhỏ khó chuyển thành thắng."""
+        if counts[chess.PAWN]:
+            return SCALE_NORMAL
+
+        pieces = counts[chess.KNIGHT] + counts[chess.BISHOP] + counts[chess.ROOK] + counts[chess.QUEEN]
+        # Một quân nhẹ, hoặc hai mã, không thể ép chiếu hết
+        if pieces <= 1 and not counts[chess.ROOK] and not counts[chess.QUEEN]:
+            return SCALE_NO_WIN
+        if pieces == 2 and counts[chess.KNIGHT] == 2:
+            return SCALE_NO_WIN
+        # Hơn không quá một quân nhẹ (ví dụ xe đấu tượng) thường là hòa
+        if material - enemy_material <= self.evaluation.BISHOP_VALUE:
+            return SCALE_DRAWISH
+        return SCALE_NORMAL
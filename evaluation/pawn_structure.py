@@ -0,0 +1,144 @@
+import chess
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+
+# Khóa Zobrist chỉ gồm tốt, cùng bố cục Polyglot với search.zobrist: [color][square]
+PAWN_KEYS = [[POLYGLOT_RANDOM_ARRAY[64 * color + square] for square in chess.SQUARES]
+             for color in (chess.BLACK, chess.WHITE)]
+
+# --- Điểm cấu trúc tốt (đầu ván, cuối ván) ---
+# Thưởng tốt thông theo hàng tính từ phía mình (hàng 2..7)
+PASSED_PAWN_EARLY = [0, 5, 5, 10, 20, 35, 60, 0]
+PASSED_PAWN_END = [0, 10, 15, 25, 40, 65, 100, 0]
+ISOLATED_PAWN_EARLY = 10
+ISOLATED_PAWN_END = 20
+DOUBLED_PAWN_EARLY = 10
+DOUBLED_PAWN_END = 20
+
+# Lá chắn tốt trước vua (chỉ tính đầu ván): tốt ngay trước vua và cách vua một hàng
+SHIELD_NEAR_BONUS = 10
+SHIELD_FAR_BONUS = 5
+SHIELD_MISSING_PENALTY = 10
+
+
+def _adjacent_files(file: int) -> int:
+    mask = 0
+    if file > 0:
+        mask |= chess.BB_FILES[file - 1]
+    if file < 7:
+        mask |= chess.BB_FILES[file + 1]
+    return mask
+
+
+def _ranks_ahead(color: chess.Color, rank: int) -> int:
+    mask = 0
+    ranks = range(rank + 1, 8) if color == chess.WHITE else range(0, rank)
+    for ahead in ranks:
+        mask |= chess.BB_RANKS[ahead]
+    return mask
+
+
+ADJACENT_FILES = [_adjacent_files(file) for file in range(8)]
+
+# Ô phía trước trên cùng cột (FORWARD_FILE) và trên cột đó cùng hai cột kề (PASSED_MASKS)
+FORWARD_FILE = [[0] * 64, [0] * 64]
+PASSED_MASKS = [[0] * 64, [0] * 64]
+# Ô lá chắn ngay trước vua và cách vua một hàng (chỉ khi vua ở hai hàng cuối của mình)
+SHIELD_NEAR = [[0] * 64, [0] * 64]
+SHIELD_FAR = [[0] * 64, [0] * 64]
+
+for _color in chess.COLORS:
+    _step = 8 if _color == chess.WHITE else -8
+    for _square in chess.SQUARES:
+        _file = chess.square_file(_square)
+        _ahead = _ranks_ahead(_color, chess.square_rank(_square))
+        FORWARD_FILE[_color][_square] = chess.BB_FILES[_file] & _ahead
+        PASSED_MASKS[_color][_square] = (chess.BB_FILES[_file] | ADJACENT_FILES[_file]) & _ahead
+
+        _relative_rank = chess.square_rank(_square) if _color == chess.WHITE else 7 - chess.square_rank(_square)
+        if _relative_rank <= 1:
+            _files = chess.BB_FILES[_file] | ADJACENT_FILES[_file]
+            SHIELD_NEAR[_color][_square] = _files & chess.BB_RANKS[chess.square_rank(_square + _step)]
+            SHIELD_FAR[_color][_square] = _files & chess.BB_RANKS[chess.square_rank(_square + 2 * _step)]
+
+
+def pawn_key(white_pawns: int, black_pawns: int) -> int:
+    key = 0
+    for square in chess.scan_forward(white_pawns):
+        key ^= PAWN_KEYS[chess.WHITE][square]
+    for square in chess.scan_forward(black_pawns):
+        key ^= PAWN_KEYS[chess.BLACK][square]
+    return key
+
+
+def pawn_structure_terms(color: chess.Color, pawns: int, enemy_pawns: int):
+    """Điểm (đầu ván, cuối ván) của tốt thông, tốt cô lập và tốt chồng cho một bên."""
+    early = end = 0
+
+    for file_mask in chess.BB_FILES:
+        count = chess.popcount(pawns & file_mask)
+        if count > 1:
+            early -= (count - 1) * DOUBLED_PAWN_EARLY
+            end -= (count - 1) * DOUBLED_PAWN_END
+
+    forward_file = FORWARD_FILE[color]
+    passed_masks = PASSED_MASKS[color]
+    for square in chess.scan_forward(pawns):
+        if not pawns & ADJACENT_FILES[square & 7]:
+            early -= ISOLATED_PAWN_EARLY
+            end -= ISOLATED_PAWN_END
+
+        # Tốt thông: không có tốt đối phương chặn hoặc canh phía trước, và không bị tốt mình che
+        if not enemy_pawns & passed_masks[square] and not pawns & forward_file[square]:
+            rank = square >> 3 if color == chess.WHITE else 7 - (square >> 3)
+            early += PASSED_PAWN_EARLY[rank]
+            end += PASSED_PAWN_END[rank]
+
+    return early, end
+
+
+def pawn_shield_terms(color: chess.Color, king_square: int, pawns: int) -> int:
+    """Điểm lá chắn tốt trước vua (chưa nhân hệ số đầu ván)."""
+    near = SHIELD_NEAR[color][king_square]
+    if not near:
+        return 0
+    far = pawns & SHIELD_FAR[color][king_square]
+    near_pawns = chess.popcount(pawns & near)
+    # Cột lá chắn được che khi có tốt ở ô ngay trước vua hoặc ô cách một hàng trên cột đó
+    far_shifted = far >> 8 if color == chess.WHITE else (far << 8) & chess.BB_ALL
+    missing = chess.popcount(near & ~(pawns | far_shifted))
+    return (near_pawns * SHIELD_NEAR_BONUS + chess.popcount(far) * SHIELD_FAR_BONUS
+            - missing * SHIELD_MISSING_PENALTY)
+
+
+class PawnHashTable:
+    """
+    Bảng băm cấu trúc tốt, khóa bằng khóa Zobrist chỉ gồm tốt. Cấu trúc tốt hiếm khi
+    thay đổi giữa các nút nên phần lớn lần đánh giá chỉ cần một lần tra bảng.
+    Mỗi entry lưu (early, end) của trắng và đen.
+    """
+    def __init__(self, size: int = 1 << 14):
+        self.size = size
+        self.keys = [-1] * size
+        self.entries = [None] * size
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.keys = [-1] * self.size
+        self.entries = [None] * self.size
+
+    def probe(self, key: int, white_pawns: int, black_pawns: int) -> tuple:
+        self.probes += 1
+        index = key & (self.size - 1)
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+
+        entry = (pawn_structure_terms(chess.WHITE, white_pawns, black_pawns)
+                 + pawn_structure_terms(chess.BLACK, black_pawns, white_pawns))
+        self.keys[index] = key
+        self.entries[index] = entry
+        return entry
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
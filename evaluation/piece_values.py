@@ -1,4 +1,11 @@
 class PieceSquareTables:
+    # Giá trị chất (centipawn), cùng được chỉnh bởi tune.py
+    pawn_value = 100
+    knight_value = 300
+    bishop_value = 320
+    rook_value = 500
+    queen_value = 900
+
     pawn_start = [
           0,  0,   0,   0,   0,   0,  0, 0,
           5, 10,  10, -20, -20,  10, 10, 5,
@@ -16,6 +16,7 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Cờ vua 2 người")
 clock = pygame.time.Clock()
 TIMELIMIT = 3
+PONDER = True  # Máy suy nghĩ tiếp trong lúc người chơi cân nhắc nước đi
 
 # Màu sắc 
 BROWN = (240, 217, 181)
@@ -158,6 +159,23 @@ def draw_sidebar():
     # Số nước đi
     move_count = font_small.render(f"Moves: {len(board.move_stack)}", True, TEXT_COLOR)
     screen.blit(move_count, (BOARD_SIZE + 20, y_offset))
+    y_offset += 30
+
+    # Thông tin tìm kiếm của máy
+    if engine.progress is not None:
+        if engine.pondering:
+            status = "Pondering..."
+        elif engine.is_thinking():
+            status = "Thinking..."
+        else:
+            status = "Last search"
+        info = engine.progress
+        for line in (f"Engine: {status}",
+                     f"Depth: {info['depth']}  Score: {info['score']}",
+                     f"Nodes: {info['nodes']}"):
+            info_surface = font_small.render(line, True, TEXT_COLOR)
+            screen.blit(info_surface, (BOARD_SIZE + 20, y_offset))
+            y_offset += 22
 
 # Vẽ bàn cờ 
 def draw_board(selected_square=None):
@@ -318,15 +336,29 @@ while running:
                         if move in board.legal_moves:
                             board.push(move)
 
+                            # Đúng nước dự đoán thì tiếp tục lần ponder, ngược lại bỏ nó đi
+                            if engine.pondering:
+                                if move == engine.ponder_on:
+                                    engine.ponderhit(TIMELIMIT)
+                                    engine_thinking = True
+                                else:
+                                    engine.stop_pondering()
+
                         selected_square = None
         else:
+            # Máy suy nghĩ trong luồng nền, giao diện vẫn được vẽ lại mỗi khung hình
             if not engine_thinking:
                 engine_thinking = True
-                move = engine.run(board, time_limit=TIMELIMIT)
-                if move is not None and move in board.legal_moves:
-                    board.push(move)
-                    selected_square = move.from_square
-                engine_thinking = False
+                engine.start(board, time_limit=TIMELIMIT)
+            else:
+                move = engine.poll()
+                if not engine.is_thinking():
+                    engine_thinking = False
+                    if move is not None and move in board.legal_moves:
+                        board.push(move)
+                        selected_square = move.from_square
+                        if PONDER and not board.is_game_over():
+                            engine.start_pondering(board)
             
             # Xử lý sự kiện quit khi máy đang suy nghĩ
             for event in pygame.event.get():
@@ -344,6 +376,7 @@ while running:
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if play_again_button.collidepoint(event.pos):
                     # Reset game
+                    engine.stop_pondering()
                     board.reset()
                     selected_square = None
                     game_over = False
@@ -353,4 +386,5 @@ while running:
                     last_turn = board.turn
                     turn_start_time = time.time()
 
+engine.close()
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,415 @@
+"""
+Đấu tự động giữa hai engine để kiểm tra một thay đổi có làm engine mạnh hơn không.
+
+Mỗi bên (A và B) là một trong ba nguồn engine:
+  - mặc định: ChessEngine của cây mã hiện tại, chạy ngay trong tiến trình worker
+    (--options-a/--options-b chỉnh SearchOptions của nó);
+  - một thư mục repo hoặc git worktree (ví dụ bản trước thay đổi): chạy uci.py của thư mục
+    đó trong tiến trình con riêng, nên so sánh được hai phiên bản Searcher/Evaluation
+    hay hai bộ tham số đánh giá;
+  - một lệnh UCI bất kỳ.
+
+Mỗi khai cuộc được đánh hai ván đổi màu. Nhiều ván chạy song song trên các tiến trình
+worker, mỗi worker giữ sẵn hai engine, đồng hồ thật với thời gian cơ bản cộng increment.
+Ván đã rõ kết quả được xử (adjudicate) theo điểm của cả hai engine.
+Sau mỗi ván tính Elo của A so với B kèm khoảng tin cậy 95% và log-likelihood ratio của
+SPRT; trận dừng sớm khi LLR vượt ngưỡng. Chạy hoàn toàn offline, kết quả dạng JSON.
+"""
+import argparse
+import json
+import math
+import os
+import shlex
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.util import Finalize
+from typing import Iterator, Optional
+import chess
+import chess.engine
+import chess.pgn
+from engine import ChessEngine
+from evaluation.evaluation import Evaluation
+from search.search_options import SearchOptions
+from search.time_manager import TimeManager
+
+# Khai cuộc mặc định (SAN từ thế cờ ban đầu), đủ cân bằng để kết quả phản ánh sức mạnh engine
+OPENINGS = [
+    "e4 e5 Nf3 Nc6 Bc4 Bc5",
+    "e4 e5 Nf3 Nc6 Bb5 a6",
+    "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6",
+    "e4 e6 d4 d5 Nc3 Nf6",
+    "e4 c6 d4 d5 Nc3 dxe4 Nxe4 Bf5",
+    "d4 d5 c4 e6 Nc3 Nf6",
+    "d4 Nf6 c4 g6 Nc3 Bg7 e4 d6",
+    "d4 Nf6 c4 e6 Nf3 b6",
+    "c4 e5 Nc3 Nf6 Nf3 Nc6",
+    "Nf3 d5 g3 Nf6 Bg2 e6",
+]
+
+# Engine của worker: {"a": LocalPlayer | UciPlayer, "b": ...}, tạo một lần trong initializer
+_engines: Optional[dict] = None
+_settings: Optional[dict] = None
+
+
+def opening_fens(path: Optional[str] = None) -> list:
+    """FEN của các khai cuộc: từ file (mỗi dòng một FEN/EPD) hoặc bộ mặc định."""
+    if path is None:
+        fens = []
+        for line in OPENINGS:
+            board = chess.Board()
+            for san in line.split():
+                board.push_san(san)
+            fens.append(board.fen())
+        return fens
+
+    fens = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                board = chess.Board(" ".join(line.split()[:6]))
+            except ValueError:
+                board, _ = chess.Board.from_epd(line)
+            fens.append(board.fen())
+    return fens
+
+
+def engine_command(spec: Optional[str]) -> Optional[tuple]:
+    """
+    (lệnh, thư mục làm việc) để chạy một engine UCI; None là engine của cây mã hiện tại.
+    spec là thư mục repo/worktree (chạy uci.py của nó) hoặc một lệnh UCI.
+    """
+    if spec is None:
+        return None
+    if os.path.isdir(spec):
+        directory = os.path.abspath(spec)
+        if not os.path.exists(os.path.join(directory, "uci.py")):
+            raise ValueError(f"No uci.py in engine directory: {spec}")
+        return [sys.executable, os.path.join(directory, "uci.py")], directory
+    return shlex.split(spec), None
+
+
+class LocalPlayer:
+    """ChessEngine của cây mã hiện tại, chạy trong tiến trình worker."""
+    def __init__(self, options: dict, hash_mb: int):
+        self.engine = ChessEngine(SearchOptions.from_dict(options), hash_mb=hash_mb)
+        self.engine.searcher.verbose = False
+
+    def new_game(self, index: int):
+        self.engine.tt.clear()
+
+    def play(self, board: chess.Board, clocks: dict, increment: float) -> tuple:
+        """Nước đi và điểm (góc nhìn bên đi)."""
+        move = self.engine.run(board, TimeManager.from_clock(clocks[board.turn], increment))
+        return move, self.engine.searcher.best_score
+
+    def close(self):
+        self.engine.close()
+
+
+class UciPlayer:
+    """Engine UCI chạy trong tiến trình con (uci.py của một repo/worktree khác hoặc lệnh bất kỳ)."""
+    def __init__(self, command: tuple, hash_mb: int):
+        args, cwd = command
+        self.engine = chess.engine.SimpleEngine.popen_uci(args, cwd=cwd)
+        if "Hash" in self.engine.options:
+            self.engine.configure({"Hash": hash_mb})
+        self.game = None
+
+    def new_game(self, index: int):
+        # python-chess gửi ucinewgame khi khóa game đổi
+        self.game = index
+
+    def play(self, board: chess.Board, clocks: dict, increment: float) -> tuple:
+        limit = chess.engine.Limit(white_clock=clocks[chess.WHITE], black_clock=clocks[chess.BLACK],
+                                   white_inc=increment, black_inc=increment)
+        result = self.engine.play(board, limit, info=chess.engine.INFO_SCORE, game=self.game)
+        score = result.info.get("score")
+        return result.move, score.relative.score(mate_score=Evaluation.CHECKMATE_SCORE) if score else 0
+
+    def close(self):
+        self.engine.quit()
+
+
+def _init_worker(players: dict, hash_mb: int, settings: dict):
+    global _engines, _settings
+    _engines = {}
+    for name, (command, options) in players.items():
+        _engines[name] = UciPlayer(command, hash_mb) if command else LocalPlayer(options, hash_mb)
+        # Tắt các tiến trình engine con khi pool đóng
+        Finalize(None, _engines[name].close, exitpriority=10)
+    _settings = settings
+
+
+def _adjudicate(scores: list, settings: dict, fullmove: int) -> Optional[str]:
+    """Kết quả xử ván từ chuỗi điểm gần nhất (góc nhìn trắng, mỗi nửa nước một điểm)."""
+    resign_plies = 2 * settings["resign_moves"]
+    if len(scores) >= resign_plies:
+        recent = scores[-resign_plies:]
+        if all(score >= settings["resign_score"] for score in recent):
+            return "1-0"
+        if all(score <= -settings["resign_score"] for score in recent):
+            return "0-1"
+
+    draw_plies = 2 * settings["draw_moves"]
+    if fullmove >= settings["draw_start"] and len(scores) >= draw_plies:
+        if all(abs(score) <= settings["draw_score"] for score in scores[-draw_plies:]):
+            return "1/2-1/2"
+    return None
+
+
+def play_game(task: tuple) -> dict:
+    index, fen, a_is_white = task
+    settings = _settings
+    engines = {chess.WHITE: _engines["a" if a_is_white else "b"],
+               chess.BLACK: _engines["b" if a_is_white else "a"]}
+    for engine in engines.values():
+        engine.new_game(index)
+
+    board = chess.Board(fen)
+    clocks = {chess.WHITE: settings["base"], chess.BLACK: settings["base"]}
+    scores = []
+    moves = []
+    result = reason = None
+
+    while result is None:
+        outcome = board.outcome(claim_draw=True)
+        if outcome is not None:
+            result, reason = outcome.result(), outcome.termination.name.lower()
+            break
+        if len(moves) >= 2 * settings["max_moves"]:
+            result, reason = "1/2-1/2", "max_moves"
+            break
+
+        turn = board.turn
+        engine = engines[turn]
+        started = time.monotonic()
+        move, score = engine.play(board, clocks, settings["increment"])
+        clocks[turn] -= time.monotonic() - started
+        if move is None or clocks[turn] < 0:
+            result, reason = ("0-1" if turn == chess.WHITE else "1-0"), "time_forfeit"
+            break
+        clocks[turn] += settings["increment"]
+
+        scores.append(score if turn == chess.WHITE else -score)
+        board.push(move)
+        moves.append(move.uci())
+
+        result = _adjudicate(scores, settings, board.fullmove_number)
+        if result is not None:
+            reason = "adjudication"
+
+    points = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}[result]
+    return {
+        "index": index,
+        "fen": fen,
+        "a_is_white": a_is_white,
+        "moves": moves,
+        "result": result,
+        "reason": reason,
+        "score_a": points if a_is_white else 1 - points,
+    }
+
+
+def elo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def _score_stats(wins: int, draws: int, losses: int) -> tuple:
+    """Số ván, điểm trung bình và phương sai điểm mỗi ván của A."""
+    games = wins + draws + losses
+    if not games:
+        return 0, 0.0, 0.0
+    mean = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / games
+    return games, mean, variance
+
+
+def elo_interval(wins: int, draws: int, losses: int) -> tuple:
+    """Elo của A và nửa độ rộng khoảng tin cậy 95% (mô hình ba kết quả)."""
+    games, mean, variance = _score_stats(wins, draws, losses)
+    if not games:
+        return 0.0, 0.0
+    margin = 1.96 * math.sqrt(variance / games)
+    return elo(mean), (elo(mean + margin) - elo(mean - margin)) / 2
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """Log-likelihood ratio của GSPRT (xấp xỉ chuẩn) giữa H1: elo = elo1 và H0: elo = elo0."""
+    games, mean, variance = _score_stats(wins, draws, losses)
+    if variance == 0:
+        return 0.0
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return games * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple:
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def iter_tasks(fens: list, max_games: int) -> Iterator[tuple]:
+    for index in range(max_games):
+        # Hai ván liên tiếp dùng cùng khai cuộc, A cầm trắng ở ván chẵn
+        yield index, fens[(index // 2) % len(fens)], index % 2 == 0
+
+
+def write_pgn(path: str, games: list, names: tuple):
+    with open(path, "w") as f:
+        for record in sorted(games, key=lambda game: game["index"]):
+            board = chess.Board(record["fen"])
+            for uci in record["moves"]:
+                board.push_uci(uci)
+            game = chess.pgn.Game.from_board(board)
+            game.headers["Event"] = "match"
+            game.headers["Round"] = str(record["index"] + 1)
+            game.headers["White"], game.headers["Black"] = names if record["a_is_white"] else names[::-1]
+            game.headers["Result"] = record["result"]
+            game.headers["Termination"] = record["reason"]
+            print(game, file=f, end="\n\n")
+
+
+def run_match(players: dict, fens: list, max_games: int, workers: int, hash_mb: int,
+              settings: dict, elo0: float, elo1: float, alpha: float, beta: float) -> tuple:
+    lower, upper = sprt_bounds(alpha, beta)
+    wins = draws = losses = 0
+    games = []
+    reasons = {}
+    decision = "inconclusive"
+    llr = 0.0
+
+    start = time.monotonic()
+    tasks = iter_tasks(fens, max_games)
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(players, hash_mb, settings)) as pool:
+        # Chỉ giữ vài ván chờ cho mỗi worker để có thể dừng sớm mà không bỏ phí nhiều ván
+        pending = set()
+        for task in tasks:
+            pending.add(pool.submit(play_game, task))
+            if len(pending) >= 2 * workers:
+                break
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                games.append(record)
+                reasons[record["reason"]] = reasons.get(record["reason"], 0) + 1
+                if record["score_a"] == 1:
+                    wins += 1
+                elif record["score_a"] == 0:
+                    losses += 1
+                else:
+                    draws += 1
+
+            llr = sprt_llr(wins, draws, losses, elo0, elo1)
+            rating, margin = elo_interval(wins, draws, losses)
+            print(f"{len(games)} games: +{wins} ={draws} -{losses}, elo {rating:.1f} +- {margin:.1f}, "
+                  f"LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]", file=sys.stderr)
+            if llr >= upper or llr <= lower:
+                decision = "H1" if llr >= upper else "H0"
+                pool.shutdown(wait=False, cancel_futures=True)
+                break
+
+            for task in tasks:
+                pending.add(pool.submit(play_game, task))
+                if len(pending) >= 2 * workers:
+                    break
+
+    elapsed = time.monotonic() - start
+    rating, margin = elo_interval(wins, draws, losses)
+    summary = {
+        "games": len(games),
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": round((wins + 0.5 * draws) / len(games), 4) if games else 0.0,
+        "elo": round(rating, 1),
+        "elo_error": round(margin, 1),
+        "sprt": {"elo0": elo0, "elo1": elo1, "alpha": alpha, "beta": beta, "llr": round(llr, 3),
+                 "lower": round(lower, 3), "upper": round(upper, 3), "decision": decision},
+        "terminations": reasons,
+        "seconds": round(elapsed, 2),
+        "games_per_minute": round(60 * len(games) / elapsed, 2) if elapsed else 0.0,
+        "workers": workers,
+        "time_control": f"{settings['base']}+{settings['increment']}",
+    }
+    return summary, games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đấu hai engine với SPRT, kết quả dạng JSON.")
+    parser.add_argument("--engine-a", help="engine A (bản thử): thư mục repo/worktree hoặc lệnh UCI; "
+                                           "mặc định engine của cây mã hiện tại")
+    parser.add_argument("--engine-b", help="engine B (bản gốc): thư mục repo/worktree hoặc lệnh UCI; "
+                                           "mặc định engine của cây mã hiện tại")
+    parser.add_argument("--options-a", default="{}", help="SearchOptions dạng JSON cho engine A trong tiến trình")
+    parser.add_argument("--options-b", default="{}", help="SearchOptions dạng JSON cho engine B trong tiến trình")
+    parser.add_argument("--openings", help="file FEN/EPD khai cuộc, mặc định bộ khai cuộc có sẵn")
+    parser.add_argument("--games", type=int, default=1000, help="số ván tối đa")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--hash", type=int, default=8, help="kích thước bảng chuyển vị mỗi engine (MB)")
+    parser.add_argument("--tc", default="5+0.05", help="thời gian cơ bản + increment (giây), ví dụ 5+0.05")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--resign-score", type=int, default=800, help="xử thắng khi cả hai engine báo điểm vượt ngưỡng")
+    parser.add_argument("--resign-moves", type=int, default=3)
+    parser.add_argument("--draw-score", type=int, default=10, help="xử hòa khi điểm gần 0 đủ lâu")
+    parser.add_argument("--draw-moves", type=int, default=8)
+    parser.add_argument("--draw-start", type=int, default=40, help="chỉ xử hòa từ nước này trở đi")
+    parser.add_argument("--max-moves", type=int, default=200)
+    parser.add_argument("--pgn", help="ghi các ván đã đấu ra file PGN")
+    parser.add_argument("--output", help="ghi JSON ra file thay vì stdout")
+    args = parser.parse_args(argv)
+
+    base, _, increment = args.tc.partition("+")
+    settings = {
+        "base": float(base),
+        "increment": float(increment or 0),
+        "resign_score": args.resign_score,
+        "resign_moves": args.resign_moves,
+        "draw_score": args.draw_score,
+        "draw_moves": args.draw_moves,
+        "draw_start": args.draw_start,
+        "max_moves": args.max_moves,
+    }
+    players = {}
+    for name, spec, options in (("a", args.engine_a, args.options_a), ("b", args.engine_b, args.options_b)):
+        options = json.loads(options)
+        try:
+            command = engine_command(spec)
+        except ValueError as error:
+            parser.error(str(error))
+        if command and options:
+            parser.error(f"--options-{name} only applies to the in-process engine")
+        # Kiểm tra tên tùy chọn trước khi khởi động các worker
+        SearchOptions.from_dict(options)
+        players[name] = (command, options)
+
+    summary, games = run_match(players, opening_fens(args.openings), args.games,
+                               max(1, args.workers), args.hash, settings,
+                               args.elo0, args.elo1, args.alpha, args.beta)
+    summary["engine_a"] = args.engine_a or "local"
+    summary["engine_b"] = args.engine_b or "local"
+    summary["options_a"] = players["a"][1]
+    summary["options_b"] = players["b"][1]
+    if args.pgn:
+        write_pgn(args.pgn, games, ("A", "B"))
+
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import os
+import struct
+import zlib
+from typing import Optional, Tuple
+import chess
+
+# File bitbase: header cố định rồi tới hai mảng byte (trắng đi, đen đi) nén zlib.
+# Bên mạnh luôn được quy về quân trắng; mỗi byte là khoảng cách tới chiếu hết tính theo nửa nước:
+# mảng trắng đi lưu d (thắng sau d nửa nước), mảng đen đi lưu d + 1 (thua sau d nửa nước), 0 là hòa.
+BITBASE_MAGIC = b"PYCHESBB"
+BITBASE_VERSION = 1
+BITBASE_HEADER = struct.Struct("<8sI8sI")
+BITBASE_EXTENSION = ".bb"
+
+# Quân của bên mạnh (ngoài vua) theo thứ tự trong chỉ số; chữ ký viết theo thứ tự Q, R, B, N, P
+TABLES = {
+    "KQK": (chess.QUEEN,),
+    "KRK": (chess.ROOK,),
+    "KPK": (chess.PAWN,),
+    "KBNK": (chess.BISHOP, chess.KNIGHT),
+}
+SIGNATURE_ORDER = (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT, chess.PAWN)
+
+
+def _transpose(square: chess.Square) -> chess.Square:
+    return chess.square(chess.square_rank(square), chess.square_file(square))
+
+
+def _symmetries(pawns: bool) -> list:
+    """Các phép đối xứng của bàn cờ (bảng tra ô -> ô); có tốt thì chỉ được lật trái-phải."""
+    if pawns:
+        options = [(flip, False, False) for flip in (False, True)]
+    else:
+        options = [(flip, rank_flip, transpose)
+                   for flip in (False, True) for rank_flip in (False, True) for transpose in (False, True)]
+    return [[_apply(square, *option) for square in chess.SQUARES] for option in options]
+
+
+def _apply(square: chess.Square, flip: bool, rank_flip: bool, transpose: bool) -> chess.Square:
+    if flip:
+        square ^= 7
+    if rank_flip:
+        square ^= 56
+    if transpose:
+        square = _transpose(square)
+    return square
+
+
+def _king_slots(pawns: bool) -> list:
+    """
+    Chỉ số của vua trắng sau khi quy về miền cơ bản: cột a-d nếu có tốt,
+    tam giác a1-d1-d4 nếu không có tốt; -1 cho ô nằm ngoài miền.
+    """
+    slots = [-1] * 64
+    index = 0
+    for square in chess.SQUARES:
+        file, rank = chess.square_file(square), chess.square_rank(square)
+        if (file < 4) if pawns else (file < 4 and rank <= file):
+            slots[square] = index
+            index += 1
+    return slots
+
+
+class BitbaseLayout:
+    """
+    Cách đánh chỉ số của một bảng: (ô vua trắng đã quy về miền cơ bản, vua đen, các quân trắng),
+    mỗi ô 6 bit. Chỉ số chuẩn của một thế cờ là chỉ số nhỏ nhất qua các phép đối xứng đưa vua
+    trắng vào miền cơ bản, nên mỗi lớp thế cờ đối xứng chỉ có đúng một chỉ số.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.pieces = TABLES[name]
+        self.pawns = chess.PAWN in self.pieces
+        self.symmetries = _symmetries(self.pawns)
+        self.king_slots = _king_slots(self.pawns)
+        self.num_slots = max(self.king_slots) + 1
+        self.stride = 64 ** (len(self.pieces) + 1)
+        self.size = self.num_slots * self.stride
+
+    def index(self, squares: tuple) -> int:
+        best = self.size
+        for table in self.symmetries:
+            slot = self.king_slots[table[squares[0]]]
+            if slot < 0:
+                continue
+            index = slot
+            for square in squares[1:]:
+                index = index * 64 + table[square]
+            best = min(best, index)
+        return best
+
+
+class Bitbases:
+    """
+    Các bitbase tàn cuộc (KQK, KRK, KPK, KBNK) nạp từ thư mục do endgame.py tạo.
+    probe trả về (1 thắng / 0 hòa / -1 thua theo góc nhìn bên đi, số nửa nước tới chiếu hết)
+    hoặc None nếu thế cờ không thuộc bảng nào đã nạp hay chiếu hết không kịp trước luật 50 nước.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.layouts = {}
+        self.tables = {}
+        for name in TABLES:
+            path = os.path.join(directory, name + BITBASE_EXTENSION)
+            # KPK tra nước phong cấp trong KQK/KRK nên chỉ dùng được khi có cả hai bảng này
+            if name == "KPK" and not {"KQK", "KRK"} <= self.tables.keys():
+                continue
+            if os.path.exists(path):
+                self.layouts[name] = BitbaseLayout(name)
+                self.tables[name] = load_bitbase(path, self.layouts[name])
+        self.max_pieces = max((len(TABLES[name]) + 2 for name in self.tables), default=0)
+
+    def probe(self, board: chess.Board) -> Optional[Tuple[int, int]]:
+        if chess.popcount(board.occupied) > self.max_pieces or board.castling_rights:
+            return None
+        if chess.popcount(board.occupied_co[chess.BLACK]) == 1:
+            strong = chess.WHITE
+        elif chess.popcount(board.occupied_co[chess.WHITE]) == 1:
+            strong = chess.BLACK
+        else:
+            return None
+
+        pieces = sorted(((SIGNATURE_ORDER.index(board.piece_type_at(square)), square)
+                         for square in chess.scan_forward(board.occupied_co[strong] & ~board.kings)))
+        name = "K" + "".join(chess.piece_symbol(SIGNATURE_ORDER[order]).upper() for order, _ in pieces) + "K"
+        table = self.tables.get(name)
+        if table is None:
+            return None
+
+        # Quy bên mạnh về quân trắng bằng cách lật bàn cờ theo hàng ngang
+        flip = 0 if strong == chess.WHITE else 56
+        squares = ((board.king(strong) ^ flip, board.king(not strong) ^ flip)
+                   + tuple(square ^ flip for _, square in pieces))
+        value = table[board.turn != strong][self.layouts[name].index(squares)]
+        if value == 0:
+            return 0, 0
+        outcome, plies = (1, value) if board.turn == strong else (-1, value - 1)
+        # Bảng bỏ qua luật 50 nước: chiếu hết không kịp trước khi đồng hồ nửa nước chạm 100
+        # thì không phải kết quả chắc chắn, để Searcher tìm kiếm bình thường
+        if board.halfmove_clock + plies >= 100:
+            return None
+        return outcome, plies
+
+
+def load_bitbase(path: str, layout: BitbaseLayout) -> tuple:
+    """Đọc file bitbase, trả về (mảng trắng đi, mảng đen đi) dạng bytes."""
+    with open(path, "rb") as f:
+        header = f.read(BITBASE_HEADER.size)
+        payload = f.read()
+    if len(header) < BITBASE_HEADER.size:
+        raise ValueError("Bitbase file is truncated")
+    magic, version, name, size = BITBASE_HEADER.unpack(header)
+    if magic != BITBASE_MAGIC or version != BITBASE_VERSION:
+        raise ValueError("Not a bitbase file")
+    if name.rstrip(b"\0").decode() != layout.name or size != layout.size:
+        raise ValueError(f"Bitbase layout mismatch: {path}")
+    data = zlib.decompress(payload)
+    if len(data) != 2 * size:
+        raise ValueError("Bitbase file is truncated")
+    return data[:size], data[size:]
+
+
+def save_bitbase(path: str, layout: BitbaseLayout, white_to_move: bytes, black_to_move: bytes) -> int:
+    """Ghi file bitbase, trả về kích thước file (byte)."""
+    payload = zlib.compress(white_to_move + black_to_move, 9)
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(BITBASE_HEADER.pack(BITBASE_MAGIC, BITBASE_VERSION, layout.name.encode(), layout.size))
+        f.write(payload)
+    os.replace(temp, path)
+    return BITBASE_HEADER.size + len(payload)
@@ -0,0 +1,160 @@
+import chess
+import multiprocessing
+import queue
+import time
+from typing import Optional, Union
+from evaluation.incremental_evaluation import IncrementalEvaluation
+from search.bitbase import Bitbases
+from search.searcher import Searcher
+from search.search_options import SearchOptions
+from search.shared_transposition_table import SharedTranspositionTable
+from search.time_manager import TimeManager
+
+
+class _HelperSearcher(Searcher):
+    """Searcher của luồng phụ: mỗi lần kiểm tra thời gian thì công bố số nút cho luồng chính."""
+    def __init__(self, evaluation, tt, options, node_counts, slot: int):
+        super().__init__(evaluation, tt, options=options)
+        self.node_counts = node_counts
+        self.slot = slot
+
+    def is_time_up(self) -> bool:
+        self.node_counts[self.slot] = self.nodes
+        return super().is_time_up()
+
+
+def _helper_main(worker_id: int, tt_name: str, size_mb: int, options: dict,
+                 commands, results, stop_event, node_counts):
+    tt = SharedTranspositionTable(size_mb, name=tt_name)
+    searcher = _HelperSearcher(IncrementalEvaluation(), tt, SearchOptions.from_dict(options),
+                               node_counts, worker_id - 1)
+    searcher.stop_event = stop_event
+    searcher.verbose = False
+
+    searches = 0
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        search_id, root_fen, moves, max_depth, bitbase_path = command
+        # Nạp lại bitbase khi luồng chính đổi thư mục
+        if bitbase_path != (searcher.bitbases.directory if searcher.bitbases else None):
+            searcher.bitbases = Bitbases(bitbase_path) if bitbase_path else None
+
+        board = chess.Board(root_fen)
+        for uci in moves:
+            board.push_uci(uci)
+
+        # Các luồng phụ lệch độ sâu bắt đầu và thứ tự nước đi để tách khỏi luồng chính
+        searches += 1
+        searcher.ordering.randomize(seed=worker_id * 1000 + searches)
+        # Luồng phụ không tự quản lý thời gian, chỉ dừng theo stop_event của luồng chính
+        move = searcher.ids(board, None, max_depth, start_depth=1 + worker_id % 2)
+        node_counts[worker_id - 1] = searcher.nodes
+        results.put((search_id, worker_id, searcher.completed_depth, searcher.best_score,
+                     move.uci() if move else None, searcher.nodes))
+
+    tt.close()
+
+
+class LazySMP:
+    """
+    Tìm kiếm song song kiểu Lazy SMP: tiến trình chính và các tiến trình phụ cùng
+    chạy ids trên cùng một gốc, chia sẻ một bảng chuyển vị không khóa trong
+    shared memory. Kết quả của lần lặp hoàn thành sâu nhất được chọn.
+    """
+    RESULT_TIMEOUT = 5.0
+
+    def __init__(self, searcher: Searcher, num_helpers: int):
+        if not isinstance(searcher.tt, SharedTranspositionTable):
+            raise TypeError("LazySMP requires a SharedTranspositionTable")
+
+        self.searcher = searcher
+        self.context = multiprocessing.get_context()
+        self.stop_event = self.context.Event()
+        self.results = self.context.Queue()
+        # Số nút của từng luồng phụ trong lần tìm kiếm hiện tại, cập nhật trong lúc tìm kiếm
+        self.node_counts = self.context.Array('Q', num_helpers, lock=False)
+        self.search_id = 0
+        self.commands = []
+        self.workers = []
+        self.nodes = 0
+        self.completed_depth = 0
+        self.best_score = 0
+
+        searcher.stop_event = self.stop_event
+        for worker_id in range(1, num_helpers + 1):
+            commands = self.context.Queue()
+            worker = self.context.Process(
+                target=_helper_main,
+                args=(worker_id, searcher.tt.name, searcher.tt.size_mb, searcher.options.to_dict(),
+                      commands, self.results, self.stop_event, self.node_counts),
+                daemon=True,
+            )
+            worker.start()
+            self.commands.append(commands)
+            self.workers.append(worker)
+
+    def helper_nodes(self) -> int:
+        """Tổng số nút các luồng phụ đã duyệt trong lần tìm kiếm hiện tại."""
+        return sum(self.node_counts)
+
+    def search(self, board: chess.Board, time_limit: Union[TimeManager, float, None],
+               max_depth: int = Searcher.MAX_DEPTH, node_limit: Optional[int] = None) -> Optional[chess.Move]:
+        self.stop_event.clear()
+        # Bỏ các kết quả muộn của lần tìm kiếm trước
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+
+        # Mỗi lần tìm kiếm có id riêng: kết quả muộn của lần trước (luồng phụ quá RESULT_TIMEOUT) bị bỏ
+        self.search_id += 1
+        for slot in range(len(self.node_counts)):
+            self.node_counts[slot] = 0
+        root = board.root()
+        bitbases = self.searcher.bitbases
+        command = (self.search_id, root.fen(), [move.uci() for move in board.move_stack], max_depth,
+                   bitbases.directory if bitbases else None)
+        for commands in self.commands:
+            commands.put(command)
+
+        # Giới hạn số nút chỉ áp cho luồng chính; các luồng phụ dừng theo stop_event
+        move = self.searcher.ids(board, time_limit, max_depth, node_limit=node_limit)
+        self.stop_event.set()
+
+        best = (self.searcher.completed_depth, 0, self.searcher.best_score, move)
+        self.nodes = self.searcher.nodes
+        received = 0
+        deadline = time.monotonic() + self.RESULT_TIMEOUT
+        while received < len(self.workers):
+            try:
+                search_id, worker_id, depth, score, uci, nodes = self.results.get(
+                    timeout=max(deadline - time.monotonic(), 0.001))
+            except queue.Empty:
+                break
+            if search_id != self.search_id:
+                continue
+            received += 1
+            self.nodes += nodes
+            if not uci:
+                continue
+            helper_move = chess.Move.from_uci(uci)
+            # Ưu tiên độ sâu lớn hơn; cùng độ sâu thì giữ kết quả của luồng có id nhỏ hơn
+            if (depth, -worker_id) > (best[0], -best[1]) and board.is_legal(helper_move):
+                best = (depth, worker_id, score, helper_move)
+
+        self.completed_depth, _, self.best_score, move = best
+        return move
+
+    def close(self):
+        for commands in self.commands:
+            commands.put(None)
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=self.RESULT_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        self.commands = []
+        self.workers = []
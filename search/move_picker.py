@@ -0,0 +1,125 @@
+import chess
+import random
+
+MAX_PLY = 128
+
+# MVV_LVA[nạn nhân][quân tấn công]: ưu tiên ăn quân giá trị cao bằng quân giá trị thấp
+MVV_LVA = [[0] * 7 for _ in range(7)]
+for _victim in chess.PIECE_TYPES:
+    for _attacker in chess.PIECE_TYPES:
+        MVV_LVA[_victim][_attacker] = _victim * 10 - _attacker
+
+PROMOTION_BONUS = 100
+
+
+class MoveOrdering:
+    """Các bảng heuristic sắp xếp nước đi dùng chung trong một lần tìm kiếm."""
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+        self.counter_moves = [None] * 4096
+
+    def new_search(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # Giữ lại một nửa lịch sử từ lần tìm kiếm trước
+        for table in self.history:
+            for i, value in enumerate(table):
+                if value:
+                    table[i] = value // 2
+
+    def randomize(self, seed: int, noise: int = 8):
+        """Thêm nhiễu nhỏ vào bảng history để các luồng Lazy SMP duyệt cây theo thứ tự khác nhau."""
+        rng = random.Random(seed)
+        for table in self.history:
+            for i in range(len(table)):
+                table[i] += rng.randint(0, noise)
+
+    def update_quiet(self, board: chess.Board, move: chess.Move, depth: int, ply: int,
+                     searched_quiets: list):
+        """Cập nhật killer, history và counter-move khi một nước im lặng gây cắt beta."""
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        history = self.history[board.turn]
+        bonus = depth * depth
+        history[move.from_square * 64 + move.to_square] += bonus
+        for quiet in searched_quiets:
+            if quiet != move:
+                history[quiet.from_square * 64 + quiet.to_square] -= bonus
+
+        if board.move_stack:
+            previous = board.move_stack[-1]
+            if previous:
+                self.counter_moves[previous.from_square * 64 + previous.to_square] = move
+
+    def counter_move(self, board: chess.Board):
+        if board.move_stack:
+            previous = board.move_stack[-1]
+            if previous:
+                return self.counter_moves[previous.from_square * 64 + previous.to_square]
+        return None
+
+
+class MovePicker:
+    """
+    Sinh nước đi theo từng giai đoạn: nước trong TT, nước ăn quân (MVV-LVA),
+    killer, counter-move rồi đến nước im lặng theo history. Mỗi giai đoạn chỉ
+    được sinh khi các giai đoạn trước không gây cắt tỉa.
+    """
+    def __init__(self, board: chess.Board, ordering: MoveOrdering, tt_move, ply: int):
+        self.board = board
+        self.ordering = ordering
+        self.tt_move = tt_move
+        self.ply = ply
+
+    def __iter__(self):
+        board = self.board
+        tt_move = self.tt_move
+
+        # 1. Nước đi trong TT, kiểm tra hợp lệ mà không sinh toàn bộ nước đi
+        if tt_move and board.is_legal(tt_move):
+            yield tt_move
+        else:
+            tt_move = None
+
+        # 2. Nước ăn quân theo MVV-LVA
+        captures = []
+        for move in board.generate_legal_captures():
+            if move == tt_move:
+                continue
+            attacker = board.piece_type_at(move.from_square)
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            score = MVV_LVA[victim][attacker]
+            if move.promotion:
+                score += PROMOTION_BONUS * move.promotion
+            captures.append((score, move))
+        captures.sort(key=lambda item: item[0], reverse=True)
+        for _, move in captures:
+            yield move
+
+        # 3. Killer và counter-move
+        special = []
+        for move in (*self.ordering.killers[self.ply], self.ordering.counter_move(board)):
+            if (move and move != tt_move and move not in special
+                    and not board.is_capture(move) and board.is_legal(move)):
+                special.append(move)
+                yield move
+
+        # 4. Nước im lặng theo history
+        history = self.ordering.history[board.turn]
+        quiets = []
+        ep_square = board.ep_square
+        for move in board.generate_legal_moves(chess.BB_ALL, ~board.occupied_co[not board.turn]):
+            if move == tt_move or move in special:
+                continue
+            if move.to_square == ep_square and board.is_en_passant(move):
+                continue
+            score = history[move.from_square * 64 + move.to_square]
+            if move.promotion:
+                score += PROMOTION_BONUS * 1000 * move.promotion
+            quiets.append((score, move))
+        quiets.sort(key=lambda item: item[0], reverse=True)
+        for _, move in quiets:
+            yield move
@@ -0,0 +1,34 @@
+class SearchOptions:
+    """
+    Các tùy chọn cắt tỉa/giảm độ sâu của Searcher. Mỗi kỹ thuật có thể bật/tắt
+    riêng để đo ảnh hưởng tới độ sâu và tốc độ trên bộ bench.
+    """
+    def __init__(self, null_move: bool = True, late_move_reductions: bool = True,
+                 futility: bool = True, reverse_futility: bool = True,
+                 mate_distance: bool = True):
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility = futility
+        self.reverse_futility = reverse_futility
+        self.mate_distance = mate_distance
+
+        # --- Tham số ---
+        self.null_move_min_depth = 3
+        self.null_move_reduction = 2
+        self.lmr_min_depth = 3
+        self.lmr_min_moves = 3
+        self.futility_margins = [0, 200, 300, 500]
+        self.reverse_futility_margin = 120
+        self.reverse_futility_max_depth = 3
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "SearchOptions":
+        options = cls()
+        for name, value in values.items():
+            if not hasattr(options, name):
+                raise ValueError(f"Unknown search option: {name}")
+            setattr(options, name, value)
+        return options
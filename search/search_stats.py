@@ -0,0 +1,173 @@
+import time
+from typing import Callable, Optional
+
+
+class _TimedIterator:
+    """Bọc bộ sinh nước đi (MovePicker) để cộng dồn thời gian của mỗi lần lấy nước tiếp theo."""
+    __slots__ = ("iterator", "stats")
+
+    def __init__(self, iterable, stats: "SearchStats"):
+        self.iterator = iter(iterable)
+        self.stats = stats
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.stats.movegen_time += time.perf_counter() - start
+
+
+class _TimedEvaluation:
+    """Bọc đối tượng Evaluation: đếm số lần đánh giá và đo thời gian evaluate/push/pop."""
+
+    def __init__(self, evaluation, stats: "SearchStats"):
+        self.wrapped = evaluation
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def evaluate(self, board):
+        start = time.perf_counter()
+        score = self.wrapped.evaluate(board)
+        self.stats.eval_time += time.perf_counter() - start
+        self.stats.evaluations += 1
+        return score
+
+    def push(self, board, move):
+        start = time.perf_counter()
+        self.wrapped.push(board, move)
+        self.stats.eval_time += time.perf_counter() - start
+
+    def pop(self):
+        start = time.perf_counter()
+        self.wrapped.pop()
+        self.stats.eval_time += time.perf_counter() - start
+
+
+class _TimedTranspositionTable:
+    """
+    Bọc TranspositionTable để đo thời gian tra cứu, ghi và đếm số lần tra, số lần tìm thấy
+    entry, số lần trả về điểm dùng được; bảng gốc không đếm gì để đường nóng không tốn thêm.
+    """
+
+    def __init__(self, tt, stats: "SearchStats"):
+        self.wrapped = tt
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def lookup_evaluation(self, depth, ply_from_root, alpha, beta, zobrist_key):
+        start = time.perf_counter()
+        score = self.wrapped.lookup_evaluation(depth, ply_from_root, alpha, beta, zobrist_key)
+        self.stats.tt_time += time.perf_counter() - start
+        if self.wrapped.enabled:
+            self.stats.tt_probes += 1
+            if score != self.wrapped.LOOKUP_FAILED:
+                self.stats.tt_hits += 1
+                self.stats.tt_cutoffs += 1
+            elif self.wrapped._probe(zobrist_key):
+                # Có entry nhưng không dùng được (thiếu độ sâu hoặc bound không cắt)
+                self.stats.tt_hits += 1
+        return score
+
+    def store_evaluation(self, depth, ply_from_root, evaluation, bound, move, zobrist_key):
+        start = time.perf_counter()
+        self.wrapped.store_evaluation(depth, ply_from_root, evaluation, bound, move, zobrist_key)
+        self.stats.tt_time += time.perf_counter() - start
+
+    def get_stored_move(self, zobrist_key):
+        start = time.perf_counter()
+        move = self.wrapped.get_stored_move(zobrist_key)
+        self.stats.tt_time += time.perf_counter() - start
+        return move
+
+
+class SearchStats:
+    """
+    Thống kê chi tiết cho một lần tìm kiếm, chỉ bật khi cần (Searcher.enable_stats).
+
+    Khi tắt, Searcher không bọc gì thêm nên đường nóng gần như không tốn chi phí.
+    Khi bật, evaluation, bảng chuyển vị và bộ sinh nước đi được bọc để đếm và đo
+    thời gian. Kết quả (to_dict) được gắn vào info của mỗi lần lặp, lưu ở
+    Searcher.search_stats và gửi cho callback khi lần tìm kiếm kết thúc.
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.evaluations = 0
+        self.movegen_time = 0.0
+        self.eval_time = 0.0
+        self.tt_time = 0.0
+        self.total_time = 0.0
+        self.iterations = []
+
+        self._start = time.perf_counter()
+
+    def start(self, searcher):
+        self.reset()
+
+    def collect(self, searcher):
+        """Đọc các bộ đếm của searcher tính từ lúc start."""
+        self.nodes = searcher.nodes
+        self.qnodes = searcher.qnodes
+        self.beta_cutoffs = searcher.beta_cutoffs
+        self.first_move_cutoffs = searcher.first_move_cutoffs
+        self.total_time = time.perf_counter() - self._start
+
+    def iteration_done(self, searcher, depth: int):
+        self.collect(searcher)
+        nodes = self.nodes - sum(iteration["nodes"] for iteration in self.iterations)
+        previous = self.iterations[-1]["nodes"] if self.iterations else 0
+        self.iterations.append({
+            "depth": depth,
+            "nodes": nodes,
+            "time": round(self.total_time, 4),
+            "ebf": round(nodes / previous, 3) if previous else None,
+        })
+
+    def finish(self, searcher) -> dict:
+        self.collect(searcher)
+        result = self.to_dict()
+        if self.callback is not None:
+            self.callback(result)
+        return result
+
+    def to_dict(self) -> dict:
+        main_nodes = self.nodes - self.qnodes
+        return {
+            "nodes": self.nodes,
+            "main_nodes": main_nodes,
+            "qnodes": self.qnodes,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_cutoffs": self.tt_cutoffs,
+            "tt_hit_rate": round(self.tt_hits / self.tt_probes, 4) if self.tt_probes else 0.0,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": (round(self.first_move_cutoffs / self.beta_cutoffs, 4)
+                                       if self.beta_cutoffs else 0.0),
+            "evaluations": self.evaluations,
+            "iterations": list(self.iterations),
+            "time": {
+                "total": round(self.total_time, 4),
+                "movegen": round(self.movegen_time, 4),
+                "eval": round(self.eval_time, 4),
+                "tt": round(self.tt_time, 4),
+            },
+        }
@@ -1,50 +1,183 @@
 import chess
 from chess import polyglot
-import time
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
+from search.bitbase import Bitbases
 from search.transposition_table import TranspositionTable
+from search.zobrist import IncrementalZobrist
+from search.move_picker import MovePicker, MoveOrdering, MVV_LVA, PROMOTION_BONUS, MAX_PLY
+from search.see import see
+from search.search_options import SearchOptions
+from search.time_manager import TimeManager
+from search.search_stats import SearchStats, _TimedEvaluation, _TimedTranspositionTable, _TimedIterator
 
 
 class Searcher:
-    def __init__(self, evaluation, tt: TranspositionTable):
+    INFINITY = 999999
+    ASPIRATION_WINDOW = 50
+    MAX_DEPTH = 64
+    # Kiểm tra thời gian/dừng mỗi 256 nút (~20ms ở tốc độ hiện tại) để không vượt đồng hồ ngắn
+    TIME_CHECK_MASK = 255
+    DELTA_MARGIN = 200
+
+    def __init__(self, evaluation, tt: TranspositionTable, debug_hash: bool = False,
+                 options: Optional[SearchOptions] = None):
         self.evaluation = evaluation
         self.tt = tt
+        self.options = options or SearchOptions()
+        self.hasher = IncrementalZobrist(debug=debug_hash)
+        self.ordering = MoveOrdering()
         self.nodes = 0
-        self.start_time = 0
-        self.time_limit = 0
+        self.qnodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.move_picker = MovePicker
+        self.stats = None
+        # Thống kê (SearchStats.to_dict) của lần tìm kiếm gần nhất, None nếu không bật thống kê
+        self.search_stats: Optional[dict] = None
+        self.time_manager = TimeManager()
+        self.node_limit = None
+        self.root_index = 0
+        # Chỉ số (trong hasher.keys) của thế cờ ngay sau nước null gần nhất trên đường tìm kiếm
+        self.null_index = 0
+        self.stop_event = None
+        self.verbose = True
+        self.info_callback = None
+        self.completed_depth = 0
+        self.best_score = 0
+        self.pv = []
+        # Bitbase tàn cuộc (tùy chọn): thế cờ được bảng phủ có điểm chính xác, không cần tìm tiếp
+        self.bitbases: Optional[Bitbases] = None
+
+    def enable_stats(self, stats: Optional[SearchStats] = None) -> SearchStats:
+        """
+        Bật thống kê chi tiết: bọc evaluation, bảng chuyển vị và bộ sinh nước đi để
+        đếm và đo thời gian. Khi không bật, đường nóng không có thêm chi phí nào.
+        """
+        self.disable_stats()
+        stats = stats or SearchStats()
+        self.stats = stats
+        self.evaluation = _TimedEvaluation(self.evaluation, stats)
+        self.tt = _TimedTranspositionTable(self.tt, stats)
+        self.move_picker = lambda *args: _TimedIterator(MovePicker(*args), stats)
+
+        generate = self.quiescence_moves
+
+        def quiescence_moves(board: chess.Board, include_checks: bool) -> list:
+            return list(_TimedIterator(generate(board, include_checks), stats))
+        self.quiescence_moves = quiescence_moves
+        return stats
+
+    def disable_stats(self):
+        if self.stats is None:
+            return
+        self.evaluation = self.evaluation.wrapped
+        self.tt = self.tt.wrapped
+        self.move_picker = MovePicker
+        del self.quiescence_moves
+        self.stats = None
 
     def is_time_up(self) -> bool:
-        return (time.time() - self.start_time) >= self.time_limit
-
-    def order_moves(self, board: chess.Board, tt_move: Optional[chess.Move]) -> list:
-        moves = list(board.legal_moves)
-
-        def move_score(move):
-            score = 0
-            if tt_move and move == tt_move:
-                score += 100000
-            if board.is_capture(move):
-                attacker = board.piece_at(move.from_square)
-                victim = board.piece_at(move.to_square)
-                if attacker and victim:
-                    score += victim.piece_type * 10 - attacker.piece_type
-            return score
-
-        moves.sort(key=move_score, reverse=True)
-        return moves
-
-    def quiescence_search(self, board: chess.Board, alpha: int, beta: int, ply: int) -> int:
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.time_manager.hard_limit_reached()
+
+    def ponderhit(self, time_limit: Union[TimeManager, float, None]):
+        """Chuyển lần tìm kiếm đang chạy (không giới hạn thời gian) sang tìm kiếm có giới hạn, tính từ bây giờ."""
+        time_manager = TimeManager.create(time_limit)
+        time_manager.resume_from(self.time_manager)
+        self.time_manager = time_manager
+
+    def principal_variation(self, board: chess.Board, best_move: chess.Move, max_length: int) -> list:
+        """Dựng biến chính bắt đầu từ best_move bằng cách lần theo các nước đi lưu trong TT."""
+        pv = []
+        line = board.copy(stack=False)
+        move = best_move
+        seen = set()
+        while move and len(pv) < max_length and line.is_legal(move):
+            pv.append(move)
+            line.push(move)
+            key = polyglot.zobrist_hash(line)
+            if key in seen:
+                break
+            seen.add(key)
+            move = self.tt.get_stored_move(key)
+        return pv
+
+    def make_move(self, board: chess.Board, move: chess.Move):
+        self.evaluation.push(board, move)
+        self.hasher.push(board, move)
+
+    def unmake_move(self, board: chess.Board):
+        self.hasher.pop(board)
+        self.evaluation.pop()
+
+    def quiescence_moves(self, board: chess.Board, include_checks: bool) -> list:
+        """Nước ăn quân và phong cấp (kèm nước chiếu nếu được yêu cầu), sắp theo MVV-LVA."""
+        scored = []
+        for move in board.generate_legal_captures():
+            attacker = board.piece_type_at(move.from_square)
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            scored.append((MVV_LVA[victim][attacker] + (PROMOTION_BONUS * move.promotion if move.promotion else 0), move))
+
+        promotion_rank = chess.BB_RANK_7 if board.turn == chess.WHITE else chess.BB_RANK_2
+        quiet_targets = ~board.occupied
+        pawns = board.pawns & board.occupied_co[board.turn] & promotion_rank
+        if pawns:
+            for move in board.generate_legal_moves(pawns, quiet_targets):
+                scored.append((PROMOTION_BONUS * move.promotion, move))
+
+        if include_checks:
+            for move in board.generate_legal_moves(chess.BB_ALL, quiet_targets):
+                # Bắt tốt qua đường có thể vừa ăn vừa chiếu, đã có trong lượt nước ăn quân
+                if not move.promotion and not board.is_capture(move) and board.gives_check(move):
+                    scored.append((0, move))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def quiescence_search(self, board: chess.Board, alpha: int, beta: int, ply: int, qply: int = 0) -> int:
         self.nodes += 1
+        self.qnodes += 1
 
-        if (self.nodes & 2047) == 0 and self.is_time_up():
+        if (self.nodes & self.TIME_CHECK_MASK) == 0 and self.is_time_up():
             raise TimeoutError
 
-        zobrist_key = polyglot.zobrist_hash(board)
+        zobrist_key = self.hasher.key
 
         tt_val = self.tt.lookup_evaluation(0, ply, alpha, beta, zobrist_key)
         if tt_val != self.tt.LOOKUP_FAILED:
             return tt_val
 
+        alpha_orig = alpha
+
+        # Đang bị chiếu: xét mọi nước thoát chiếu, không dùng stand pat
+        if board.is_check():
+            moves = list(self.move_picker(board, self.ordering, None, min(ply, MAX_PLY - 1)))
+            if not moves:
+                return -self.evaluation.CHECKMATE_SCORE + ply
+
+            for move in moves:
+                self.make_move(board, move)
+                score = -self.quiescence_search(board, -beta, -alpha, ply + 1, qply + 1)
+                self.unmake_move(board)
+
+                if score >= beta:
+                    self.tt.store_evaluation(0, ply, score, self.tt.LOWER_BOUND, move, zobrist_key)
+                    return beta
+                if score > alpha:
+                    alpha = score
+
+            bound = self.tt.EXACT if alpha > alpha_orig else self.tt.UPPER_BOUND
+            self.tt.store_evaluation(0, ply, alpha, bound, None, zobrist_key)
+            return alpha
+
+        # Bên đi chỉ còn vua và tốt: dễ bị pat, kiểm tra trước khi tin điểm stand pat
+        if (not board.occupied_co[board.turn] & ~(board.pawns | board.kings)
+                and not any(board.generate_legal_moves())):
+            return 0
+
         stand_pat = self.evaluation.evaluate(board)
 
         if stand_pat >= beta:
@@ -53,13 +186,28 @@ class Searcher:
         if stand_pat > alpha:
             alpha = stand_pat
 
-        for move in board.legal_moves:
-            if not (board.is_capture(move) or board.gives_check(move)):
-                continue
-
-            board.push(move)
-            score = -self.quiescence_search(board, -beta, -alpha, ply + 1)
-            board.pop()
+        piece_values = self.evaluation.PIECE_VALUES
+        moves = self.quiescence_moves(board, include_checks=qply == 0)
+        # Không có nước ăn quân/phong cấp/chiếu: chỉ khi đó mới sinh nước thường để phát hiện pat
+        if not moves and not any(board.generate_legal_moves()):
+            return 0
+        for move in moves:
+            is_capture = board.is_capture(move)
+            if is_capture or move.promotion:
+                # Delta pruning: kể cả ăn được quân cũng không thể vượt alpha
+                gain = piece_values[board.piece_type_at(move.to_square) or chess.PAWN] if is_capture else 0
+                if move.promotion:
+                    gain += piece_values[move.promotion] - piece_values[chess.PAWN]
+                if stand_pat + gain + self.DELTA_MARGIN <= alpha:
+                    continue
+
+                # Bỏ qua các nước ăn quân thua chất theo SEE
+                if is_capture and see(board, move) < 0:
+                    continue
+
+            self.make_move(board, move)
+            score = -self.quiescence_search(board, -beta, -alpha, ply + 1, qply + 1)
+            self.unmake_move(board)
 
             if score >= beta:
                 self.tt.store_evaluation(0, ply, score, self.tt.LOWER_BOUND, move, zobrist_key)
@@ -67,46 +215,146 @@ class Searcher:
             if score > alpha:
                 alpha = score
 
-        self.tt.store_evaluation(0, ply, alpha, self.tt.EXACT, None, zobrist_key)
+        bound = self.tt.EXACT if alpha > alpha_orig else self.tt.UPPER_BOUND
+        self.tt.store_evaluation(0, ply, alpha, bound, None, zobrist_key)
         return alpha
 
+    def is_repetition(self, board: chess.Board) -> bool:
+        """
+        Lặp lại trên đường tìm kiếm (từ gốc trở đi) tính là hòa ngay; với lịch sử
+        ván đấu trước gốc cần thế cờ đã xuất hiện hai lần (lặp ba lần). Không so qua nước
+        null: nước null không đặt lại halfmove_clock nhưng hai phía của nó không phải cùng một ván.
+        """
+        keys = self.hasher.keys
+        current = len(keys) - 1
+        key = keys[current]
+        earliest = max(current - board.halfmove_clock, self.null_index)
+
+        repetitions = 0
+        for index in range(current - 4, earliest - 1, -2):
+            if keys[index] == key:
+                if index >= self.root_index:
+                    return True
+                repetitions += 1
+                if repetitions >= 2:
+                    return True
+        return False
+
+    def is_insufficient_material(self, board: chess.Board) -> bool:
+        """Kiểm tra nhanh theo chữ ký chất: chỉ còn vua và nhiều nhất một quân nhẹ."""
+        if board.pawns or board.rooks or board.queens:
+            return False
+        return chess.popcount(board.knights | board.bishops) <= 1
+
+    def bitbase_score(self, probed: Tuple[int, int], ply: int) -> int:
+        """Đổi kết quả tra bitbase (thắng/hòa/thua, số nửa nước tới chiếu hết) sang điểm tìm kiếm."""
+        outcome, plies = probed
+        return outcome * (self.evaluation.CHECKMATE_SCORE - ply - plies) if outcome else 0
+
     def alpha_beta(self, board: chess.Board, depth: int,
                    alpha: int, beta: int, ply: int) -> Tuple[int, Optional[chess.Move]]:
         self.nodes += 1
 
-        if (self.nodes & 2047) == 0 and self.is_time_up():
+        if (self.nodes & self.TIME_CHECK_MASK) == 0 and self.is_time_up():
             raise TimeoutError
 
-        zobrist_key = polyglot.zobrist_hash(board)
+        options = self.options
+        mate_score = self.evaluation.CHECKMATE_SCORE
+
+        if ply > 0 and (board.halfmove_clock >= 100 or self.is_repetition(board)
+                        or self.is_insufficient_material(board)):
+            return 0, None
+
+        # Cắt tỉa theo khoảng cách chiếu hết: không thể tốt hơn chiếu hết ngay ở nước tới
+        if options.mate_distance and ply > 0:
+            alpha = max(alpha, -mate_score + ply)
+            beta = min(beta, mate_score - ply - 1)
+            if alpha >= beta:
+                return alpha, None
+
+        if self.bitbases is not None and ply > 0:
+            probed = self.bitbases.probe(board)
+            if probed is not None:
+                return self.bitbase_score(probed, ply), None
+
+        zobrist_key = self.hasher.key
 
         val = self.tt.lookup_evaluation(depth, ply, alpha, beta, zobrist_key)
         if val != self.tt.LOOKUP_FAILED:
             return val, self.tt.get_stored_move(zobrist_key)
 
-        if board.is_checkmate():
-            return -self.evaluation.CHECKMATE_SCORE + ply, None
-        
-        if board.is_stalemate() or board.is_insufficient_material() or board.can_claim_draw():
-            return 0, None
-            
         if depth == 0:
-            score = self.quiescence_search(board, alpha, beta, ply)
-            self.tt.store_evaluation(0, ply, score, self.tt.EXACT, None, zobrist_key)
-            return score, None
-        
+            return self.quiescence_search(board, alpha, beta, ply), None
+
+        in_check = board.is_check()
+        is_pv = beta - alpha > 1
+        static_eval = None
+        if not in_check and not is_pv and ply > 0:
+            static_eval = self.evaluation.evaluate(board)
+
+            # Reverse futility: điểm tĩnh vượt beta đủ xa ở gần lá
+            if (options.reverse_futility and depth <= options.reverse_futility_max_depth
+                    and abs(beta) < 90000
+                    and static_eval - options.reverse_futility_margin * depth >= beta):
+                return static_eval, None
+
+            # Null move: bỏ lượt, nếu vẫn vượt beta thì cắt. Tránh thế zugzwang khi chỉ còn tốt và vua
+            if (options.null_move and depth >= options.null_move_min_depth
+                    and static_eval >= beta and abs(beta) < 90000
+                    and board.occupied_co[board.turn] & ~(board.pawns | board.kings)
+                    and board.move_stack and board.move_stack[-1]):
+                reduction = options.null_move_reduction + (1 if depth > 6 else 0)
+                self.make_move(board, chess.Move.null())
+                null_index, self.null_index = self.null_index, len(self.hasher.keys) - 1
+                score = -self.alpha_beta(board, max(0, depth - 1 - reduction), -beta, -beta + 1, ply + 1)[0]
+                self.null_index = null_index
+                self.unmake_move(board)
+                if score >= beta:
+                    return (beta if score > 90000 else score), None
+
+        futility_margins = options.futility_margins
+        can_futility_prune = (options.futility and static_eval is not None
+                              and depth < len(futility_margins)
+                              and abs(alpha) < 90000
+                              and static_eval + futility_margins[depth] <= alpha)
 
         best_move = None
-        best_score = -999999
+        best_score = -self.INFINITY
         alpha_orig = alpha
 
         tt_move = self.tt.get_stored_move(zobrist_key)
-        moves = self.order_moves(board, tt_move)
+        searched_quiets = []
+        moves_searched = 0
+
+        for move in self.move_picker(board, self.ordering, tt_move, ply):
+            is_quiet = not board.is_capture(move) and not move.promotion
+            self.make_move(board, move)
+            gives_check = board.is_check()
+
+            # Futility: nước im lặng không thể nâng điểm lên trên alpha
+            if can_futility_prune and is_quiet and moves_searched > 0 and not gives_check:
+                self.unmake_move(board)
+                best_score = max(best_score, static_eval + futility_margins[depth])
+                continue
 
-        for move in moves:
-            board.push(move)
-            score, _ = self.alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)
-            score = -score
-            board.pop()
+            if moves_searched == 0:
+                score = -self.alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)[0]
+            else:
+                # Late move reductions: nước im lặng xếp sau được tìm nông hơn
+                reduction = 0
+                if (options.late_move_reductions and is_quiet and not in_check and not gives_check
+                        and depth >= options.lmr_min_depth and moves_searched >= options.lmr_min_moves):
+                    reduction = 1 if moves_searched < 6 or is_pv else 2
+                    reduction = min(reduction, depth - 2)
+
+                # PVS: thăm dò bằng cửa sổ rỗng, chỉ tìm lại khi nước đi vượt alpha
+                score = -self.alpha_beta(board, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)[0]
+                if reduction and score > alpha:
+                    score = -self.alpha_beta(board, depth - 1, -alpha - 1, -alpha, ply + 1)[0]
+                if alpha < score < beta:
+                    score = -self.alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)[0]
+            self.unmake_move(board)
+            moves_searched += 1
 
             if score > best_score:
                 best_score = score
@@ -114,7 +362,19 @@ class Searcher:
 
             alpha = max(alpha, score)
             if alpha >= beta:
-                break  
+                self.beta_cutoffs += 1
+                if moves_searched == 1:
+                    self.first_move_cutoffs += 1
+                if is_quiet:
+                    self.ordering.update_quiet(board, move, depth, ply, searched_quiets)
+                break
+
+            if is_quiet:
+                searched_quiets.append(move)
+
+        # Không có nước đi hợp lệ: chiếu hết hoặc hết nước
+        if moves_searched == 0:
+            return (-mate_score + ply if in_check else 0), None
 
         if best_score <= alpha_orig:
             bound = self.tt.UPPER_BOUND
@@ -126,27 +386,107 @@ class Searcher:
         self.tt.store_evaluation(depth, ply, best_score, bound, best_move, zobrist_key)
         return best_score, best_move
 
-    def ids(self, board: chess.Board, time_limit: float = 2.0) -> Optional[chess.Move]:
-        self.start_time = time.time()
-        self.time_limit = time_limit
+    def aspiration_search(self, board: chess.Board, depth: int, previous_score: Optional[int]) -> Tuple[int, Optional[chess.Move]]:
+        if previous_score is None or abs(previous_score) > 90000:
+            return self.alpha_beta(board, depth, -self.INFINITY, self.INFINITY, 0)
+
+        window = self.ASPIRATION_WINDOW
+        alpha = previous_score - window
+        beta = previous_score + window
+        while True:
+            score, move = self.alpha_beta(board, depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(score - window, -self.INFINITY)
+            elif score >= beta:
+                beta = min(score + window, self.INFINITY)
+            else:
+                return score, move
+            # Mở rộng cửa sổ mỗi lần thất bại
+            window *= 2
+            if window > 1000:
+                alpha, beta = -self.INFINITY, self.INFINITY
+
+    def ids(self, board: chess.Board, time_limit: Union[TimeManager, float, None] = 2.0,
+            max_depth: int = MAX_DEPTH, start_depth: int = 1,
+            node_limit: Optional[int] = None) -> Optional[chess.Move]:
+        """
+        Iterative deepening. time_limit là số giây cố định cho nước đi, một TimeManager
+        (ví dụ TimeManager.from_clock) hoặc None nếu không giới hạn thời gian.
+        Biến chính, độ sâu, điểm và thống kê (nếu bật) nằm ở pv, completed_depth,
+        best_score và search_stats sau khi trả về.
+        """
+        time_manager = TimeManager.create(time_limit)
+        time_manager.start()
+        self.time_manager = time_manager
+        self.node_limit = node_limit
         self.nodes = 0
+        self.qnodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.completed_depth = 0
+        self.best_score = 0
+        self.pv = []
+        self.search_stats = None
+        if self.stats is not None:
+            self.stats.start(self)
+        self.tt.new_search()
+        self.hasher.reset(board)
+        self.root_index = len(self.hasher.keys) - 1
+        self.null_index = 0
+        self.evaluation.reset(board)
+        self.ordering.new_search()
 
         legal_moves = list(board.legal_moves)
         if not legal_moves:
+            if self.stats is not None:
+                self.search_stats = self.stats.finish(self)
             return None
 
         best_move = legal_moves[0]
         last_completed_move = best_move
 
-        for depth in range(1, 64): 
+        previous_score = None
+        for depth in range(min(start_depth, max_depth), max_depth + 1):
             try:
-                score, move = self.alpha_beta(board, depth, -999999, 999999, 0)
+                score, move = self.aspiration_search(board, depth, previous_score)
+                previous_score = score
                 if move:
                     best_move = move
                     last_completed_move = move
-                print(f"Depth {depth}: score {score}, move {move}, nodes {self.nodes}")
+                self.completed_depth = depth
+                self.best_score = score
+                self.pv = self.principal_variation(board, last_completed_move, depth)
+                if self.stats is not None:
+                    self.stats.iteration_done(self, depth)
+                if self.info_callback is not None:
+                    info = {
+                        "depth": depth,
+                        "score": score,
+                        "nodes": self.nodes,
+                        "time": self.time_manager.elapsed(),
+                        "move": move,
+                        "pv": self.pv,
+                    }
+                    if self.stats is not None:
+                        info["stats"] = self.stats.to_dict()
+                    self.info_callback(info)
+                if self.verbose:
+                    print(f"Depth {depth}: score {score}, move {move}, nodes {self.nodes}")
+                # Đã tìm thấy chiếu hết trong tầm tìm kiếm: các lần lặp sâu hơn không đổi kết quả
+                if abs(score) >= self.evaluation.CHECKMATE_SCORE - depth:
+                    break
+                # Gốc nằm trong bitbase (kịp chiếu hết trước luật 50 nước) và nước tìm được đạt đúng
+                # kết quả của bảng: các lần lặp sâu hơn không đổi kết quả
+                probed = self.bitbases.probe(board) if self.bitbases is not None else None
+                if probed is not None and score == self.bitbase_score(probed, 0):
+                    break
+                if not self.time_manager.iteration_done(last_completed_move, score):
+                    break
             except TimeoutError:
-                print(f"Search stopped at depth {depth} due to timeout.")
+                if self.verbose:
+                    print(f"Search stopped at depth {depth} due to timeout.")
                 break
 
+        if self.stats is not None:
+            self.search_stats = self.stats.finish(self)
         return last_completed_move
\ No newline at end of file
@@ -0,0 +1,63 @@
+import chess
+from evaluation.evaluation import Evaluation
+
+# Giá trị dùng cho trao đổi quân; vua có giá trị rất lớn để không bao giờ bị "đổi"
+SEE_VALUES = [0] * 7
+for _piece_type, _value in Evaluation.PIECE_VALUES.items():
+    SEE_VALUES[_piece_type] = _value
+SEE_VALUES[chess.KING] = 20000
+
+
+def _least_valuable_attacker(board: chess.Board, attackers: int):
+    for piece_type, pieces in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                               (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                               (chess.QUEEN, board.queens), (chess.KING, board.kings)):
+        mask = attackers & pieces
+        if mask:
+            return piece_type, mask & -mask
+    return None, 0
+
+
+def see(board: chess.Board, move: chess.Move) -> int:
+    """
+    Static exchange evaluation: kết quả chuỗi trao đổi quân trên ô đích của move,
+    theo góc nhìn bên đi nước đó (bỏ qua quân bị ghim).
+    """
+    from_square = move.from_square
+    to_square = move.to_square
+    piece_type = board.piece_type_at(from_square)
+
+    occupied = board.occupied ^ chess.BB_SQUARES[from_square]
+    if board.is_en_passant(move):
+        captured_value = SEE_VALUES[chess.PAWN]
+        occupied ^= chess.BB_SQUARES[to_square - 8 if board.turn == chess.WHITE else to_square + 8]
+    else:
+        captured_value = SEE_VALUES[board.piece_type_at(to_square) or 0]
+
+    gains = [captured_value]
+    on_square = piece_type
+    if move.promotion:
+        gains[0] += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+        on_square = move.promotion
+
+    side = not board.turn
+    while True:
+        attackers = (board.attackers_mask(chess.WHITE, to_square, occupied) |
+                     board.attackers_mask(chess.BLACK, to_square, occupied)) & occupied
+        attacker_type, attacker_bb = _least_valuable_attacker(board, attackers & board.occupied_co[side])
+        if not attacker_bb:
+            break
+
+        gains.append(SEE_VALUES[on_square] - gains[-1])
+        # Cắt sớm nếu cả hai lựa chọn đều không cải thiện kết quả
+        if max(-gains[-2], gains[-1]) < 0:
+            break
+
+        occupied ^= attacker_bb
+        on_square = attacker_type
+        side = not side
+
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
@@ -0,0 +1,89 @@
+from multiprocessing import shared_memory
+from typing import Optional
+from search.transposition_table import SNAPSHOT_HEADER_SIZE, TranspositionTable
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Bảng chuyển vị nằm trong multiprocessing.shared_memory để nhiều tiến trình
+    dùng chung mà không cần khóa. Mỗi entry lưu key ^ data nên các lần ghi bị
+    xen kẽ giữa hai tiến trình sẽ không khớp key và bị bỏ qua khi tra cứu.
+
+    Tiến trình tạo bảng (name=None) là chủ sở hữu: chỉ nó được tăng age,
+    xóa hay giải phóng vùng nhớ. Các tiến trình khác gắn vào bằng name.
+    """
+    HEADER_SIZE = 8
+
+    def __init__(self, size_mb: int = 32, name: Optional[str] = None):
+        self.name = name
+        self.owner = name is None
+        self.shm = None
+        self.header = None
+        super().__init__(size_mb)
+
+    @property
+    def generation(self) -> int:
+        return self.header[0]
+
+    @generation.setter
+    def generation(self, value: int):
+        if self.owner and self.header is not None:
+            self.header[0] = value
+
+    def _allocate(self):
+        nbytes = self.HEADER_SIZE + self.size * self.ENTRY_SIZE
+        if self.owner:
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.name = self.shm.name
+        elif self.shm is None:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+
+        buffer = self.shm.buf
+        self.header = buffer[:self.HEADER_SIZE].cast('Q')
+        self._attach(buffer[self.HEADER_SIZE:nbytes])
+        self.generation = 1
+
+    def new_search(self):
+        if self.owner:
+            super().new_search()
+
+    def clear(self):
+        if not self.owner:
+            return
+        self.buffer[:] = bytes(len(self.buffer))
+        self.generation = 1
+
+    def _load_mapping(self, mapping, num_buckets: int, generation: int):
+        # Các tiến trình khác đã gắn vào vùng nhớ chung nên không thể thay buffer:
+        # chép nguyên snapshot nếu cùng kích thước, nếu không thì gộp entry vào bảng hiện có
+        size = num_buckets * self.BUCKET_SIZE
+        view = memoryview(mapping)
+        try:
+            if num_buckets == self.num_buckets:
+                self.buffer[:] = view[SNAPSHOT_HEADER_SIZE:SNAPSHOT_HEADER_SIZE + size * self.ENTRY_SIZE]
+                self.generation = generation
+            else:
+                keys = view[SNAPSHOT_HEADER_SIZE:SNAPSHOT_HEADER_SIZE + size * 8].cast('Q')
+                data = view[SNAPSHOT_HEADER_SIZE + size * 8:SNAPSHOT_HEADER_SIZE + size * 16].cast('Q')
+                self._merge(keys, data, generation, None)
+                keys.release()
+                data.release()
+        finally:
+            view.release()
+            mapping.close()
+
+    def _release(self):
+        if self.shm is None:
+            return
+        for view in (self.keys, self.data, self.header, self.buffer):
+            view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+        self.header = None
+
+    def close(self):
+        self._release()
+
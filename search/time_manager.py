@@ -0,0 +1,143 @@
+import time
+from typing import Optional, Union
+import chess
+
+
+class TimeManager:
+    """
+    Quản lý thời gian cho một nước đi theo đồng hồ đơn điệu (time.monotonic).
+
+    - hard_limit: giới hạn tuyệt đối, kiểm tra trong lúc tìm kiếm (is_time_up).
+    - soft_limit: ngân sách dự kiến, chỉ xét giữa các lần lặp. Ngân sách được
+      thu nhỏ khi nước đi tốt nhất ổn định qua nhiều lần lặp và nới rộng khi
+      điểm số tụt giảm.
+
+    Trước mỗi lần lặp mới, thời gian của lần lặp đó được dự đoán từ hệ số phân
+    nhánh quan sát được; nếu không thể xong trước hard_limit thì không bắt đầu.
+
+    Thời gian cố định (fixed, ví dụ movetime) không co giãn: tìm kiếm chạy tới hard_limit.
+    """
+    MOVE_OVERHEAD = 0.05
+    DEFAULT_MOVES_TO_GO = 30
+    INCREMENT_USAGE = 0.75
+    HARD_RATIO = 4.0
+    MAX_USAGE = 0.5
+
+    MIN_BRANCHING = 1.5
+    MAX_BRANCHING = 8.0
+    DEFAULT_BRANCHING = 3.0
+
+    STABILITY_STEP = 0.15
+    MIN_STABILITY_SCALE = 0.5
+    SCORE_DROP_MARGIN = 20
+    SCORE_DROP_RANGE = 150
+    MAX_SCORE_DROP_SCALE = 2.0
+
+    def __init__(self, soft_limit: Optional[float] = None, hard_limit: Optional[float] = None,
+                 fixed: bool = False):
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit if hard_limit is not None else soft_limit
+        self.fixed = fixed
+        self.start_time = time.monotonic()
+        self.reset()
+
+    @classmethod
+    def fixed(cls, move_time: Optional[float]) -> "TimeManager":
+        """Thời gian cố định cho nước đi (movetime); None là không giới hạn."""
+        return cls(move_time, move_time, fixed=True)
+
+    @classmethod
+    def from_clock(cls, remaining: float, increment: float = 0.0,
+                   moves_to_go: Optional[int] = None) -> "TimeManager":
+        """Tính soft/hard limit (giây) từ thời gian còn lại, số giây cộng thêm và số nước tới mốc."""
+        usable = max(remaining - cls.MOVE_OVERHEAD, 0.01)
+        moves_to_go = max(moves_to_go or cls.DEFAULT_MOVES_TO_GO, 1)
+
+        soft = usable / moves_to_go + increment * cls.INCREMENT_USAGE
+        if moves_to_go == 1:
+            hard = usable
+        else:
+            hard = min(soft * cls.HARD_RATIO, usable * cls.MAX_USAGE)
+        soft = min(soft, hard)
+        return cls(max(soft, 0.01), max(hard, 0.01))
+
+    @classmethod
+    def create(cls, limit: Union["TimeManager", float, None]) -> "TimeManager":
+        if isinstance(limit, TimeManager):
+            return limit
+        return cls.fixed(limit)
+
+    def reset(self):
+        self.iteration_start = self.start_time
+        self.last_iteration_time = 0.0
+        self.branching = self.DEFAULT_BRANCHING
+        self.best_move = None
+        self.stable_iterations = 0
+        self.previous_score = None
+        self.score_drop = 0
+
+    def start(self):
+        self.start_time = time.monotonic()
+        self.reset()
+
+    def resume_from(self, previous: "TimeManager"):
+        """Dùng khi ponderhit: tính thời gian từ bây giờ nhưng giữ thống kê các lần lặp của previous."""
+        self.start_time = time.monotonic()
+        self.iteration_start = previous.iteration_start
+        self.last_iteration_time = previous.last_iteration_time
+        self.branching = previous.branching
+        self.best_move = previous.best_move
+        self.stable_iterations = previous.stable_iterations
+        self.previous_score = previous.previous_score
+        self.score_drop = previous.score_drop
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_time
+
+    def hard_limit_reached(self) -> bool:
+        return self.hard_limit is not None and self.elapsed() >= self.hard_limit
+
+    def scaled_soft_limit(self) -> Optional[float]:
+        if self.soft_limit is None:
+            return None
+        if self.fixed:
+            return self.hard_limit
+        scale = max(1.0 - self.STABILITY_STEP * (self.stable_iterations - 1), self.MIN_STABILITY_SCALE)
+        if self.score_drop > self.SCORE_DROP_MARGIN:
+            scale *= 1.0 + min(self.score_drop, self.SCORE_DROP_RANGE) / self.SCORE_DROP_RANGE
+        scale = min(scale, self.MAX_SCORE_DROP_SCALE)
+        return min(self.soft_limit * scale, self.hard_limit)
+
+    def iteration_done(self, move: Optional[chess.Move], score: int) -> bool:
+        """Ghi nhận một lần lặp đã hoàn thành; trả về True nếu nên bắt đầu lần lặp tiếp theo."""
+        now = time.monotonic()
+        iteration_time = now - self.iteration_start
+        self.iteration_start = now
+
+        if self.last_iteration_time > 0.001:
+            observed = iteration_time / self.last_iteration_time
+            self.branching = min(max(observed, self.MIN_BRANCHING), self.MAX_BRANCHING)
+        self.last_iteration_time = iteration_time
+
+        if move == self.best_move:
+            self.stable_iterations += 1
+        else:
+            self.best_move = move
+            self.stable_iterations = 1
+
+        # Điểm tụt so với lần lặp trước (bỏ qua điểm chiếu hết)
+        if self.previous_score is not None and abs(score) < 90000 and abs(self.previous_score) < 90000:
+            self.score_drop = max(self.previous_score - score, 0)
+        else:
+            self.score_drop = 0
+        self.previous_score = score
+
+        # Không giới hạn hoặc thời gian cố định: chỉ dừng khi chạm hard limit trong lúc tìm kiếm
+        if self.hard_limit is None or self.fixed:
+            return True
+
+        elapsed = now - self.start_time
+        if elapsed >= self.scaled_soft_limit():
+            return False
+        # Lần lặp sau không kịp xong trước hard limit thì kết quả của nó sẽ bị bỏ đi
+        return elapsed + iteration_time * self.branching < self.hard_limit
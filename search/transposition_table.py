@@ -1,10 +1,14 @@
-class Entry:
-    def __init__(self):
-        self.key = 0
-        self.value = 0
-        self.depth = 0
-        self.bound = 0 
-        self.move = None
+import mmap
+import struct
+import sys
+from typing import Optional
+import chess
+
+# File snapshot: header cố định rồi tới nguyên vùng nhớ của bảng (keys rồi data, mỗi ô 64-bit)
+SNAPSHOT_MAGIC = b"PYCHESTT"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIIIQQ")
+SNAPSHOT_HEADER_SIZE = 64
 
 
 class TranspositionTable:
@@ -12,65 +16,280 @@ class TranspositionTable:
     LOWER_BOUND = 1
     UPPER_BOUND = 2
     LOOKUP_FAILED = -999999
-    
+
+    # Mỗi entry gồm 2 từ 64-bit: key ^ data và data (nước đi, điểm, độ sâu, bound, age)
+    ENTRY_SIZE = 16
+    BUCKET_SIZE = 4
+
+    SCORE_BITS = 24
+    SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+    DEPTH_OFFSET = 128
+
     def __init__(self, size_mb: int = 32):
-        entry_size = 32 
-        self.size = (size_mb * 1024 * 1024) // entry_size
-        self.entries = [Entry() for _ in range(self.size)]
         self.enabled = True
-    
+        self._mapping = None
+        self.resize(size_mb)
+
+    def resize(self, size_mb: int):
+        self.size_mb = size_mb
+        num_entries = (size_mb * 1024 * 1024) // self.ENTRY_SIZE
+        self.num_buckets = max(1, num_entries // self.BUCKET_SIZE)
+        self.size = self.num_buckets * self.BUCKET_SIZE
+        self.generation = 1
+        self._allocate()
+
+    def _allocate(self):
+        self._release_mapping()
+        self._attach(bytearray(self.size * self.ENTRY_SIZE))
+
+    def _attach(self, buffer):
+        self.buffer = buffer
+        view = memoryview(buffer)
+        half = self.size * 8
+        self.keys = view[:half].cast('Q')
+        self.data = view[half:2 * half].cast('Q')
+
+    def clear(self):
+        self.generation = 1
+        self._allocate()
+
+    def _release_mapping(self):
+        if self._mapping is None:
+            return
+        for view in (self.keys, self.data, self.buffer):
+            view.release()
+        self._mapping.close()
+        self._mapping = None
+
+    def new_search(self):
+        # Age nằm trong khoảng 1..255, age 0 đánh dấu ô trống
+        self.generation = self.generation % 255 + 1
+
     def index(self, zobrist_key: int) -> int:
-        return zobrist_key % self.size
-    
+        return (zobrist_key % self.num_buckets) * self.BUCKET_SIZE
+
+    @staticmethod
+    def pack_move(move) -> int:
+        if not move:
+            return 0
+        return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+    @staticmethod
+    def unpack_move(packed: int):
+        if not packed:
+            return None
+        return chess.Move(packed & 63, (packed >> 6) & 63, (packed >> 12) or None)
+
+    def _probe(self, zobrist_key: int) -> int:
+        keys = self.keys
+        data = self.data
+        start = self.index(zobrist_key)
+        for slot in range(start, start + self.BUCKET_SIZE):
+            entry_data = data[slot]
+            if entry_data and keys[slot] ^ entry_data == zobrist_key:
+                return entry_data
+        return 0
+
     def lookup_evaluation(self, depth: int, ply_from_root: int, alpha: int, beta: int, zobrist_key: int) -> int:
         if not self.enabled:
             return self.LOOKUP_FAILED
-        
-        entry = self.entries[self.index(zobrist_key)]
-        
-        if entry.key != zobrist_key:
+
+        entry_data = self._probe(zobrist_key)
+        if not entry_data:
             return self.LOOKUP_FAILED
-        
-        if entry.depth < depth:
+
+        if ((entry_data >> 40) & 0xFF) - self.DEPTH_OFFSET < depth:
             return self.LOOKUP_FAILED
-        
-        corrected_score = entry.value
+
+        corrected_score = ((entry_data >> 16) & 0xFFFFFF) - self.SCORE_OFFSET
         if abs(corrected_score) > 90000:
             sign = 1 if corrected_score > 0 else -1
             corrected_score -= sign * ply_from_root
-        
-        if entry.bound == self.EXACT:
-            return corrected_score
-        elif entry.bound == self.LOWER_BOUND and corrected_score >= beta:
-            return corrected_score
-        elif entry.bound == self.UPPER_BOUND and corrected_score <= alpha:
+
+        bound = (entry_data >> 48) & 3
+        if (bound == self.EXACT
+                or (bound == self.LOWER_BOUND and corrected_score >= beta)
+                or (bound == self.UPPER_BOUND and corrected_score <= alpha)):
             return corrected_score
-        
+
         return self.LOOKUP_FAILED
-    
-    def store_evaluation(self, depth: int, ply_from_root: int, evaluation: int, 
+
+    def store_evaluation(self, depth: int, ply_from_root: int, evaluation: int,
                         bound: int, move, zobrist_key: int):
         if not self.enabled:
             return
-        
-        entry = self.entries[self.index(zobrist_key)]
-        
+
+        keys = self.keys
+        data = self.data
+        generation = self.generation
+        start = self.index(zobrist_key)
+
+        # Chọn ô thay thế: trùng key > ô trống > ô cũ nhất/nông nhất. Phải xét hết bucket trước
+        # khi lấy ô trống vì age-out/gộp snapshot có thể để lại lỗ trước entry trùng key
+        target = None
+        old_data = 0
+        empty = None
+        worst = None
+        for slot in range(start, start + self.BUCKET_SIZE):
+            entry_data = data[slot]
+            if not entry_data:
+                if empty is None:
+                    empty = slot
+                continue
+            if keys[slot] ^ entry_data == zobrist_key:
+                # Giữ entry sâu hơn của cùng lần tìm kiếm nếu entry mới chỉ là bound
+                if (bound != self.EXACT and entry_data >> 56 == generation
+                        and ((entry_data >> 40) & 0xFF) - self.DEPTH_OFFSET > depth + 2):
+                    return
+                target, old_data = slot, entry_data
+                break
+            age_distance = (generation - (entry_data >> 56)) % 255
+            priority = ((entry_data >> 40) & 0xFF) - 8 * age_distance
+            if worst is None or priority < worst[0]:
+                worst = (priority, slot)
+        if target is None:
+            target = empty if empty is not None else worst[1]
+
         corrected_score = evaluation
         if abs(evaluation) > 90000:
             sign = 1 if evaluation > 0 else -1
             corrected_score += sign * ply_from_root
-        
-        entry.key = zobrist_key
-        entry.value = corrected_score
-        entry.depth = depth
-        entry.bound = bound
-        entry.move = move
-    
+
+        packed_move = self.pack_move(move)
+        if not packed_move and old_data:
+            packed_move = old_data & 0xFFFF
+
+        entry_data = (packed_move
+                      | ((corrected_score + self.SCORE_OFFSET) << 16)
+                      | ((depth + self.DEPTH_OFFSET) << 40)
+                      | (bound << 48)
+                      | (generation << 56))
+        data[target] = entry_data
+        keys[target] = zobrist_key ^ entry_data
+
     def get_stored_move(self, zobrist_key: int):
-        entry = self.entries[self.index(zobrist_key)]
-        if entry.key == zobrist_key:
-            return entry.move
-        return None
-    
-    def clear(self):
-        self.entries = [Entry() for _ in range(self.size)]
\ No newline at end of file
+        return self.unpack_move(self._probe(zobrist_key) & 0xFFFF)
+
+    def hashfull(self) -> int:
+        """Tỉ lệ phần nghìn các entry thuộc lần tìm kiếm hiện tại (lấy mẫu 1000 ô rải đều khắp bảng)."""
+        data = self.data
+        sample = min(1000, self.size)
+        stride = self.size // sample
+        generation = self.generation
+        used = sum(1 for slot in range(0, sample * stride, stride) if data[slot] >> 56 == generation)
+        return used * 1000 // sample
+
+    def save(self, path: str):
+        """Ghi snapshot của bảng: header có phiên bản rồi nguyên vùng nhớ, không chuyển đổi gì."""
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.ENTRY_SIZE, self.BUCKET_SIZE,
+                                      sys.byteorder == "little", self.num_buckets, self.generation)
+        with open(path, "wb") as f:
+            f.write(header.ljust(SNAPSHOT_HEADER_SIZE, b"\0"))
+            f.write(self.buffer)
+
+    def load(self, path: str, merge: bool = False, max_age: Optional[int] = None):
+        """
+        Nạp snapshot. Mặc định bảng được thay bằng file ánh xạ qua mmap copy-on-write nên mở
+        gần như tức thì (trang nhớ chỉ được đọc khi dùng tới, ghi không làm đổi file).
+        merge=True gộp các entry của file vào bảng hiện tại, giữ entry sâu hơn khi trùng key.
+        max_age bỏ các entry cũ hơn max_age lần tìm kiếm so với age của snapshot.
+        """
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ if merge else mmap.ACCESS_COPY)
+        try:
+            num_buckets, generation = self._read_snapshot_header(mapping)
+        except ValueError:
+            mapping.close()
+            raise
+
+        if not merge:
+            self._load_mapping(mapping, num_buckets, generation)
+            if max_age is not None:
+                self._age_out(max_age)
+            return
+
+        size = num_buckets * self.BUCKET_SIZE
+        view = memoryview(mapping)
+        keys = view[SNAPSHOT_HEADER_SIZE:SNAPSHOT_HEADER_SIZE + size * 8].cast('Q')
+        data = view[SNAPSHOT_HEADER_SIZE + size * 8:SNAPSHOT_HEADER_SIZE + size * 16].cast('Q')
+        try:
+            self._merge(keys, data, generation, max_age)
+        finally:
+            for item in (keys, data, view):
+                item.release()
+            mapping.close()
+
+    def _read_snapshot_header(self, mapping) -> tuple:
+        if len(mapping) < SNAPSHOT_HEADER_SIZE:
+            raise ValueError("Transposition table snapshot is truncated")
+        magic, version, entry_size, bucket_size, little_endian, num_buckets, generation = \
+            SNAPSHOT_HEADER.unpack_from(mapping)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a transposition table snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported transposition table snapshot version: {version}")
+        if (entry_size, bucket_size) != (self.ENTRY_SIZE, self.BUCKET_SIZE) or little_endian != (sys.byteorder == "little"):
+            raise ValueError("Transposition table snapshot has an incompatible layout")
+        if len(mapping) < SNAPSHOT_HEADER_SIZE + num_buckets * bucket_size * entry_size:
+            raise ValueError("Transposition table snapshot is truncated")
+        return num_buckets, generation
+
+    def _load_mapping(self, mapping, num_buckets: int, generation: int):
+        self._release_mapping()
+        self.num_buckets = num_buckets
+        self.size = num_buckets * self.BUCKET_SIZE
+        self.size_mb = self.size * self.ENTRY_SIZE // (1024 * 1024)
+        self._mapping = mapping
+        self._attach(memoryview(mapping)[SNAPSHOT_HEADER_SIZE:SNAPSHOT_HEADER_SIZE + self.size * self.ENTRY_SIZE])
+        self.generation = generation
+
+    def _age_out(self, max_age: int):
+        keys = self.keys
+        data = self.data
+        generation = self.generation
+        for slot in range(self.size):
+            entry_data = data[slot]
+            if entry_data and (generation - (entry_data >> 56)) % 255 > max_age:
+                data[slot] = 0
+                keys[slot] = 0
+
+    def _merge(self, keys, data, generation: int, max_age: Optional[int]):
+        """Gộp entry từ bảng khác (kích thước bất kỳ): giữ entry sâu hơn, entry gộp vào mang age hiện tại."""
+        own_keys = self.keys
+        own_data = self.data
+        current_age = self.generation << 56
+        for slot in range(len(data)):
+            entry_data = data[slot]
+            if not entry_data:
+                continue
+            if max_age is not None and (generation - (entry_data >> 56)) % 255 > max_age:
+                continue
+            zobrist_key = keys[slot] ^ entry_data
+            depth = (entry_data >> 40) & 0xFF
+            entry_data = (entry_data & ((1 << 56) - 1)) | current_age
+
+            start = self.index(zobrist_key)
+            target = empty = shallowest = None
+            shallowest_depth = None
+            for own_slot in range(start, start + self.BUCKET_SIZE):
+                own_entry = own_data[own_slot]
+                if not own_entry:
+                    if empty is None:
+                        empty = own_slot
+                    continue
+                own_depth = (own_entry >> 40) & 0xFF
+                if own_keys[own_slot] ^ own_entry == zobrist_key:
+                    target = own_slot if depth > own_depth else -1
+                    break
+                if shallowest_depth is None or own_depth < shallowest_depth:
+                    shallowest, shallowest_depth = own_slot, own_depth
+
+            if target is None:
+                if empty is not None:
+                    target = empty
+                elif depth > shallowest_depth:
+                    target = shallowest
+            if target is None or target < 0:
+                continue
+            own_data[target] = entry_data
+            own_keys[target] = zobrist_key ^ entry_data
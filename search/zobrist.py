@@ -0,0 +1,135 @@
+import chess
+from chess import polyglot
+
+RANDOM_ARRAY = polyglot.POLYGLOT_RANDOM_ARRAY
+
+# PIECE_KEYS[color][piece_type][square], cùng chỉ số với polyglot.zobrist_hash
+PIECE_KEYS = [
+    [[0] * 64] + [[RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square] for square in chess.SQUARES]
+                  for piece_type in chess.PIECE_TYPES]
+    for color in (chess.BLACK, chess.WHITE)
+]
+CASTLING_KEYS = {
+    chess.BB_H1: RANDOM_ARRAY[768],
+    chess.BB_A1: RANDOM_ARRAY[768 + 1],
+    chess.BB_H8: RANDOM_ARRAY[768 + 2],
+    chess.BB_A8: RANDOM_ARRAY[768 + 3],
+}
+EP_KEYS = [RANDOM_ARRAY[772 + file] for file in range(8)]
+TURN_KEY = RANDOM_ARRAY[780]
+
+_HASHER = polyglot.ZobristHasher(RANDOM_ARRAY)
+
+
+class ZobristMismatchError(AssertionError):
+    pass
+
+
+class IncrementalZobrist:
+    """
+    Duy trì khóa Zobrist tương thích Polyglot qua các lần push/pop thay vì
+    quét lại toàn bộ bàn cờ ở mỗi nút. Khóa luôn trùng bit với polyglot.zobrist_hash.
+    """
+    def __init__(self, debug: bool = False):
+        self.debug = debug
+        self.keys = [0]
+        self._castling_cache = {}
+
+    @property
+    def key(self) -> int:
+        return self.keys[-1]
+
+    def reset(self, board: chess.Board):
+        # Dựng lại khóa cho toàn bộ lịch sử ván đấu để phát hiện lặp lại về sau
+        replay = board.root()
+        self.keys = [polyglot.zobrist_hash(replay)]
+        for move in board.move_stack:
+            self.push(replay, move)
+
+    def push(self, board: chess.Board, move: chess.Move):
+        key = self.keys[-1] ^ self.state_key(board) ^ self.piece_delta(board, move)
+        board.push(move)
+        key ^= self.state_key(board)
+        self.keys.append(key)
+
+        if self.debug:
+            self.verify(board)
+
+    def pop(self, board: chess.Board) -> chess.Move:
+        self.keys.pop()
+        return board.pop()
+
+    def verify(self, board: chess.Board):
+        expected = polyglot.zobrist_hash(board)
+        if self.keys[-1] != expected:
+            raise ZobristMismatchError(
+                f"Incremental key {self.keys[-1]:016x} != {expected:016x} for {board.fen()}")
+
+    def state_key(self, board: chess.Board) -> int:
+        """Phần khóa không thuộc về quân cờ: lượt đi, quyền nhập thành, bắt tốt qua đường."""
+        key = TURN_KEY if board.turn == chess.WHITE else 0
+
+        if board.castling_rights:
+            key ^= self.castling_key(board)
+
+        ep_square = board.ep_square
+        if ep_square is not None:
+            if board.turn == chess.WHITE:
+                ep_mask = chess.shift_down(chess.BB_SQUARES[ep_square])
+            else:
+                ep_mask = chess.shift_up(chess.BB_SQUARES[ep_square])
+            ep_mask = chess.shift_left(ep_mask) | chess.shift_right(ep_mask)
+            if ep_mask & board.pawns & board.occupied_co[board.turn]:
+                key ^= EP_KEYS[ep_square & 7]
+
+        return key
+
+    def castling_key(self, board: chess.Board) -> int:
+        if board.chess960:
+            return _HASHER.hash_castling(board)
+
+        rights = board.clean_castling_rights()
+        key = self._castling_cache.get(rights)
+        if key is None:
+            key = 0
+            for square_mask, castling_key in CASTLING_KEYS.items():
+                if rights & square_mask:
+                    key ^= castling_key
+            self._castling_cache[rights] = key
+        return key
+
+    def piece_delta(self, board: chess.Board, move: chess.Move) -> int:
+        """Phần khóa thay đổi do quân cờ di chuyển, tính trước khi push."""
+        if not move:
+            return 0
+
+        color = board.turn
+        keys = PIECE_KEYS[color]
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+
+        if piece_type == chess.KING and board.is_castling(move):
+            kingside = board.is_kingside_castling(move)
+            rank_start = from_square & ~7
+            if board.chess960 or board.piece_type_at(to_square) == chess.ROOK:
+                rook_from = to_square
+            else:
+                rook_from = rank_start + (7 if kingside else 0)
+            king_to = rank_start + (6 if kingside else 2)
+            rook_to = rank_start + (5 if kingside else 3)
+            king_keys = keys[chess.KING]
+            rook_keys = keys[chess.ROOK]
+            return (king_keys[from_square] ^ king_keys[king_to] ^
+                    rook_keys[rook_from] ^ rook_keys[rook_to])
+
+        delta = keys[piece_type][from_square] ^ keys[move.promotion or piece_type][to_square]
+
+        captured_type = board.piece_type_at(to_square)
+        if captured_type:
+            delta ^= PIECE_KEYS[not color][captured_type][to_square]
+        elif piece_type == chess.PAWN and to_square == board.ep_square:
+            captured_square = to_square - 8 if color == chess.WHITE else to_square + 8
+            delta ^= PIECE_KEYS[not color][chess.PAWN][captured_square]
+
+        return delta
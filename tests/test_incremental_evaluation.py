@@ -0,0 +1,78 @@
+"""
+IncrementalEvaluation phải cho đúng cùng điểm với Evaluation.evaluate sau mọi chuỗi push/pop.
+Kiểm tra trên bộ thế cờ hồi quy (tests/data/evaluation_corpus.fen) và trên các ván ngẫu nhiên có seed.
+"""
+import os
+import random
+import chess
+import pytest
+from evaluation.evaluation import Evaluation
+from evaluation.incremental_evaluation import IncrementalEvaluation
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "evaluation_corpus.fen")
+
+
+def load_corpus() -> list:
+    with open(CORPUS) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return Evaluation()
+
+
+def test_corpus_covers_special_moves():
+    kinds = set()
+    for fen in load_corpus():
+        board = chess.Board(fen)
+        for move in board.legal_moves:
+            if board.is_castling(move):
+                kinds.add("castling")
+            if board.is_en_passant(move):
+                kinds.add("en_passant")
+            if move.promotion:
+                kinds.add("promotion")
+            if board.is_capture(move):
+                kinds.add("capture")
+    assert kinds == {"castling", "en_passant", "promotion", "capture"}
+
+
+@pytest.mark.parametrize("fen", load_corpus())
+def test_every_move_from_corpus(fen, reference):
+    board = chess.Board(fen)
+    evaluation = IncrementalEvaluation()
+    evaluation.reset(board)
+    assert evaluation.evaluate(board) == reference.evaluate(board)
+
+    for move in list(board.legal_moves):
+        evaluation.push(board, move)
+        board.push(move)
+        assert evaluation.evaluate(board) == reference.evaluate(board), f"{fen} {move}"
+        board.pop()
+        evaluation.pop()
+        # Sau pop phải trở lại đúng điểm của thế cờ gốc
+        assert evaluation.evaluate(board) == reference.evaluate(board), f"{fen} pop {move}"
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_games(seed, reference):
+    rng = random.Random(seed)
+    board = chess.Board()
+    evaluation = IncrementalEvaluation()
+    evaluation.reset(board)
+
+    for _ in range(200):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        move = rng.choice(moves)
+        evaluation.push(board, move)
+        board.push(move)
+        assert evaluation.evaluate(board) == reference.evaluate(board), f"{board.fen()} after {move}"
+
+    # Lùi toàn bộ ván, kiểm tra lại từng thế cờ
+    while board.move_stack:
+        board.pop()
+        evaluation.pop()
+        assert evaluation.evaluate(board) == reference.evaluate(board), board.fen()
@@ -0,0 +1,297 @@
+"""
+Texel tuning cho giá trị chất và PieceSquareTables.
+
+Đọc một tập thế cờ có nhãn (FEN + kết quả ván) một lần vào ma trận đặc trưng thưa dạng NumPy,
+rồi hạ gradient (Adam, toàn bộ dữ liệu mỗi bước) trên sai số bình phương giữa kết quả ván và
+sigmoid(điểm đánh giá). Điểm đánh giá tuyến tính theo các tham số được chỉnh; các thành phần
+còn lại (quân treo, mop-up, cấu trúc tốt, lá chắn tốt) được giữ cố định theo tham số ban đầu.
+Kết quả được ghi thành module PieceSquareTables mới.
+
+Định dạng mỗi dòng dữ liệu: FEN theo sau bởi kết quả, ví dụ
+    <fen> [1.0]      <fen> | 0.5      <fen> c9 "1-0";
+"""
+import argparse
+import json
+import sys
+import time
+import chess
+import numpy as np
+from evaluation.batch_evaluation import PLANES, encode_fens, evaluate_batch_unscaled
+from evaluation.evaluation import Evaluation
+from evaluation.material_table import SCALE_NORMAL
+from evaluation.piece_values import PieceSquareTables as PST
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5, "1.0": 1.0, "0.0": 0.0, "0.5": 0.5}
+
+# Bố cục vector tham số: 5 giá trị chất (tốt..hậu) rồi 64 ô cho mỗi bảng, theo thứ tự trong module
+VALUE_NAMES = ["pawn_value", "knight_value", "bishop_value", "rook_value", "queen_value"]
+TABLE_NAMES = ["pawn_start", "pawn_end", "knight", "bishop", "rook", "queen", "king_start", "king_end"]
+FLAT_TABLES = {chess.KNIGHT: "knight", chess.BISHOP: "bishop", chess.ROOK: "rook", chess.QUEEN: "queen"}
+TAPERED_TABLES = {chess.PAWN: ("pawn_start", "pawn_end"), chess.KING: ("king_start", "king_end")}
+PARAMETER_COUNT = len(VALUE_NAMES) + 64 * len(TABLE_NAMES)
+
+CHUNK_SIZE = 65536
+
+
+def table_offset(name: str) -> int:
+    return len(VALUE_NAMES) + 64 * TABLE_NAMES.index(name)
+
+
+def initial_parameters() -> np.ndarray:
+    theta = np.zeros(PARAMETER_COUNT)
+    for index, name in enumerate(VALUE_NAMES):
+        theta[index] = getattr(PST, name)
+    for name in TABLE_NAMES:
+        offset = table_offset(name)
+        theta[offset:offset + 64] = getattr(PST, name)
+    return theta
+
+
+def parse_line(line: str):
+    """Tách (fen, kết quả theo góc nhìn trắng) từ một dòng; None nếu không đọc được."""
+    tokens = line
+    for separator in ";\"[]|,":
+        tokens = tokens.replace(separator, " ")
+    tokens = tokens.split()
+    if len(tokens) < 5 or tokens[-1] not in RESULTS:
+        return None
+    fields = tokens[:4]
+    # Hai trường đồng hồ nước đi là tùy chọn (dạng EPD không có)
+    for token in tokens[4:min(6, len(tokens) - 1)]:
+        if not token.isdigit():
+            break
+        fields.append(token)
+    return " ".join(fields), RESULTS[tokens[-1]]
+
+
+def load_dataset(path: str, limit: int = None):
+    fens = []
+    results = []
+    with open(path) as f:
+        for line in f:
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            fens.append(parsed[0])
+            results.append(parsed[1])
+            if limit and len(fens) >= limit:
+                break
+    return fens, np.array(results)
+
+
+class FeatureSet:
+    """
+    Ma trận đặc trưng thưa dạng COO: điểm tuyến tính của thế cờ i là
+    sum(values * theta[cols]) trên các phần tử có rows == i, theo góc nhìn bên trắng.
+    offset giữ phần đánh giá không được chỉnh, tính tại tham số ban đầu.
+    Các phần tử được sắp theo rows để phép cộng theo thế cờ dùng reduceat (mỗi thế cờ luôn có vua).
+    """
+    def __init__(self, rows, cols, values, offset, results):
+        order = np.argsort(rows, kind="stable")
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.values = values[order]
+        self.row_starts = np.searchsorted(self.rows, np.arange(len(results)))
+        self.offset = offset
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    def linear(self, theta: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(self.values * theta[self.cols], self.row_starts)
+
+    def scores(self, theta: np.ndarray) -> np.ndarray:
+        return self.offset + self.linear(theta)
+
+    def gradient(self, per_position: np.ndarray) -> np.ndarray:
+        return np.bincount(self.cols, weights=self.values * per_position[self.rows], minlength=PARAMETER_COUNT)
+
+
+def _chunk_features(evaluation: Evaluation, bitboards: np.ndarray, row_base: int):
+    n = len(bitboards)
+    planes = np.unpackbits(bitboards.astype("<u8").view(np.uint8).reshape(n, 12, 8),
+                           axis=-1, bitorder="little").reshape(n, 2, 6, 64)
+    counts = planes.sum(axis=-1)
+    weights = np.array([0, evaluation.KNIGHT_ENDGAME_WEIGHT, evaluation.BISHOP_ENDGAME_WEIGHT,
+                        evaluation.ROOK_ENDGAME_WEIGHT, evaluation.QUEEN_ENDGAME_WEIGHT, 0])
+    endgame_t = 1 - np.minimum(1, (counts @ weights) / evaluation.ENDGAME_START_WEIGHT)
+
+    rows, cols, values = [], [], []
+
+    def add(row, col, value):
+        rows.append(row + row_base)
+        cols.append(col)
+        values.append(value)
+
+    for color, piece_type in PLANES:
+        side = 0 if color == chess.WHITE else 1
+        sign = 1.0 if color == chess.WHITE else -1.0
+        row, square = np.nonzero(planes[:, side, piece_type - 1])
+        # Bảng PST viết theo góc nhìn trắng: quân đen tra ô lật dọc
+        square = square if color == chess.WHITE else square ^ 56
+        if piece_type != chess.KING:
+            add(row, np.full(len(row), piece_type - 1), np.full(len(row), sign))
+        if piece_type in FLAT_TABLES:
+            add(row, table_offset(FLAT_TABLES[piece_type]) + square, np.full(len(row), sign))
+        else:
+            # PST tốt và vua nội suy theo giai đoạn tàn cuộc của đối phương
+            enemy_t = endgame_t[row, 1 - side]
+            start, end = TAPERED_TABLES[piece_type]
+            add(row, table_offset(start) + square, sign * (1 - enemy_t))
+            add(row, table_offset(end) + square, sign * enemy_t)
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def build_features(fens: list, results: np.ndarray, evaluation: Evaluation) -> FeatureSet:
+    """Mã hóa toàn bộ tập dữ liệu một lần; bỏ các thế cờ bị co điểm hoặc thiếu chất (không tuyến tính)."""
+    bitboards, _ = encode_fens(fens)
+    eval_sum, scale, insufficient = evaluate_batch_unscaled(evaluation, bitboards)
+    keep = (scale == SCALE_NORMAL) & ~insufficient
+    bitboards = bitboards[keep]
+    eval_sum = eval_sum[keep]
+
+    parts = [_chunk_features(evaluation, bitboards[start:start + CHUNK_SIZE], start)
+             for start in range(0, len(bitboards), CHUNK_SIZE)]
+    features = FeatureSet(np.concatenate([part[0] for part in parts]).astype(np.int32),
+                          np.concatenate([part[1] for part in parts]).astype(np.int32),
+                          np.concatenate([part[2] for part in parts]).astype(np.float32),
+                          np.zeros(len(bitboards)), results[keep])
+    features.offset = eval_sum - features.linear(initial_parameters())
+    return features
+
+
+def sigmoid(scores: np.ndarray, k: float) -> np.ndarray:
+    return 1 / (1 + np.power(10.0, -k * scores / 400))
+
+
+def loss(features: FeatureSet, theta: np.ndarray, k: float) -> float:
+    return float(np.mean((features.results - sigmoid(features.scores(theta), k)) ** 2))
+
+
+def fit_k(features: FeatureSet, theta: np.ndarray, low: float = 0.05, high: float = 5.0, iterations: int = 40) -> float:
+    """Tìm hệ số K của sigmoid cực tiểu hóa sai số với tham số hiện tại (tìm kiếm tỉ lệ vàng)."""
+    scores = features.scores(theta)
+    error = lambda k: np.mean((features.results - sigmoid(scores, k)) ** 2)
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = low, high
+    for _ in range(iterations):
+        c = b - ratio * (b - a)
+        d = a + ratio * (b - a)
+        if error(c) < error(d):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+
+def tune(features: FeatureSet, theta: np.ndarray, k: float, epochs: int, learning_rate: float,
+         log_every: int = 50) -> np.ndarray:
+    """Adam trên toàn bộ dữ liệu; trả về tham số thực (chưa làm tròn)."""
+    theta = theta.copy()
+    m = np.zeros_like(theta)
+    v = np.zeros_like(theta)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    scale = np.log(10) * k / 400
+
+    for epoch in range(1, epochs + 1):
+        predicted = sigmoid(features.scores(theta), k)
+        # dE/dscore của từng thế cờ, E là trung bình sai số bình phương
+        per_position = -2 * (features.results - predicted) * predicted * (1 - predicted) * scale / len(features)
+        gradient = features.gradient(per_position)
+
+        m = beta1 * m + (1 - beta1) * gradient
+        v = beta2 * v + (1 - beta2) * gradient ** 2
+        step = (m / (1 - beta1 ** epoch)) / (np.sqrt(v / (1 - beta2 ** epoch)) + epsilon)
+        theta -= learning_rate * step
+
+        if log_every and epoch % log_every == 0:
+            print(f"epoch {epoch}: loss {loss(features, theta, k):.6f}", file=sys.stderr)
+    return theta
+
+
+def normalize(theta: np.ndarray) -> np.ndarray:
+    """
+    Dời trung bình mỗi PST vào giá trị chất tương ứng: số quân và hằng số cộng vào cả bảng
+    là cùng một đặc trưng nên hướng này không được dữ liệu xác định.
+    """
+    theta = theta.copy()
+    for piece_type, name in FLAT_TABLES.items():
+        offset = table_offset(name)
+        shift = theta[offset:offset + 64].mean()
+        theta[offset:offset + 64] -= shift
+        theta[piece_type - 1] += shift
+
+    # Tốt chỉ đứng ở hàng 2..7; hằng số chung cho cả hai bảng đầu/cuối ván không phụ thuộc giai đoạn
+    start, end = table_offset("pawn_start"), table_offset("pawn_end")
+    shift = np.concatenate([theta[start + 8:start + 56], theta[end + 8:end + 56]]).mean()
+    theta[start + 8:start + 56] -= shift
+    theta[end + 8:end + 56] -= shift
+    theta[chess.PAWN - 1] += shift
+    return theta
+
+
+def write_module(path: str, theta: np.ndarray):
+    values = np.rint(theta).astype(int)
+    lines = ["class PieceSquareTables:",
+             "    # Giá trị chất (centipawn), cùng được chỉnh bởi tune.py"]
+    for index, name in enumerate(VALUE_NAMES):
+        lines.append(f"    {name} = {values[index]}")
+
+    for name in TABLE_NAMES:
+        offset = table_offset(name)
+        lines.append("")
+        lines.append(f"    {name} = [")
+        for rank in range(8):
+            row = values[offset + 8 * rank:offset + 8 * rank + 8]
+            lines.append("          " + ", ".join(f"{value:4d}" for value in row) + ("," if rank < 7 else ""))
+        lines.append("        ]")
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Texel tuning giá trị chất và PieceSquareTables.")
+    parser.add_argument("dataset", help="file thế cờ có nhãn: FEN và kết quả ván trên mỗi dòng")
+    parser.add_argument("--output", default="evaluation/piece_values_tuned.py",
+                        help="module PieceSquareTables được ghi ra; chép đè lên evaluation/piece_values.py khi đã kiểm tra")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="bước Adam, tính bằng centipawn")
+    parser.add_argument("--k", type=float, help="hệ số sigmoid cố định thay vì tự tìm")
+    parser.add_argument("--limit", type=int, help="chỉ đọc tối đa số thế cờ này")
+    args = parser.parse_args(argv)
+
+    evaluation = Evaluation()
+    start = time.monotonic()
+    fens, results = load_dataset(args.dataset, args.limit)
+    features = build_features(fens, results, evaluation)
+    load_time = time.monotonic() - start
+
+    theta = initial_parameters()
+    k = args.k if args.k is not None else fit_k(features, theta)
+    initial_loss = loss(features, theta, k)
+
+    start = time.monotonic()
+    tuned = normalize(tune(features, theta, k, args.epochs, args.learning_rate))
+    tune_time = time.monotonic() - start
+    final_loss = loss(features, np.rint(tuned), k)
+    write_module(args.output, tuned)
+
+    print(json.dumps({
+        "positions": len(fens),
+        "used": len(features),
+        "k": round(k, 4),
+        "initial_loss": round(initial_loss, 6),
+        "final_loss": round(final_loss, 6),
+        "load_seconds": round(load_time, 2),
+        "tune_seconds": round(tune_time, 2),
+        "piece_values": {name: int(round(tuned[index])) for index, name in enumerate(VALUE_NAMES)},
+        "output": args.output,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import sys
+import threading
+from typing import Optional
+import chess
+from engine import ChessEngine
+from search.searcher import Searcher
+from search.time_manager import TimeManager
+
+
+class UciProtocol:
+    """
+    Điều khiển ChessEngine qua giao thức UCI trên stdin/stdout, không cần giao diện pygame.
+    Tìm kiếm chạy trong luồng nền của ChessEngine nên stop/ponderhit được xử lý ngay
+    trong lúc máy đang suy nghĩ.
+    """
+    NAME = "Chess Engine"
+    AUTHOR = "Chess Engine developers"
+    DEFAULT_HASH_MB = 64
+    MAX_HASH_MB = 4096
+    MAX_THREADS = 64
+    DEFAULT_BOOK_DEPTH = 20
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.hash_mb = self.DEFAULT_HASH_MB
+        self.threads = 1
+        self.own_book = False
+        self.book_file = ""
+        self.book_depth = self.DEFAULT_BOOK_DEPTH
+        self.bitbase_path = ""
+        self.engine = None
+        self.board = chess.Board()
+
+        # Với "go infinite" và "go ponder", bestmove chỉ được gửi sau stop/ponderhit
+        self.release = threading.Event()
+        self.ponder_time = None
+
+    def send(self, line: str):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def ensure_engine(self) -> ChessEngine:
+        if self.engine is None:
+            self.engine = ChessEngine(threads=self.threads, hash_mb=self.hash_mb)
+            self.engine.searcher.verbose = False
+            self.engine.info_callback = self.on_info
+            self.apply_book()
+            self.apply_bitbases()
+        return self.engine
+
+    def apply_book(self):
+        if self.engine is None:
+            return
+        try:
+            self.engine.set_book(self.book_file if self.own_book else None, self.book_depth)
+        except OSError as error:
+            self.send(f"info string cannot open book {self.book_file}: {error}")
+
+    def apply_bitbases(self):
+        if self.engine is None:
+            return
+        try:
+            self.engine.set_bitbases(self.bitbase_path or None)
+        except (OSError, ValueError) as error:
+            self.send(f"info string cannot load bitbases {self.bitbase_path}: {error}")
+
+    def close_engine(self):
+        if self.engine is not None:
+            self.stop_search()
+            self.engine.close()
+            self.engine = None
+
+    # --- Lệnh UCI ---
+
+    def handle(self, line: str) -> bool:
+        """Xử lý một dòng lệnh; trả về False khi nhận quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {self.NAME}")
+            self.send(f"id author {self.AUTHOR}")
+            self.send(f"option name Hash type spin default {self.DEFAULT_HASH_MB} min 1 max {self.MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {self.MAX_THREADS}")
+            self.send("option name Ponder type check default false")
+            self.send("option name OwnBook type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send(f"option name BookDepth type spin default {self.DEFAULT_BOOK_DEPTH} min 0 max 200")
+            self.send("option name BitbasePath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.ensure_engine()
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop_search()
+            self.ensure_engine().tt.clear()
+            self.board = chess.Board()
+        elif command == "position":
+            self.set_position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "stop":
+            self.stop_search()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.close_engine()
+            return False
+        return True
+
+    def set_option(self, args: list):
+        if "name" not in args:
+            return
+        name_end = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:name_end]).lower()
+        value = " ".join(args[name_end + 1:])
+
+        try:
+            if name == "hash":
+                hash_mb = min(max(int(value), 1), self.MAX_HASH_MB)
+                if hash_mb != self.hash_mb:
+                    self.hash_mb = hash_mb
+                    self.close_engine()
+            elif name == "threads":
+                threads = min(max(int(value), 1), self.MAX_THREADS)
+                if threads != self.threads:
+                    self.threads = threads
+                    self.close_engine()
+            elif name == "ownbook":
+                self.own_book = value.lower() == "true"
+                self.apply_book()
+            elif name == "bookfile":
+                self.book_file = "" if value == "<empty>" else value
+                self.apply_book()
+            elif name == "bookdepth":
+                self.book_depth = max(int(value), 0)
+                self.apply_book()
+            elif name == "bitbasepath":
+                self.bitbase_path = "" if value == "<empty>" else value
+                self.apply_bitbases()
+        except ValueError:
+            self.send(f"info string invalid value for {name}: {value}")
+
+    def set_position(self, args: list):
+        if not args:
+            return
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        # FEN hay nước đi sai (IllegalMoveError cũng là ValueError): báo lỗi, giữ thế cờ cũ
+        try:
+            if args[0] == "startpos":
+                board = chess.Board()
+            elif args[0] == "fen":
+                board = chess.Board(" ".join(args[1:moves_at]))
+            else:
+                return
+
+            for uci in args[moves_at + 1:]:
+                board.push_uci(uci)
+        except ValueError as error:
+            self.send(f"info string invalid position: {error}")
+            return
+        self.board = board
+
+    def go(self, args: list):
+        engine = self.ensure_engine()
+        self.stop_search()
+
+        params = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            token = args[index]
+            if token in ("infinite", "ponder"):
+                flags.add(token)
+                index += 1
+            elif index + 1 < len(args):
+                params[token] = args[index + 1]
+                index += 2
+            else:
+                index += 1
+
+        max_depth = int(params.get("depth", Searcher.MAX_DEPTH))
+        node_limit = int(params["nodes"]) if "nodes" in params else None
+        time_limit = self.allocate_time(params)
+
+        self.release.clear()
+        if "infinite" in flags or "ponder" in flags:
+            # Ponder: nhớ thời gian dành cho nước đi để dùng khi nhận ponderhit
+            self.ponder_time = time_limit if "ponder" in flags else None
+            time_limit = None
+        else:
+            self.release.set()
+
+        engine.start(self.board, time_limit, max_depth, node_limit, on_done=self.on_done)
+
+    def allocate_time(self, params: dict) -> Optional[TimeManager]:
+        """TimeManager cho nước đi này; None nếu lệnh go không giới hạn thời gian."""
+        if "movetime" in params:
+            move_time = int(params["movetime"]) / 1000
+            return TimeManager.fixed(max(move_time - TimeManager.MOVE_OVERHEAD, 0.01))
+
+        prefix = "w" if self.board.turn == chess.WHITE else "b"
+        if f"{prefix}time" not in params:
+            return None
+
+        moves_to_go = int(params["movestogo"]) if "movestogo" in params else None
+        return TimeManager.from_clock(int(params[f"{prefix}time"]) / 1000,
+                                      int(params.get(f"{prefix}inc", 0)) / 1000,
+                                      moves_to_go)
+
+    def ponderhit(self):
+        if self.engine is None:
+            return
+        self.engine.ponderhit(self.ponder_time)
+        self.ponder_time = None
+        self.release.set()
+
+    def stop_search(self):
+        self.release.set()
+        if self.engine is not None:
+            self.engine.stop()
+
+    # --- Callback từ luồng tìm kiếm ---
+
+    def on_info(self, info: dict):
+        elapsed = max(info["time"], 1e-6)
+        nodes = info["nodes"]
+        fields = [
+            f"depth {info['depth']}",
+            f"score {self.format_score(info['score'])}",
+            f"nodes {nodes}",
+            f"nps {int(nodes / elapsed)}",
+            f"time {int(elapsed * 1000)}",
+            f"hashfull {self.engine.tt.hashfull()}",
+        ]
+        if info["pv"]:
+            fields.append("pv " + " ".join(move.uci() for move in info["pv"]))
+        self.send("info " + " ".join(fields))
+
+    def on_done(self, move: Optional[chess.Move]):
+        # Chờ stop/ponderhit nếu đang ở chế độ infinite hoặc ponder
+        self.release.wait()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        ponder_move = self.engine.ponder_move
+        if ponder_move is not None:
+            self.send(f"bestmove {move.uci()} ponder {ponder_move.uci()}")
+        else:
+            self.send(f"bestmove {move.uci()}")
+
+    def format_score(self, score: int) -> str:
+        mate_score = self.engine.evaluator.CHECKMATE_SCORE
+        if abs(score) > mate_score - 1000:
+            plies = mate_score - abs(score)
+            moves = (plies + 1) // 2
+            return f"mate {moves if score > 0 else -moves}"
+        return f"cp {score}"
+
+    def loop(self, stream=sys.stdin):
+        for line in stream:
+            if not self.handle(line.strip()):
+                break
+        else:
+            self.close_engine()
+
+
+if __name__ == "__main__":
+    UciProtocol().loop()